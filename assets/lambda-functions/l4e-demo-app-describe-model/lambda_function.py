@@ -1,7 +1,7 @@
-import boto3
 from datetime import datetime
+from l4edemoapp.clients import LazyClient
 
-l4e_client = boto3.client('lookoutequipment')
+l4e_client = LazyClient('lookoutequipment')
 
 def lambda_handler(event, context):
     modelName = event['modelName']
@@ -1,10 +1,10 @@
-import boto3
 import csv
-import json
+import io
 
 from datetime import datetime
+from l4edemoapp.clients import LazyClient
 
-s3 = boto3.resource('s3')
+s3_client = LazyClient('s3')
 
 def lambda_handler(event, context):
     timestamp = datetime.strptime(event['timestamp'], "%Y-%m-%d %H:%M:%S")
@@ -21,15 +21,14 @@ def lambda_handler(event, context):
         if (tag != 'timestamp' and tag != 'bucket' and tag != 'modelName' and tag != 'projectName' and tag !='uid'):
             row.update({tag: event[tag]})
             
-    localFname = f'/tmp/{projectName}-{currentTimestamp}.csv'
-    data = open(localFname, 'w')
+    # The file only holds one row: it is built in memory and sent
+    # with a single PutObject call (no local file):
+    data = io.StringIO()
     csvWriter = csv.writer(data)
     csvWriter.writerow(row.keys())
     csvWriter.writerow(row.values())
-    data.close()
     
-    targetBucket = s3.Bucket(bucket)
     inferenceKey = f'inference-data/{modelName}/input/{projectName}-{currentTimestamp}.csv'
-    targetBucket.upload_file(localFname, inferenceKey)
+    s3_client.put_object(Bucket=bucket, Key=inferenceKey, Body=data.getvalue().encode('utf-8'))
 
     return { 'statusCode': 200 }
@@ -1,9 +1,21 @@
-import boto3
-import json
-import time
+import os
 
-s3_client = boto3.client('s3')
-ddb_client = boto3.client('dynamodb')
+from l4edemoapp.bulk_loader import bulkLoad, updateSegment, SEGMENT_SIZE
+from l4edemoapp.clients import LazyClient
+from l4edemoapp.csv_stream import readCsvBatches
+from l4edemoapp.tables import ensureTable
+
+s3_client = LazyClient('s3')
+ddb_client = LazyClient('dynamodb')
+
+# Number of segments written in parallel and time (in milliseconds)
+# kept at the end of an invocation to let the running segments finish:
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 8))
+STOP_MARGIN = 60000
+
+# Number of times the failed segments of a file are written again
+# before the load is reported as failed (the file is then kept):
+MAX_RETRIES = 3
 
 def lambda_handler(event, context):
     bucket = event['bucket']
@@ -11,55 +23,66 @@ def lambda_handler(event, context):
     table = event['table']
     fieldTypes = event['fieldTypes']
     
-    result = ddbTableExists(table)
-    if not result: 
-        print(f'Table {table} does not exist, creating it...')
-        result = ddbCreateTable(table)
+    ensureTable(ddb_client, table)
 
-    # Reading the CSV file:
+    # Streaming the CSV file: the rows are parsed chunk by chunk and
+    # grouped in segments that are written concurrently. The manifest
+    # of a previous partial load (if any) lets us skip the segments
+    # already written:
     print(f'Ingesting data into the {table} table')
     data = s3_client.get_object(Bucket=bucket, Key=key)
-    data = data['Body'].read().decode("utf-8")
+    headers, segments = readCsvBatches(data['Body'], batchSize=SEGMENT_SIZE)
+    segments = (
+        [{h: {fieldTypes[h]: r[index]} for index, h in enumerate(headers)} for r in rows]
+        for rows in segments
+    )
     
-    # Excluding the last row which will be empty. Reading the 
-    # headers and then excluding them from the main body of 
-    # rows to process:
-    rows = data.split("\n")[:-1]
-    headers = rows[0].split(',')
-    rows = rows[1:]
+    # The daily items also hold the aggregates of the live results: the
+    # training results are set in them instead of replacing them
+    manifest = bulkLoad(
+        ddb_client,
+        table,
+        segments,
+        manifest=event.get('manifest'),
+        maxWorkers=MAX_WORKERS,
+        shouldStop=lambda: context.get_remaining_time_in_millis() < STOP_MARGIN,
+        writer=updateSegment if table.endswith('-daily_rate') else None
+    )
     
-    # We then batch the ingestion by 25 items (maximum batch 
-    # for the DynamoDB BatchWriteItem API call):
-    numBatches = int(len(rows) / 25)
-
-    # Loops through each batch of rows to ingest:
-    for i in range(0, numBatches + 1):
-        # Extract the current rows content:
-        currentRows = rows[i * 25 : (i+1) * 25]
-        
-        try:
-            # Assemble the request:
-            putRequests = [{
-                'PutRequest': {
-                    'Item': {
-                        h: {fieldTypes[h]: r.split(',')[index]} for index, h in enumerate(headers)
-                    }
-                }
-            } for r in currentRows]
-            
-            # And write this batch:
-            ddb_client.batch_write_item(
-                RequestItems={
-                    table: putRequests
-                }
-            )
+    numRows = sum([s['items'] for s in manifest['segments']])
+    print(f"{numRows} rows ingested in {len(manifest['segments'])} segments")
+    for segment in manifest['segments']:
+        if segment['status'] == 'FAILED':
+            print(f"Segment {segment['segment']} failed:", segment['error'])
             
-        # In case of exception, we print some context and issue the error:
-        except Exception as e:
-            print('Num rows to ingest:', len(rows))
-            print('Current row that triggered the exception:', currentRows)
-            print('Batch: ', i)
-            print('Error:', e)
+    # Some segments could not be written: they are retried by the next
+    # call, the source file is kept until they all are:
+    retries = event.get('manifest', {}).get('retries', 0)
+    if manifest['status'] == 'FAILED':
+        retries += 1
+        if retries > MAX_RETRIES:
+            raise Exception(f"Segments {manifest['failedSegments']} of {key} could not be written after {MAX_RETRIES} retries")
+
+        manifest['status'] = 'PARTIAL'
+
+    # Not enough time left to finish the load (or failed segments to
+    # write again): the state machine will call this function again
+    # with the current manifest:
+    if manifest['status'] == 'PARTIAL':
+        print(f"Partial load, {len(manifest['completedSegments'])} segments completed so far")
+        return {
+            'statusCode': 200,
+            'status': manifest['status'],
+            'bucket': bucket,
+            'key': key,
+            'table': table,
+            'fieldTypes': fieldTypes,
+            'manifest': {
+                'completedSegments': manifest['completedSegments'],
+                'failedSegments': manifest['failedSegments'],
+                'retries': retries
+            }
+        }
     
     # At the end of the process, we delete the source file:
     try:
@@ -70,56 +93,6 @@ def lambda_handler(event, context):
     
     return {
         'statusCode': 200,
+        'status': manifest['status'],
+        'manifest': manifest
     }
-
-def ddbTableExists(tableName):
-    try:
-        response = ddb_client.describe_table(TableName=tableName)
-        
-    except Exception as e:
-        return False
-
-    return response['Table']['TableStatus']
-    
-def ddbCreateTable(tableName):
-    print(tableName)
-    
-    try:
-        response = ddb_client.create_table(
-            TableName=tableName,
-            AttributeDefinitions=[
-                {
-                    'AttributeName': 'model',
-                    'AttributeType': 'S'
-                },
-                {
-                    'AttributeName': 'timestamp',
-                    'AttributeType': 'N'
-                }
-            ],
-            KeySchema=[
-                {
-                    'AttributeName': 'model',
-                    'KeyType': 'HASH'
-                },
-                {
-                    'AttributeName': 'timestamp',
-                    'KeyType': 'RANGE'
-                }
-            ],
-            BillingMode='PAY_PER_REQUEST',
-            TableClass='STANDARD'
-        )
-    except Exception as e:
-        print(e)
-
-    response = ddb_client.describe_table(TableName=tableName)
-    status = response['Table']['TableStatus']
-    
-    while status != 'ACTIVE':
-        time.sleep(1)
-        response = ddb_client.describe_table(TableName=tableName)
-        status = response['Table']['TableStatus']
-        print('Table creation status:', status)
-        
-    return status
\ No newline at end of file
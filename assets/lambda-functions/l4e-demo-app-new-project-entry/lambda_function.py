@@ -1,11 +1,11 @@
-import boto3
 import os
-import pandas as pd
-import uuid
 
-s3_client = boto3.client('s3')
-s3 = boto3.resource('s3')
-ddb_client = boto3.client('dynamodb')
+from l4edemoapp.clients import LazyClient, LazyResource
+from l4edemoapp.upload_inspection import inspectUpload, writeMetadata
+
+s3_client = LazyClient('s3')
+s3 = LazyResource('s3')
+ddb_client = LazyClient('dynamodb')
 
 def lambda_handler(event, context):
     print(event)
@@ -20,10 +20,11 @@ def lambda_handler(event, context):
     
     # Reading the CSV file:
     try:
-        # Reading dataset num rows:
-        data = s3_client.get_object(Bucket=bucket, Key=key)
-        df = pd.read_csv(data['Body'])
-        numRows = df.shape[0]
+        # Reading the dataset once to get its number of rows and the
+        # metadata (delimiter, time range...) used by the next steps:
+        metadata = inspectUpload(s3_client, bucket, key)
+        writeMetadata(s3_client, metadata)
+        numRows = metadata['numRows']
     
         # Reading tags on the object
         tags = s3_client.get_object_tagging(Bucket=bucket, Key=key)['TagSet']
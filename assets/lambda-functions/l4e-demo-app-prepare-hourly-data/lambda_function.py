@@ -1,45 +1,61 @@
-import boto3
 import pandas as pd
 import uuid
+import io
 import os
-import csv
 
-s3_client = boto3.client('s3')
-s3 = boto3.resource('s3')
+from l4edemoapp.batch_writer import batchDeleteItems, batchWriteItems
+from l4edemoapp.clients import LazyClient
+from l4edemoapp.columnar import deleteParquet, parquetKey, writeParquet
+from l4edemoapp.item_encoder import encodeDataframe
+from l4edemoapp.pyramid import PyramidAccumulator, PYRAMID_LEVELS, LTTB_LEVEL, lttb
+from l4edemoapp.resampling import ChunkedHourlyResampler, ForwardFiller, HOURLY_FFILL_LIMIT
+from l4edemoapp.s3_sink import S3MultipartWriter, writeCsv, writeCsvFiles
+from l4edemoapp.tables import ddbTableExists, ensureTable, invalidate
+from l4edemoapp.time_codec import parseDatetimes, toEpoch, toEpochArray
+from l4edemoapp.timeindex import TimeIndexBuilder, writeTimeIndex
+from l4edemoapp.upload_inspection import readMetadata, sniffDelimiter
+from l4edemoapp.watermarks import (
+    buildWatermark, dayFingerprints, deleteWatermark, mergeFingerprints, overlapMatches,
+    readHourlyHistory, readWatermark, resampleIncrement, writeHourlyHistory, writeWatermark
+)
+
+s3_client = LazyClient('s3')
+ddb_client = LazyClient('dynamodb')
+l4e_client = LazyClient('lookoutequipment')
+
+# When enabled, Parquet versions of the CSV files are also written:
+COLUMNAR_OUTPUT = os.environ.get('COLUMNAR_OUTPUT', 'false').lower() == 'true'
+
+# Uploads larger than this size (in MB) are resampled chunk by chunk
+# instead of being loaded in memory at once:
+CHUNKED_THRESHOLD = int(os.environ.get('CHUNKED_THRESHOLD_MB', 256)) * 1024 * 1024
+CHUNK_ROWS = 500000
+
+# Keys of the DynamoDB tables storing the time series of each asset:
+TIMESERIES_KEYS = [('sampling_rate', 'S'), ('unix_timestamp', 'N')]
 
 def lambda_handler(event, context):
     print(event)
     print('-----------------------------------')
-    
+
     # Assembling the S3 path to process:
     bucket = event['detail']['bucket']['name']
     key = event['detail']['object']['key']
     asset = key.split('/')[-2]
 
-    # Guessing the CSV delimiter:
-    data = s3_client.get_object(Bucket=bucket, Key=key, Range='bytes=0-10239')
-    sniffer = csv.Sniffer()
-    data = data['Body'].read().decode('utf-8')
-    data = data.split('\n')[0]
-    delimiter = sniffer.sniff(data).delimiter
+    # The file was already inspected when the project was created: we
+    # only guess the CSV delimiter when this metadata is not available:
+    metadata = readMetadata(s3_client, bucket, key, event['detail']['object'].get('etag'))
+    if metadata is not None:
+        delimiter = metadata['delimiter']
+        objectSize = metadata['size']
+        print(f"Upload metadata: {metadata['numRows']} rows from {metadata['startTime']} to {metadata['endTime']}")
+    else:
+        data = s3_client.get_object(Bucket=bucket, Key=key, Range='bytes=0-10239')
+        objectSize = int(data['ContentRange'].split('/')[-1])
+        delimiter = sniffDelimiter(data['Body'].read())
     print('Detected delimiter:', delimiter)
 
-    # Reading the CSV file:
-    data = s3_client.get_object(Bucket=bucket, Key=key)
-    df = pd.read_csv(data['Body'], delimiter=delimiter)
-    timestampCol = list(df.columns)[0]
-    df[timestampCol] = pd.to_datetime(df[timestampCol])
-    df = df.set_index(timestampCol)
-    df = df.sort_index()
-    df.index.name = "timestamp"
-    df.index = df.index.tz_localize('utc').tz_convert(None)
-    
-    print('Original data ingested in L4E:')
-    print(df.shape)
-    print(df.head())
-    print(df.tail())
-    print('-----------------------------------')
-
     # Reading tags on the object
     tags = s3_client.get_object_tagging(Bucket=bucket, Key=key)['TagSet']
     userUid = ""
@@ -50,8 +66,267 @@ def lambda_handler(event, context):
         if tag['Key'] == 'AssetDescription':
             assetDescription = tag['Value']
 
+    table_name = f'l4edemoapp-{userUid}-{asset}'
+    response = {
+        'statusCode': 200,
+        'bucket': bucket,
+        'key': f'prepared-datasets/{asset}/{asset}_prepared.csv',
+        'summaryKey': f'prepared-datasets/{asset}/{asset}_summary.csv',
+        'importKey': f'prepared-datasets/{asset}/',
+        'asset': asset,
+        'L4ES3InputPrefix': 'raw-datasets/' + asset + '/',
+        'L4EClientToken': str(uuid.uuid4()),
+        'L4EDatasetName': f'l4e-demo-app-{userUid}-{asset}',
+        'userUid': userUid,
+        'assetDescription': assetDescription,
+        'tableName': table_name
+    }
+
+    # When this asset was already prepared, only the rows appended
+    # since then are resampled and loaded in its existing table:
+    watermark = readWatermark(s3_client, bucket, asset)
+    if watermark is not None and isCurrentWatermark(watermark, table_name, response['L4EDatasetName']):
+        numItems = prepareIncrement(bucket, key, delimiter, asset, watermark)
+        if numItems is not None:
+            field_types = {f: 'S' for f in watermark['tags'] + ['timestamp', 'asset', 'sampling_rate']}
+            field_types.update({'unix_timestamp': 'N'})
+            response.update({'incremental': True, 'numItems': numItems, 'fieldTypes': field_types})
+            return response
+
+    # The watermark of a previous preparation must not outlive a failure
+    # of this one: it is written again once the new data is prepared
+    if watermark is not None:
+        deleteWatermark(s3_client, bucket, asset)
+
+    # Preparing the hourly data, the summary and the updated raw file:
+    if objectSize > CHUNKED_THRESHOLD:
+        print(f'Large file ({objectSize} bytes), resampling it by chunks')
+        df_summary, columnar_keys, pyramid_keys = prepareByChunks(bucket, key, delimiter, asset, table_name)
+    else:
+        df_summary, columnar_keys, pyramid_keys = prepareInMemory(bucket, key, delimiter, asset, table_name)
+
+    field_types = {f: 'S' for f in list(df_summary.columns)}
+    field_types.update({'unix_timestamp': 'N'})
+    response.update({
+        'incremental': False,
+        'fieldTypes': field_types,
+        'columnarKeys': columnar_keys,
+        'pyramidKeys': pyramid_keys
+    })
+
+    return response
+
+# ------------------------------------------------------------------
+# A watermark can only be used when the table and the Lookout for
+# Equipment dataset it was written for still exist: a project deleted
+# and created again with the same name must be prepared from scratch
+# ------------------------------------------------------------------
+def isCurrentWatermark(watermark, table_name, dataset_name):
+    if watermark['tableName'] != table_name:
+        return False
+
+    # The table may have been deleted since it was cached as ACTIVE:
+    invalidate(table_name)
+    if ddbTableExists(ddb_client, table_name) != 'ACTIVE':
+        print(f'Table {table_name} not found: ignoring the watermark')
+        return False
+
+    try:
+        l4e_client.describe_dataset(DatasetName=dataset_name)
+
+    except l4e_client.exceptions.ResourceNotFoundException:
+        print(f'Dataset {dataset_name} not found: ignoring the watermark')
+        return False
+
+    return True
+
+# ------------------------------------------------------------------
+# Prepares the rows appended to an asset since its last preparation
+# (given by its watermark): the new hourly items, the affected daily
+# and weekly buckets, the LTTB level and the summary are written
+# directly in the existing DynamoDB table. Returns the number of items
+# written or None when the upload can't be appended to the prepared
+# data (different sensors or rows changed before the watermark)
+# ------------------------------------------------------------------
+def prepareIncrement(bucket, key, delimiter, asset, watermark):
+    lastTimestamp = pd.Timestamp(watermark['lastTimestamp'])
+    tags = watermark['tags']
+    if watermark.get('fingerprints') is None or watermark.get('pyramid') is None:
+        print('The watermark was written without the state of the pyramid: preparing the upload again')
+        return None
+
+    history = readHourlyHistory(s3_client, bucket, asset)
+    if history is None:
+        print('No hourly history found: preparing the upload again')
+        return None
+
+    # Only the rows more recent than the watermark are kept in memory,
+    # the older ones are compared with the rows already prepared:
+    data = s3_client.get_object(Bucket=bucket, Key=key)
+    increments = []
+    overlap = {}
+    for chunk in pd.read_csv(data['Body'], delimiter=delimiter, chunksize=CHUNK_ROWS):
+        chunk = parseTimestamps(chunk, asset)
+        if not set(tags).issubset(chunk.columns):
+            print('The sensors of this upload differ from the prepared data: preparing it again')
+            return None
+
+        chunk = chunk[tags]
+        overlap = mergeFingerprints(overlap, dayFingerprints(chunk[chunk.index <= lastTimestamp]))
+        chunk = chunk[chunk.index > lastTimestamp]
+        if chunk.shape[0] > 0:
+            increments.append(chunk)
+
+    if not overlapMatches(overlap, watermark['fingerprints']):
+        print(f'The rows before {lastTimestamp} differ from the prepared data: preparing the upload again')
+        return None
+
+    if len(increments) == 0:
+        print(f'No data after {lastTimestamp}: nothing to append')
+        return 0
+
+    df = pd.concat(increments, axis='index').sort_index()
+    print(f'{df.shape[0]} new rows from {df.index[0]} to {df.index[-1]}')
+
+    # The boundary hour is resampled again with the new rows:
+    df_hourly, new_watermark = resampleIncrement(df, watermark, limit=HOURLY_FFILL_LIMIT)
+    df_hourly = df_hourly.dropna(axis='index', how='all')
+    df_hourly = df_hourly.fillna(value=0.0)
+    history = pd.concat([history[history.index < df_hourly.index[0]], df_hourly], axis='index')
+
+    # Daily and weekly buckets from the last (partial) one onward:
+    pyramid = PyramidAccumulator()
+    pyramid.restore(watermark['pyramid'])
+    pyramid.feed(df)
+    levels = {level: pyramid.result(level) for level in PYRAMID_LEVELS}
+    items = encodeDataframe(addColumns(df_hourly.copy(), asset, '1h'), fieldTypes={'unix_timestamp': 'N'})
+    stale_keys = []
+    for level, df_level in levels.items():
+        level_items, _ = refreshLevel(bucket, asset, level, df_level, replace=False)
+        items += level_items
+
+    # The LTTB buckets all move when the series grows: this level is
+    # computed again over the whole hourly history
+    level_items, level_stale_keys = refreshLevel(bucket, asset, LTTB_LEVEL, lttb(history), replace=True)
+    items += level_items
+    stale_keys += level_stale_keys
+
+    # The last rows of the summary now come from this increment:
+    summary_items, summary_stale_keys = refreshSummary(bucket, asset, df)
+    items += summary_items
+    stale_keys += summary_stale_keys
+
+    ensureTable(ddb_client, watermark['tableName'], keys=TIMESERIES_KEYS)
+    results = batchWriteItems(ddb_client, {watermark['tableName']: items})
+    if len(results['unprocessedItems']) > 0:
+        raise Exception(f"{len(results['unprocessedItems'])} items could not be written")
+
+    results = batchDeleteItems(ddb_client, {watermark['tableName']: stale_keys})
+    if len(results['unprocessedItems']) > 0:
+        raise Exception(f"{len(results['unprocessedItems'])} items could not be deleted")
+
+    # The new rows are added to the dataset ingested by Lookout for
+    # Equipment, with the columns of its schema only (and indexed by
+    # hour like sensors.csv for the replays):
+    unix_timestamp = toEpoch(df.index[0])
+    increment_key = f'raw-datasets/{asset}/{asset}/sensors_{unix_timestamp}.csv'
+    increment_index = TimeIndexBuilder()
+    writeCsv(s3_client, df, bucket, increment_key, listener=increment_index)
+    writeTimeIndex(s3_client, bucket, increment_key, increment_index.index())
+
+    # The watermark is written last: a failed increment is sent again
+    # from the previous one
+    writeHourlyHistory(s3_client, bucket, asset, history)
+    new_watermark['fingerprints'] = mergeFingerprints(watermark['fingerprints'], dayFingerprints(df))
+    new_watermark['pyramid'] = pyramid.lastPeriods()
+    writeWatermark(s3_client, bucket, new_watermark)
+    print(f"{len(items)} items written and {len(stale_keys)} items deleted in {watermark['tableName']}")
+
+    return len(items)
+
+# ------------------------------------------------------------------
+# Replaces the rows of a pyramid level changed by an increment in its
+# CSV file: returns the items to write and the keys of the items to
+# delete (when the whole level is replaced)
+# ------------------------------------------------------------------
+def refreshLevel(bucket, asset, level, df_level, replace):
+    target_key = f'prepared-datasets/{asset}/{asset}_{level}.csv'
+    df_previous = readPreparedCsv(bucket, target_key)
+    df_level = addColumns(df_level, asset, level)
+
+    if replace:
+        df_kept = df_previous.iloc[0:0]
+    else:
+        df_kept = df_previous[df_previous['unix_timestamp'].astype(float) < df_level['unix_timestamp'].min()]
+
+    s3_client.put_object(Bucket=bucket, Key=target_key, Body=pd.concat([df_kept, df_level], axis='index').to_csv(index=None))
+
+    # The items are encoded from the CSV text, like the imported ones
+    # (timestamps at midnight are written without their time):
+    df_text = pd.read_csv(io.StringIO(df_level.to_csv(index=None)), dtype=str, keep_default_na=False)
+    items = encodeDataframe(df_text, fieldTypes={'unix_timestamp': 'N'})
+    stale = set(df_previous['unix_timestamp'].astype(float)) - set(df_level['unix_timestamp'])
+
+    return items, [staleKey(level, timestamp) for timestamp in stale] if replace else []
+
+# ------------------------------------------------------------------
+# The summary keeps the first and last 20 rows of the raw data: the
+# rows of an increment replace the last ones
+# ------------------------------------------------------------------
+def refreshSummary(bucket, asset, df):
+    target_key = f'prepared-datasets/{asset}/{asset}_summary.csv'
+    df_previous = readPreparedCsv(bucket, target_key)
+    half = df_previous.shape[0] // 2
+
+    df_new = addColumns(df.copy(), asset, 'summary')
+    df_new = df_new.reindex(columns=df_previous.columns)
+    df_head = pd.concat([df_previous.iloc[:half], df_new], axis='index').head(20)
+    df_tail = pd.concat([df_previous.iloc[half:], df_new], axis='index').tail(20)
+    df_summary = pd.concat([df_head, df_tail], axis='index')
+    s3_client.put_object(Bucket=bucket, Key=target_key, Body=df_summary.to_csv(index=None))
+
+    # Only the new rows kept in the summary are written (once each):
+    previous = set(df_previous['unix_timestamp'].astype(float))
+    current = pd.to_numeric(df_summary['unix_timestamp'])
+    df_written = df_summary[~current.isin(previous)].drop_duplicates(subset='unix_timestamp', keep='last')
+    df_written = df_written.astype({'unix_timestamp': float})
+    items = encodeDataframe(df_written, fieldTypes={'unix_timestamp': 'N'})
+    stale = previous - set(current)
+
+    return items, [staleKey('summary', timestamp) for timestamp in stale]
+
+def staleKey(samplingRate, unix_timestamp):
+    return {'sampling_rate': {'S': samplingRate}, 'unix_timestamp': {'N': str(unix_timestamp)}}
+
+# The prepared CSV files are read as text so that the rows already
+# loaded in DynamoDB are written back unchanged:
+def readPreparedCsv(bucket, key):
+    try:
+        data = s3_client.get_object(Bucket=bucket, Key=key)
+
+    except s3_client.exceptions.NoSuchKey:
+        return pd.DataFrame(columns=['timestamp', 'unix_timestamp', 'asset', 'sampling_rate'])
+
+    return pd.read_csv(data['Body'], dtype=str, keep_default_na=False)
+
+# ---------------------------------------------------------------
+# Prepares the datasets after loading the whole file in memory
+# ---------------------------------------------------------------
+def prepareInMemory(bucket, key, delimiter, asset, table_name):
+    # Reading the CSV file:
+    data = s3_client.get_object(Bucket=bucket, Key=key)
+    df = pd.read_csv(data['Body'], delimiter=delimiter)
+    df = parseTimestamps(df, asset)
+
+    print('Original data ingested in L4E:')
+    print(df.shape)
+    print(df.head())
+    print(df.tail())
+    print('-----------------------------------')
+
     # Resampling to hourly: we limit gap fillings to one day:
-    df_hourly = df.resample('1H').mean().ffill(limit=24)
+    df_means = df.resample('1H').mean()
+    df_hourly = df_means.ffill(limit=HOURLY_FFILL_LIMIT)
     df_hourly = df_hourly.dropna(axis='index', how='all')
     df_hourly = df_hourly.fillna(value=0.0)
 
@@ -61,59 +336,199 @@ def lambda_handler(event, context):
     print(df_hourly.tail())
     print('-----------------------------------')
 
+    # Downsampling pyramid used to display long time ranges:
+    pyramid = PyramidAccumulator()
+    pyramid.feed(df)
+    pyramid_keys = writePyramid(bucket, asset, pyramid, df_hourly)
+    writeHourlyHistory(s3_client, bucket, asset, df_hourly)
+
     # Adding columns:
-    df_hourly['asset'] = asset
-    df_hourly['sampling_rate'] = '1h'
-    df_hourly = df_hourly.reset_index()
-    df_hourly['unix_timestamp'] = (df_hourly['timestamp'] - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
-    df_hourly['unix_timestamp'] = df_hourly['unix_timestamp'].astype(float)
-    df_hourly = df_hourly[['timestamp', 'unix_timestamp', 'asset', 'sampling_rate'] + list(df_hourly.columns)[1:-3]]
-    
-    # Writing the new file
-    local_fname = f'/tmp/{asset}_prepared.csv'
-    df_hourly.to_csv(local_fname, index=None)
-    target_bucket = s3.Bucket(bucket)
-    target_key = f'prepared-datasets/{asset}/{asset}_prepared.csv'
-    import_key = f'prepared-datasets/{asset}/'
-    target_bucket.upload_file(local_fname, target_key)
-    
+    df_hourly = addColumns(df_hourly, asset, '1h')
+
     # Keeping a snapshot of the raw data that we will
     # display in the project dashboard screen:
     df_summary = pd.concat([df.head(20), df.tail(20)], axis='index')
-    df_summary['asset'] = asset
-    df_summary['sampling_rate'] = 'summary'
-    df_summary = df_summary.reset_index()
-    df_summary['unix_timestamp'] = (df_summary['timestamp'] - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
-    df_summary['unix_timestamp'] = df_summary['unix_timestamp'].astype(float)
-    df_summary = df_summary[['timestamp', 'unix_timestamp', 'asset', 'sampling_rate'] + list(df_summary.columns)[1:-3]]
-    field_types = {f: 'S' for f in list(df_summary.columns)}
-    field_types.update({'unix_timestamp': 'N'})
+    df_summary = addColumns(df_summary, asset, 'summary')
 
-    local_fname = f'/tmp/{asset}_summary.csv'
-    df_summary.to_csv(local_fname, index=None)
-    target_bucket = s3.Bucket(bucket)
-    target_key = f'prepared-datasets/{asset}/{asset}_summary.csv'
-    target_bucket.upload_file(local_fname, target_key)
+    # End of the prepared data, used to append the next uploads:
+    boundary_rows = df[df.index >= df.index[-1].floor('h')]
+    watermark = buildWatermark(asset, table_name, boundary_rows, df_means.tail(HOURLY_FFILL_LIMIT + 1))
+    watermark['fingerprints'] = dayFingerprints(df[watermark['tags']])
+    watermark['pyramid'] = pyramid.lastPeriods()
+    writeWatermark(s3_client, bucket, watermark)
 
-    # Writing an update for the initial file 
-    # with the right timestamp column name:
-    local_fname = f'/tmp/{asset}_raw.csv'
-    df.to_csv(local_fname)
+    # Writing the new files (the initial file is updated
+    # with the right timestamp column name and indexed by
+    # hour for the replays):
     target_key = f'raw-datasets/{asset}/{asset}/sensors.csv'
-    target_bucket.upload_file(local_fname, target_key)
+    raw_index = TimeIndexBuilder()
+    writeCsvFiles(s3_client, [
+        (df_hourly, bucket, f'prepared-datasets/{asset}/{asset}_prepared.csv', {'index': None}),
+        (df_summary, bucket, f'prepared-datasets/{asset}/{asset}_summary.csv', {'index': None}),
+        (df, bucket, target_key, {'listener': raw_index})
+    ])
+    writeTimeIndex(s3_client, bucket, target_key, raw_index.index())
 
-    return {
-        'statusCode': 200,
-        'bucket': bucket,
-        'key': f'prepared-datasets/{asset}/{asset}_prepared.csv',
-        'summaryKey': f'prepared-datasets/{asset}/{asset}_summary.csv',
-        'importKey': import_key,
-        'asset': asset,
-        'L4ES3InputPrefix': 'raw-datasets/' + asset + '/',
-        'L4EClientToken': str(uuid.uuid4()),
-        'L4EDatasetName': f'l4e-demo-app-{userUid}-{asset}',
-        'userUid': userUid,
-        'assetDescription': assetDescription,
-        'tableName': f'l4edemoapp-{userUid}-{asset}',
-        'fieldTypes': field_types
-    }
\ No newline at end of file
+    # Writing the columnar version of these three files:
+    columnar_keys = []
+    if COLUMNAR_OUTPUT:
+        prepared_key = f'prepared-datasets/{asset}/{asset}_prepared.csv'
+        summary_key = f'prepared-datasets/{asset}/{asset}_summary.csv'
+        columnar_keys = [
+            writeParquet(s3_client, df_hourly, bucket, parquetKey(prepared_key), prepared_key),
+            writeParquet(s3_client, df_summary, bucket, parquetKey(summary_key), summary_key),
+            writeParquet(s3_client, df.reset_index(), bucket, parquetKey(target_key), target_key)
+        ]
+        columnar_keys = [k for k in columnar_keys if k is not None]
+
+    return df_summary, columnar_keys, pyramid_keys
+
+# ------------------------------------------------------------------
+# Prepares the datasets of files that don't fit in memory: the upload
+# is read by chunks of rows (which must be in chronological order),
+# the hourly means are computed as the chunks are read and all the
+# outputs are streamed to S3 with multipart uploads
+# ------------------------------------------------------------------
+def prepareByChunks(bucket, key, delimiter, asset, table_name):
+    resampler = ChunkedHourlyResampler()
+    filler = ForwardFiller(limit=HOURLY_FFILL_LIMIT)
+    pyramid = PyramidAccumulator()
+    hourly_blocks = []
+    df_head = None
+    df_tail = None
+    numRows = 0
+    fingerprints = {}
+    numeric_columns = None
+
+    data = s3_client.get_object(Bucket=bucket, Key=key)
+    chunks = pd.read_csv(data['Body'], delimiter=delimiter, chunksize=CHUNK_ROWS)
+    prepared_key = f'prepared-datasets/{asset}/{asset}_prepared.csv'
+    raw_key = f'raw-datasets/{asset}/{asset}/sensors.csv'
+    raw_index = TimeIndexBuilder()
+
+    with S3MultipartWriter(s3_client, bucket, prepared_key) as preparedWriter, \
+         S3MultipartWriter(s3_client, bucket, raw_key, listener=raw_index) as rawWriter:
+
+        for chunk in chunks:
+            chunk = parseTimestamps(chunk, asset)
+            numRows += chunk.shape[0]
+
+            # Updated raw file and snapshot of the first and last rows:
+            rawWriter.write(chunk.to_csv(header=(rawWriter.size == 0)))
+            df_head = chunk.head(20) if df_head is None else pd.concat([df_head, chunk.head(20)], axis='index').head(20)
+            df_tail = chunk.tail(20) if df_tail is None else pd.concat([df_tail, chunk.tail(20)], axis='index').tail(20)
+
+            # Fingerprints of the rows, to compare them with the next uploads:
+            numeric_chunk = chunk.select_dtypes(include='number')
+            if numeric_columns is None:
+                numeric_columns = list(numeric_chunk.columns)
+            if fingerprints is not None and list(numeric_chunk.columns) == numeric_columns:
+                fingerprints = mergeFingerprints(fingerprints, dayFingerprints(numeric_chunk))
+            else:
+                fingerprints = None
+
+            # Hourly data finalized with this chunk:
+            pyramid.feed(chunk)
+            hourly_blocks.append(writeHourlyBlock(preparedWriter, filler.fill(resampler.feed(chunk)), asset))
+
+        boundary_rows = resampler.carry
+        hourly_blocks.append(writeHourlyBlock(preparedWriter, filler.fill(resampler.finish()), asset))
+
+    print(f'{numRows} rows resampled by chunks of {CHUNK_ROWS} rows')
+    writeTimeIndex(s3_client, bucket, raw_key, raw_index.index())
+
+    # The hourly data is small enough to be kept for the pyramid:
+    hourly_blocks = [b for b in hourly_blocks if b is not None]
+    df_hourly = pd.concat(hourly_blocks, axis='index') if len(hourly_blocks) > 0 else None
+    pyramid_keys = writePyramid(bucket, asset, pyramid, df_hourly)
+
+    # End of the prepared data (the next uploads are prepared again in
+    # full when the type of a column changed between two chunks):
+    watermark = buildWatermark(asset, table_name, boundary_rows, filler.history)
+    if fingerprints is not None and numeric_columns != watermark['tags']:
+        fingerprints = None
+    watermark['fingerprints'] = fingerprints
+    watermark['pyramid'] = pyramid.lastPeriods()
+    if df_hourly is not None:
+        writeHourlyHistory(s3_client, bucket, asset, df_hourly)
+    writeWatermark(s3_client, bucket, watermark)
+
+    df_summary = pd.concat([df_head, df_tail], axis='index')
+    df_summary = addColumns(df_summary, asset, 'summary')
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=f'prepared-datasets/{asset}/{asset}_summary.csv',
+        Body=df_summary.to_csv(index=None)
+    )
+
+    # The columnar files need the whole dataframes: the ones written by
+    # a previous preparation no longer match the new CSV files
+    if COLUMNAR_OUTPUT:
+        print('Columnar output is not available for files resampled by chunks')
+        deleteParquet(s3_client, bucket, [prepared_key, raw_key, f'prepared-datasets/{asset}/{asset}_summary.csv'])
+
+    return df_summary, [], pyramid_keys
+
+def writeHourlyBlock(writer, df_hourly, asset):
+    if df_hourly is None:
+        return None
+
+    df_hourly = df_hourly.dropna(axis='index', how='all')
+    df_hourly = df_hourly.fillna(value=0.0)
+    if df_hourly.shape[0] == 0:
+        return None
+
+    df_block = addColumns(df_hourly.copy(), asset, '1h')
+    writer.write(df_block.to_csv(index=None, header=(writer.size == 0), date_format='%Y-%m-%d %H:%M:%S'))
+
+    return df_hourly
+
+# -------------------------------------------------------------------
+# Writes each level of the downsampling pyramid (daily, weekly and
+# LTTB decimation of the hourly data) next to the prepared hourly
+# data: these files are imported in the same DynamoDB table, with
+# the level name as sampling rate
+# -------------------------------------------------------------------
+def writePyramid(bucket, asset, pyramid, df_hourly):
+    levels = {level: pyramid.result(level) for level in PYRAMID_LEVELS}
+    if df_hourly is not None:
+        levels[LTTB_LEVEL] = lttb(df_hourly)
+
+    pyramid_keys = []
+    for level, df_level in levels.items():
+        if df_level is None:
+            continue
+
+        df_level = addColumns(df_level, asset, level)
+        target_key = f'prepared-datasets/{asset}/{asset}_{level}.csv'
+        s3_client.put_object(Bucket=bucket, Key=target_key, Body=df_level.to_csv(index=None))
+        pyramid_keys.append(target_key)
+
+    return pyramid_keys
+
+# ------------------------------------------------------------
+# Uses the first column as a sorted, timezone-naive UTC index (the
+# format of the timestamps is kept for the next chunks of the asset)
+# ------------------------------------------------------------
+def parseTimestamps(df, asset):
+    timestampCol = list(df.columns)[0]
+    df[timestampCol] = parseDatetimes(df[timestampCol], cacheKey=asset)
+    df = df.set_index(timestampCol)
+    df = df.sort_index()
+    df.index.name = "timestamp"
+    df.index = df.index.tz_localize('utc').tz_convert(None)
+
+    return df
+
+# ------------------------------------------------------------------
+# Adds the columns expected by the DynamoDB time series table: asset,
+# sampling rate and unix timestamp (used as sort key)
+# ------------------------------------------------------------------
+def addColumns(df, asset, samplingRate):
+    df['asset'] = asset
+    df['sampling_rate'] = samplingRate
+    df = df.reset_index()
+    df['unix_timestamp'] = toEpochArray(df['timestamp']).astype(float)
+    df = df[['timestamp', 'unix_timestamp', 'asset', 'sampling_rate'] + list(df.columns)[1:-3]]
+
+    return df
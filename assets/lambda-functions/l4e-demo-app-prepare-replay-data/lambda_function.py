@@ -1,15 +1,28 @@
-import boto3
 import datetime
-import json
 import os
 import pandas as pd
-import pytz
-import time
 import uuid
 
-l4eClient = boto3.client('lookoutequipment')
-s3 = boto3.resource('s3')
-s3Client = boto3.client('s3')
+from l4edemoapp.clients import LazyClient
+from l4edemoapp.columnar import readDataframe
+from l4edemoapp.metadata_cache import describeDataset, describeModel
+from l4edemoapp.replay import replayManifestKey, writeReplayFiles, writeReplayManifest
+from l4edemoapp.s3_sink import writeCsv
+from l4edemoapp.schema import parseSchema
+from l4edemoapp.time_codec import parseDatetimes
+from l4edemoapp.timeindex import readWindow
+
+l4eClient = LazyClient('lookoutequipment')
+s3Client = LazyClient('s3')
+
+# When enabled, all the inference input files of the replay are written
+# by this function instead of one generate-inference-input call per row:
+BULK_REPLAY = os.environ.get('BULK_REPLAY', 'true').lower() == 'true'
+
+# Input file names expected by the inference schedulers created by the
+# deploy-model state machine:
+TIMESTAMP_FORMAT = 'yyyyMMddHHmmss'
+COMPONENT_TIMESTAMP_DELIMITER = '-'
 
 samplingRateTable = {
     'PT1S': '1s',
@@ -54,17 +67,16 @@ def lambda_handler(event, context):
     uid = event['uid']
     
     if generateReplayData:
-        response = l4eClient.describe_model(ModelName=modelName)
+        response = describeModel(l4eClient, modelName)
         samplingRate = samplingRateTable[response['DataPreProcessingConfiguration']['TargetSamplingRate']]
         
         replayStartTime = pd.to_datetime(event['replayStart']).tz_localize(None)
         replayEndTime = getReplayEndTime(replayStartTime, replayDuration)
         frequency = frequencyTable[response['DataPreProcessingConfiguration']['TargetSamplingRate']]
-        tagsList = getTagsList(response)
+        tagsList = list(parseSchema(response['Schema']).tags)
         
-        df, timestampCol, bucket = getDataframe(projectName)
+        df, timestampCol, bucket = getDataframe(projectName, replayStartTime, replayEndTime, tagsList)
         df = df.loc[replayStartTime:replayEndTime, tagsList].resample(samplingRate).mean().ffill()
-        targetBucket = s3.Bucket(bucket)
     
         start = datetime.datetime.now()
         if frequency > 60:
@@ -84,15 +96,33 @@ def lambda_handler(event, context):
         numSeq = int((newIndex[-1] - newIndex[0]).total_seconds() / frequency)
         df.index = newIndex
         df.index.name = timestampCol
-        df['bucket'] = bucket
-        df['modelName'] = modelName
-        df['projectName'] = projectName[9:]
-        df['uid'] = uid
         
-        inference_fname = os.path.join('/tmp', f'{modelName}.csv')
-        inference_key = f'inference-data/{modelName}/inference-input.csv'
-        df.to_csv(inference_fname)
-        targetBucket.upload_file(inference_fname, inference_key)
+        if BULK_REPLAY:
+            # One file per scheduler interval, uploaded concurrently:
+            df.index.name = 'timestamp'
+            manifest = writeReplayFiles(
+                s3Client,
+                df,
+                bucket,
+                prefix=f'inference-data/{modelName}/input/',
+                component=projectName[9:],
+                intervalSeconds=frequencyTable[dataUploadFrequency],
+                timestampFormat=TIMESTAMP_FORMAT,
+                delimiter=COMPONENT_TIMESTAMP_DELIMITER
+            )
+            inference_key = replayManifestKey(modelName)
+            writeReplayManifest(s3Client, bucket, inference_key, manifest)
+            numSeq = manifest['numFiles']
+            print(f"{manifest['numFiles']} inference input files written ({manifest['numRows']} rows)")
+            
+        else:
+            df['bucket'] = bucket
+            df['modelName'] = modelName
+            df['projectName'] = projectName[9:]
+            df['uid'] = uid
+            
+            inference_key = f'inference-data/{modelName}/inference-input.csv'
+            writeCsv(s3Client, df, bucket, inference_key)
         
         s3Client.put_object(
             Bucket=bucket,
@@ -114,6 +144,7 @@ def lambda_handler(event, context):
             'inputPrefix': f'inference-data/{modelName}/input/',
             'outputPrefix': f'inference-data/{modelName}/output/',
             'generateReplayData': True,
+            'bulkReplay': BULK_REPLAY,
             'replayStartTime': str(replayStartTime),
             'replayEndTime': str(replayEndTime),
             'dataUploadFrequency': dataUploadFrequency,
@@ -121,7 +152,7 @@ def lambda_handler(event, context):
         }
         
     else:
-        response = l4eClient.describe_dataset(DatasetName='l4e-demo-app-' + projectName)
+        response = describeDataset(l4eClient, 'l4e-demo-app-' + projectName)
         bucket = response['IngestionInputConfiguration']['S3InputConfiguration']['Bucket']
         s3Client.put_object(
             Bucket=bucket,
@@ -151,41 +182,49 @@ def getReplayEndTime(replayStartTime, replayDuration):
     
     return replayEndTime.tz_localize(None)
     
-def getTagsList(response):
-    schema = eval(response['Schema'])
-    signals = schema['Components'][0]['Columns']
-    tagsList = []
-    for s in signals:
-        if s['Name'] == 'timestamp':
-            continue
-        else:
-            tagsList.append(s['Name'])
-            
-    return tagsList
-    
-def getDataframe(projectName):
-    bucket, datasetS3Key = getDatasetS3Key(projectName)
-    data = s3Client.get_object(Bucket=bucket, Key=datasetS3Key)
-    df = pd.read_csv(data['Body'])
+# ----------------------------------------------------------------
+# Reads the replay window of the historical dataset (sensors.csv and
+# the increments appended to it since): when a file was indexed at
+# preparation time, only the hours of the window are downloaded
+# (ranged GET) and only the tags of the model are parsed
+# ----------------------------------------------------------------
+def getDataframe(projectName, replayStartTime, replayEndTime, tagsList):
+    bucket, datasetS3Keys = getDatasetS3Keys(projectName)
+    dataframes = []
+    for datasetS3Key in datasetS3Keys:
+        df = readWindow(s3Client, bucket, datasetS3Key, replayStartTime, replayEndTime, columns=tagsList)
+        if df is None:
+            df = readDataframe(s3Client, bucket, datasetS3Key)
+
+        dataframes.append(df)
+
+    df = pd.concat(dataframes, axis='index', ignore_index=True)
     timestampCol = list(df.columns)[0]
     
-    df[timestampCol] = pd.to_datetime(df[timestampCol])
-    df = df.set_index(timestampCol)
+    df[timestampCol] = parseDatetimes(df[timestampCol], cacheKey=projectName)
+    df = df.set_index(timestampCol).sort_index()
     
     return df, timestampCol, bucket
 
-def getDatasetS3Key(projectName):
-    datasetResponse = None
-    datasetCsvS3Key = ""
-    
-    response = l4eClient.describe_dataset(DatasetName='l4e-demo-app-' + projectName)
+# ----------------------------------------------------------------
+# Lists the CSV files of the dataset: the prepared sensors.csv file
+# followed by the increments (sensors_<first timestamp>.csv) in
+# chronological order
+# ----------------------------------------------------------------
+def getDatasetS3Keys(projectName):
+    response = describeDataset(l4eClient, 'l4e-demo-app-' + projectName)
 
     bucket = response['IngestionInputConfiguration']['S3InputConfiguration']['Bucket']
     prefix = response['IngestionInputConfiguration']['S3InputConfiguration']['Prefix'] + projectName[9:] + '/'
     
-    response = s3Client.list_objects_v2(
-        Bucket=bucket,
-        Prefix=prefix
-    )
-    
-    return bucket,response['Contents'][0]['Key']
\ No newline at end of file
+    keys = []
+    paginator = s3Client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys += [o['Key'] for o in page.get('Contents', []) if o['Key'].endswith('.csv')]
+
+    def fileOrder(key):
+        name = key.split('/')[-1][:-len('.csv')]
+        suffix = name.split('_')[-1] if '_' in name else ''
+        return (suffix != '', int(suffix) if suffix.isdigit() else 0, name)
+
+    return bucket, sorted(keys, key=fileOrder)
@@ -1,64 +1,153 @@
-import boto3
 import json
-import pandas as pd
+import os
 import urllib
 
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from l4edemoapp.batch_writer import batchWriteItems
+from l4edemoapp.clients import LazyClient
+from l4edemoapp.inference_codec import inferenceInputItems
+from l4edemoapp.ledger import ObjectLedger, ensureLedger, ledgerTable, recordETag
+from l4edemoapp.metadata_cache import describeModel
 
-l4e_client = boto3.client('lookoutequipment')
-s3_client = boto3.client('s3')
-ddb_client = boto3.client('dynamodb')
+l4e_client = LazyClient('lookoutequipment')
+s3_client = LazyClient('s3')
+ddb_client = LazyClient('dynamodb')
+
+# Number of input files read in parallel:
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 10))
 
 # =========================================================================
-# This Lambda function is called whenever a new Lookout for Equipment
-# inference results is pushed to the output prefix of the demo application.
-# When this happens, this function will locate the corresponding input file
-# and push its content (the live time series) to the DynamoDB table where
-# the timeseries are stored.
+# This Lambda function is called whenever new Lookout for Equipment
+# inference results are pushed to the output prefix of the demo application,
+# either directly by S3 (one or several records per event) or through an SQS
+# queue (a batch of S3 notifications). For each results file, this function
+# locates the corresponding input file and pushes its content (the live time
+# series) to the DynamoDB table where the timeseries are stored: the input
+# files are read concurrently and their items are written together.
 # =========================================================================
 def lambda_handler(event, context):
-    # Locate the input file used to run the inference:
-    bucket = event['Records'][0]['s3']['bucket']['name']
-    key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'])
-
-    timestamp = key.split('/')[-2][:-1].replace('-', '').replace(':', '').replace('T', '')
-    modelName = key.split('/')[1]
-    response = l4e_client.describe_model(ModelName=modelName)
-    uid = response['DatasetName'][13:].split('-')[0]
-    projectName = response['DatasetName'][22:]
-    inferenceInputKey = '/'.join(key.split('/')[0:2]) + f'/input/{projectName}-{timestamp}.csv'
-
-    # Read the input CSV file:
-    data = s3_client.get_object(Bucket=bucket, Key=inferenceInputKey)
-    df = pd.read_csv(data['Body'])
-
-    # Add new columns:
-    timestampCol = list(df.columns)[0]
-    df = df.rename(columns={timestampCol: 'timestamp'})
-    # df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['sampling_rate'] = 'raw'
-    df['asset'] = projectName
-    df['unix_timestamp'] = (pd.to_datetime(df['timestamp']) - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
-    df['unix_timestamp'] = df['unix_timestamp'].astype(float)
-    
-    # === TODO === Optimize the following ingestion with the batch PutItems() API
-    
-    # Ingest this content in DynamoDB: the inference input file will contain few 
-    # rows (1 in the case of synthetic inference data, and up to 3600 in case of
-    # the largest inference period (1 hour):
-    for index, row in df.iterrows():
-        item = {}
-        for key, values in eval(row.to_json()).items():
-            if key == 'unix_timestamp':
-                item.update({key: {'N': str(values)}})
-            else:
-                item.update({key: {'S': str(values)}})
-                
-        ddb_client.put_item(TableName=f'l4edemoapp-{uid}-{projectName}', Item=item)
-    
+    notifications = getNotifications(event)
+    print(f'{len(notifications)} inference results file(s) notified')
+
+    # Locate and read the input file used to run each inference:
+    with ThreadPoolExecutor(max_workers=max(min(MAX_WORKERS, len(notifications)), 1)) as executor:
+        inputs = list(executor.map(lambda n: readInput(n, context.aws_request_id), notifications))
+
+    # Write the items of all the input files, grouped by table:
+    itemsPerTable = {}
+    for input in inputs:
+        if input['status'] == 'read':
+            itemsPerTable.setdefault(input['table'], []).extend(input.pop('items'))
+
+    summary = batchWriteItems(ddb_client, itemsPerTable)
+    print(f"{summary['items']} items written in {len(itemsPerTable)} table(s) with {summary['calls']} BatchWriteItem calls")
+
+    for input in inputs:
+        if input['status'] != 'read':
+            continue
+
+        if input['table'] in summary['unprocessedItems']:
+            input['status'] = 'failed'
+            input['error'] = 'unprocessed items'
+        else:
+            input.pop('ledger').complete()
+            input['status'] = 'stored'
+
+    failures = [input for input in inputs if input['status'] == 'failed']
+    for input in failures:
+        print(f"Input file of {input['key']} not stored:", input['error'])
+
+    # The messages of an SQS batch are acknowledged individually,
+    # whereas an S3 event is retried as a whole (the files already
+    # stored are then skipped by the ledger):
+    if len(failures) > 0 and all([input['messageId'] is None for input in failures]):
+        raise Exception(f'{len(failures)} input file(s) could not be stored')
+
     return {
         'statusCode': 200,
-        'modelName': modelName,
-        'datasetName': projectName,
-        'inferenceInputKey': inferenceInputKey
+        'inputs': [
+            {
+                'modelName': input['modelName'],
+                'datasetName': input['datasetName'],
+                'inferenceInputKey': input['inferenceInputKey'],
+                'status': input['status']
+            }
+            for input in inputs if 'inferenceInputKey' in input
+        ],
+        'batchItemFailures': [
+            {'itemIdentifier': messageId}
+            for messageId in sorted(set([input['messageId'] for input in failures if input['messageId'] is not None]))
+        ]
     }
+
+# -------------------------------------------------------------------
+# Lists the S3 records of an event as (SQS message id, record) pairs:
+# the message id is None for the records sent directly by S3
+# -------------------------------------------------------------------
+def getNotifications(event):
+    notifications = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:sqs':
+            # The test event sent by S3 when the notification
+            # is configured doesn't contain any record:
+            body = json.loads(record['body'])
+            for s3Record in body.get('Records', []):
+                notifications.append((record['messageId'], s3Record))
+
+        else:
+            notifications.append((None, record))
+
+    return notifications
+
+# -------------------------------------------------------------------
+# Reads the input file of an inference results file and converts its
+# rows into DynamoDB items (the errors are returned, not raised, so
+# that the other files of the batch are still stored)
+# -------------------------------------------------------------------
+def readInput(notification, requestId):
+    messageId, record = notification
+    bucket = record['s3']['bucket']['name']
+    key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+    input = {'messageId': messageId, 'key': key}
+
+    try:
+        timestamp = key.split('/')[-2][:-1].replace('-', '').replace(':', '').replace('T', '')
+        modelName = key.split('/')[1]
+        response = describeModel(l4e_client, modelName)
+        uid = response['DatasetName'][13:].split('-')[0]
+        projectName = response['DatasetName'][22:]
+        inferenceInputKey = '/'.join(key.split('/')[0:2]) + f'/input/{projectName}-{timestamp}.csv'
+        input.update({'modelName': modelName, 'datasetName': projectName, 'inferenceInputKey': inferenceInputKey})
+
+        # Duplicate deliveries of the notification are skipped after a
+        # single conditional write, before reading the input file. The
+        # SQS message id stays the same when a message is redelivered:
+        ledger = ObjectLedger(
+            ddb_client,
+            ledgerTable(f'{uid}-{projectName}'),
+            'store-inference-inputs',
+            key,
+            recordETag(s3_client, record, bucket, key),
+            messageId or requestId
+        )
+        ensureLedger(ddb_client, ledger.tableName)
+        if not ledger.claim():
+            input['status'] = 'duplicate'
+            return input
+
+        # Read the input CSV file: the inference input file will contain
+        # few rows (1 in the case of synthetic inference data, and up to
+        # 3600 in case of the largest inference period (1 hour), the small
+        # ones being decoded without pandas:
+        data = s3_client.get_object(Bucket=bucket, Key=inferenceInputKey)
+        input.update({
+            'table': f'l4edemoapp-{uid}-{projectName}',
+            'items': inferenceInputItems(data['Body'].read(), projectName),
+            'ledger': ledger,
+            'status': 'read'
+        })
+
+    except Exception as e:
+        input.update({'status': 'failed', 'error': str(e)})
+
+    return input
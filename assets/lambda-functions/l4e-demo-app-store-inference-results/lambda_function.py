@@ -1,13 +1,18 @@
-import boto3
-import json
-import pandas as pd
 import urllib
 
-from datetime import datetime
+from l4edemoapp.batch_writer import batchWriteItems
+from l4edemoapp.clients import LazyClient
+from l4edemoapp.daily_aggregates import dailyAggregates, updateDailyAggregates
+from l4edemoapp.inference_codec import inferenceInputItems
+from l4edemoapp.ledger import ObjectLedger, ensureLedger, ledgerTable, recordETag
+from l4edemoapp.metadata_cache import describeInferenceScheduler, describeModel, invalidate
+from l4edemoapp.schema import decodeJsonLines
+from l4edemoapp.tables import ensureTables
+from l4edemoapp.time_codec import toEpoch
 
-l4e_client = boto3.client('lookoutequipment')
-s3_client = boto3.client('s3')
-ddb_client = boto3.client('dynamodb')
+l4e_client = LazyClient('lookoutequipment')
+s3_client = LazyClient('s3')
+ddb_client = LazyClient('dynamodb')
 
 # ====================================================================
 # This lambda function is called whenever a new Lookout for Equipment
@@ -22,47 +27,75 @@ def lambda_handler(event, context):
     bucket = event['Records'][0]['s3']['bucket']['name']
     key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'])
     modelName = key.split('/')[1]
-    response = l4e_client.describe_model(ModelName=modelName)
+    # The model and scheduler descriptions are cached by warm functions:
+    response = describeModel(l4e_client, modelName)
     projectName = response['DatasetName'][13:]
     
-    # === TODO === Optimize the following ingestion with the batch PutItems() API
-    
-    # Inference output is in JSON lines, with last line being empty:
-    inferenceData = s3_client.get_object(Bucket=bucket, Key=key)
-    inferenceData = inferenceData['Body'].read().decode('utf-8')
-    
-    for data in inferenceData.split('\n')[:-1]:
-        data = json.loads(data)
-    
-        # Get the current unix timestamp:
-        timestamp = data['timestamp'][:19].replace('T', ' ')
-        timestamp = int(datetime.timestamp(datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')))
-        
-        # Write the anomaly to the l4edemoapp-anomalies DynamoDB table:
-        if ('prediction' not in data.keys()):
-            anomaly = 0
-        else:
-            anomaly = data['prediction']
-        storeAnomaly(modelName, timestamp, anomaly, projectName)
+    # Duplicate deliveries of the notification are skipped, and the
+    # retries of a failed invocation resume after the tables it wrote:
+    ledger = ObjectLedger(
+        ddb_client,
+        ledgerTable(projectName),
+        'store-inference-results',
+        key,
+        recordETag(s3_client, event['Records'][0], bucket, key),
+        context.aws_request_id
+    )
+    ensureLedger(ddb_client, ledger.tableName)
+    if not ledger.claim():
+        return {
+            'statusCode': 200,
+            'bucket': bucket,
+            'file': key,
+            'modelName': modelName,
+            'duplicate': True
+        }
+            
+    # The raw anomalies table is not created at training time (and the
+    # sensor contribution one only when the model detected anomalies).
+    # Tables already seen by this (warm) function are not checked again:
+    resultTables = [
+        f'l4edemoapp-{projectName}-anomalies',
+        f'l4edemoapp-{projectName}-raw-anomalies',
+        f'l4edemoapp-{projectName}-sensor_contribution'
+    ]
+    dailyRateTable = f'l4edemoapp-{projectName}-daily_rate'
+    pendingTables = [t for t in resultTables + [dailyRateTable] if not ledger.isCommitted(t)]
+    
+    if len(pendingTables) > 0:
+        anomalies, rawAnomalies, sensorContributions, results = readInferenceResults(bucket, key, modelName)
+        itemsPerTable = dict(zip(resultTables, [anomalies, rawAnomalies, sensorContributions]))
+        itemsPerTable = {table: items for table, items in itemsPerTable.items() if table in pendingTables}
+        ensureTables(ddb_client, pendingTables)
         
-        # Write the raw anomaly score to the 
-        # l4edemoapp-raw-anomalies DynamoDB table:
-        if ('anomaly_score' not in data.keys()):
-            score = 0.0
-        else:
-            score = data['anomaly_score']
-        storeRawAnomaly(modelName, timestamp, score, projectName)
+        # Write all the results with batched requests:
+        summary = batchWriteItems(ddb_client, itemsPerTable)
+        print(f"{summary['items']} items written with {summary['calls']} BatchWriteItem calls")
+        writtenTables = [t for t in itemsPerTable.keys() if t not in summary['unprocessedItems']]
         
-        # Write the diagnostic data to the l4edemoapp-XXX-sensor_contribution
-        # DynamoDB table where XXX is the name of the dataset / project:
-        if ('diagnostics' in data.keys()):
-            print('Processing diagnostics data')
-            storeSensorContribution(modelName, timestamp, data['diagnostics'], projectName)
-        else:
-            print('No diagnostics data to process')
+        # Keep the daily aggregates of the live results up to date (the
+        # dashboards then read one item per day instead of every result).
+        # The file is recorded in the ledger for each day so that it's
+        # never added twice:
+        if not ledger.isCommitted(dailyRateTable):
+            if len(results['timestamps']) > 0:
+                daily = dailyAggregates(results['timestamps'], results['anomalies'], results['scores'], results['contributions'])
+                numDays = updateDailyAggregates(ddb_client, dailyRateTable, modelName, daily, sourceId=key, ledgerTableName=ledger.tableName)
+                print(f'Daily aggregates updated for {numDays} day(s)')
+                
+            writtenTables.append(dailyRateTable)
+            
+        # The tables whose items are all written are committed in the
+        # ledger with a single request. The invocation then fails if some
+        # items could not be written: its asynchronous retries keep the
+        # same request id and resume with the uncommitted tables only
+        ledger.commit(*writtenTables)
+        if len(summary['unprocessedItems']) > 0:
+            raise Exception(f"Items could not be written in: {', '.join(summary['unprocessedItems'].keys())}")
 
     # Processing input file:
-    response = l4e_client.describe_inference_scheduler(InferenceSchedulerName=modelName + '-scheduler')
+    schedulerName = modelName + '-scheduler'
+    response = describeInferenceScheduler(l4e_client, schedulerName)
     timestampFormat = response['DataInputConfiguration']['InferenceInputNameConfiguration']['TimestampFormat']
     componentTimestampDelimiter = response['DataInputConfiguration']['InferenceInputNameConfiguration']['ComponentTimestampDelimiter']
     
@@ -72,11 +105,29 @@ def lambda_handler(event, context):
         timestamp = key.split('/')[-2][:-1].replace(':', '-').replace('T', '-')
     elif timestampFormat == 'epoch':
         timestamp = key.split('/')[-2][:-1].replace('T', ' ')
-        timestamp = (pd.to_datetime(timestamp) - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
+        timestamp = toEpoch(timestamp)
         
     inferenceInputKey = '/'.join(key.split('/')[0:2]) + f'/input/{projectName[9:]}{componentTimestampDelimiter}{timestamp}.csv'
     print(inferenceInputKey)
-    storeInput(bucket, inferenceInputKey, projectName)
+    inputStages = []
+    if not ledger.isCommitted('input'):
+        try:
+            summary = storeInput(bucket, inferenceInputKey, projectName)
+            
+        # The scheduler may have been recreated with another input file
+        # name format since its description was cached:
+        except s3_client.exceptions.NoSuchKey:
+            invalidate(schedulerName)
+            raise
+            
+        # The input is stored again by the retries of this invocation:
+        if len(summary['unprocessedItems']) > 0:
+            raise Exception(f'Inference input items could not be written in l4edemoapp-{projectName}')
+            
+        inputStages = ['input']
+    
+    # All the tables are written: the input is committed with the completion
+    ledger.complete(*inputStages)
     
     return {
         'statusCode': 200,
@@ -85,129 +136,92 @@ def lambda_handler(event, context):
         'modelName': modelName
     }
     
-def storeInput(bucket, inferenceInputKey, projectName):
-    data = s3_client.get_object(Bucket=bucket, Key=inferenceInputKey)
-    df = pd.read_csv(data['Body'])
-
-    # Add new columns:
-    timestampCol = list(df.columns)[0]
-    df = df.rename(columns={timestampCol: 'timestamp'})
-    df['sampling_rate'] = 'raw'
-    df['asset'] = projectName[9:]
-    df['unix_timestamp'] = (pd.to_datetime(df['timestamp']) - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
-    df['unix_timestamp'] = df['unix_timestamp'].astype(float)
-    
-    # === TODO === Optimize the following ingestion with the batch PutItems() API
+# ------------------------------------------------------------------
+# Reads an inference results file (JSON lines) and builds the items of
+# the anomalies, raw anomalies and sensor contribution tables
+# ------------------------------------------------------------------
+def readInferenceResults(bucket, key, modelName):
+    # Inference output is in JSON lines, with last line being empty:
+    inferenceData = s3_client.get_object(Bucket=bucket, Key=key)
+    inferenceData = inferenceData['Body'].read().decode('utf-8')
     
+    anomalies = []
+    rawAnomalies = []
+    sensorContributions = []
+    results = {'timestamps': [], 'anomalies': [], 'scores': [], 'contributions': []}
+    for data in decodeJsonLines(inferenceData):
+        # Get the current unix timestamp:
+        timestamp = toEpoch(data['timestamp'])
+        
+        # Anomaly for the l4edemoapp-anomalies DynamoDB table:
+        if ('prediction' not in data.keys()):
+            anomaly = 0
+        else:
+            anomaly = data['prediction']
+        anomalies.append(buildAnomalyItem(modelName, timestamp, anomaly))
+        
+        # Raw anomaly score for the 
+        # l4edemoapp-raw-anomalies DynamoDB table:
+        if ('anomaly_score' not in data.keys()):
+            score = 0.0
+        else:
+            score = data['anomaly_score']
+        rawAnomalies.append(buildRawAnomalyItem(modelName, timestamp, score))
+        
+        # Diagnostic data for the l4edemoapp-XXX-sensor_contribution
+        # DynamoDB table where XXX is the name of the dataset / project:
+        contributions = {}
+        if ('diagnostics' in data.keys()):
+            contributions = getContributions(data['diagnostics'])
+            sensorContributions.append(buildSensorContributionItem(modelName, timestamp, contributions))
+            
+        results['timestamps'].append(timestamp)
+        results['anomalies'].append(anomaly)
+        results['scores'].append(score)
+        results['contributions'].append(contributions)
+
+    print(f'Processing {len(anomalies)} inference results ({len(sensorContributions)} with diagnostics data)')
+
+    return anomalies, rawAnomalies, sensorContributions, results
+
+def storeInput(bucket, inferenceInputKey, projectName):
     # Ingest this content in DynamoDB: the inference input file will contain few 
     # rows (1 in the case of synthetic inference data, and up to 3600 in case of
-    # the largest inference period (1 hour):
-    for index, row in df.iterrows():
-        item = {}
-        for key, values in eval(row.to_json()).items():
-            if key == 'unix_timestamp':
-                item.update({key: {'N': str(values)}})
-            else:
-                item.update({key: {'S': str(values)}})
-                
-        ddb_client.put_item(TableName=f'l4edemoapp-{projectName}', Item=item)
-
-def storeAnomaly(model, timestamp, anomaly, project):
-    ddb_client.put_item(
-        TableName=f'l4edemoapp-{project}-anomalies',
-        Item={
-            'model': {'S': model},
-            'timestamp': {'N': str(timestamp)},
-            'anomaly': {'N': str(anomaly)}
-        }
-    )
+    # the largest inference period (1 hour), the small ones being decoded
+    # without pandas:
+    data = s3_client.get_object(Bucket=bucket, Key=inferenceInputKey)
+    items = inferenceInputItems(data['Body'].read(), projectName[9:])
     
-def storeRawAnomaly(model, timestamp, raw_anomaly, project):
-    table = f'l4edemoapp-{project}-raw-anomalies'
-    result = ddbTableExists(table)
-    if not result: 
-        print(f'Table {table} does not exist, creating it...')
-        result = ddbCreateTable(table)
-        
-    ddb_client.put_item(
-        TableName=table,
-        Item={
-            'model': {'S': model},
-            'timestamp': {'N': str(timestamp)},
-            'anomaly_score': {'N': str(raw_anomaly)}
-        }
-    )
+    return batchWriteItems(ddb_client, {f'l4edemoapp-{projectName}': items})
+
+def buildAnomalyItem(model, timestamp, anomaly):
+    return {
+        'model': {'S': model},
+        'timestamp': {'N': str(timestamp)},
+        'anomaly': {'N': str(anomaly)}
+    }
     
-def storeSensorContribution(model, timestamp, diagnostics, project):
-    items = {
+def buildRawAnomalyItem(model, timestamp, raw_anomaly):
+    return {
         'model': {'S': model},
-        'timestamp': {'N': str(timestamp)}
+        'timestamp': {'N': str(timestamp)},
+        'anomaly_score': {'N': str(raw_anomaly)}
     }
+    
+def getContributions(diagnostics):
+    contributions = {}
     for sensorContribution in diagnostics:
         tag = sensorContribution['name'].split('\\')[1]
-        value = sensorContribution['value']
-        
-        items.update({tag: {'N': str(value)}})
-        
-    ddb_client.put_item(
-        TableName=f'l4edemoapp-{project}-sensor_contribution',
-        Item=items
-    )
-    
-# ---------------------------------
-# Checks if a DynamoDB table exists
-# ---------------------------------
-def ddbTableExists(tableName):
-    try:
-        response = ddb_client.describe_table(TableName=tableName)
+        contributions.update({tag: sensorContribution['value']})
         
-    except Exception as e:
-        return False
-
-    return response['Table']['TableStatus']
+    return contributions
     
-# ------------------------
-# Creates a DynamoDB table
-# ------------------------
-def ddbCreateTable(tableName):
-    print(tableName)
-    
-    try:
-        response = ddb_client.create_table(
-            TableName=tableName,
-            AttributeDefinitions=[
-                {
-                    'AttributeName': 'model',
-                    'AttributeType': 'S'
-                },
-                {
-                    'AttributeName': 'timestamp',
-                    'AttributeType': 'N'
-                }
-            ],
-            KeySchema=[
-                {
-                    'AttributeName': 'model',
-                    'KeyType': 'HASH'
-                },
-                {
-                    'AttributeName': 'timestamp',
-                    'KeyType': 'RANGE'
-                }
-            ],
-            BillingMode='PAY_PER_REQUEST',
-            TableClass='STANDARD'
-        )
-    except Exception as e:
-        print(e)
-
-    response = ddb_client.describe_table(TableName=tableName)
-    status = response['Table']['TableStatus']
-    
-    while status != 'ACTIVE':
-        time.sleep(1)
-        response = ddb_client.describe_table(TableName=tableName)
-        status = response['Table']['TableStatus']
-        print('Table creation status:', status)
+def buildSensorContributionItem(model, timestamp, contributions):
+    item = {
+        'model': {'S': model},
+        'timestamp': {'N': str(timestamp)}
+    }
+    for tag, value in contributions.items():
+        item.update({tag: {'N': str(value)}})
         
-    return status
\ No newline at end of file
+    return item
@@ -1,11 +1,17 @@
-import boto3
 import json
 import numpy as np
 import os
 import pandas as pd
 
-l4e_client = boto3.client('lookoutequipment')
-s3 = boto3.resource('s3')
+from l4edemoapp.clients import LazyClient
+from l4edemoapp.intervals import binnedMeans, rangesToMask
+from l4edemoapp.rollups import epochSeconds, rollup
+from l4edemoapp.s3_sink import writeCsvFiles
+from l4edemoapp.schema import parseSchema
+from l4edemoapp.time_codec import toEpochArray
+
+l4e_client = LazyClient('lookoutequipment')
+s3_client = LazyClient('s3')
 
 def lambda_handler(event, context):
     samplingRate = '5min'
@@ -13,13 +19,14 @@ def lambda_handler(event, context):
     bucket = os.environ['BUCKET']
     
     modelName = event['modelName']
+    # Not cached: the training ranges, schema and metrics of a model
+    # change each time it is retrained
     modelDescription = l4e_client.describe_model(ModelName=modelName)
     datasetName = modelDescription['DatasetName']
     assetName = datasetName[len('l4e-demo-app-'):]
     startTime = pd.to_datetime(modelDescription['TrainingDataStartTime']).tz_localize(None)
     endTime = pd.to_datetime(modelDescription['EvaluationDataEndTime']).tz_localize(None)
-    schema = modelDescription['Schema']
-    tagsList = getTags(json.loads(schema))
+    tagsList = list(parseSchema(modelDescription['Schema']).tags)
     predictedRanges = json.loads(modelDescription['ModelMetrics'])['predicted_ranges']
 
     if len(predictedRanges) > 0:
@@ -37,12 +44,12 @@ def lambda_handler(event, context):
         samplingRate
     )
     
-    # Daily rate:
-    df = anomaliesDataframe.copy()
-    currentDay = df.reset_index()['index'].dt.strftime('%Y-%m-%d')
-    currentDay.index = df.index
-    df['day'] = pd.to_datetime(currentDay)
-    dailyRateDataframe = df.groupby('day').sum()
+    # Daily rate (indexed by the start of each day in epoch seconds):
+    dailyRateDataframe = rollup(
+        epochSeconds(anomaliesDataframe.index),
+        anomaliesDataframe['Anomaly'],
+        levels=['daily']
+    )['daily']
     
     # Sensor contribution:
     sensorContributionDataframe = buildSensorContribution(
@@ -96,62 +103,55 @@ def lambda_handler(event, context):
     }
     
 def uploadCSVtoS3(anomalies, dailyRate, sensorContribution, bucket, asset, model):
-    fname = '/tmp/anomalies.csv'
     anomalies.index.name = 'timestamp'
     anomalies = anomalies.reset_index()
-    anomalies['timestamp'] = (anomalies['timestamp'] - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
+    anomalies['timestamp'] = toEpochArray(anomalies['timestamp'])
     anomalies.columns = ['timestamp', 'anomaly']
     # anomalies['model'] = asset[9:] + '|' + model
     anomalies['model'] = model
     anomaliesFields = {f: 'S' for f in list(anomalies.columns)[1:]}
     anomaliesFields.update({'timestamp': 'N'})
-    anomalies.to_csv(fname, index=None)
-    targetBucket = s3.Bucket(bucket)
     anomaliesKey = f'model-results/{asset}/anomalies.csv'
-    targetBucket.upload_file(fname, anomaliesKey)
     
-    fname = '/tmp/daily_rate.csv'
-    dailyRate.index.name = 'timestamp'
     dailyRate = dailyRate.reset_index()
-    dailyRate['timestamp'] = (dailyRate['timestamp'] - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
     dailyRate.columns = ['timestamp', 'anomaly']
     # dailyRate['model'] = asset[9:] + '|' + model
     dailyRate['model'] = model
-    dailyRate.to_csv(fname, index=None)
     dailyRateKey = f'model-results/{asset}/daily_rate.csv'
-    targetBucket.upload_file(fname, dailyRateKey)
     dailyRateFields = {f: 'S' for f in list(dailyRate.columns)[1:]}
     dailyRateFields.update({'timestamp': 'N'})
     
+    outputs = [
+        (anomalies, bucket, anomaliesKey, {'index': None}),
+        (dailyRate, bucket, dailyRateKey, {'index': None})
+    ]
+    csvKeys = {
+        'anomaliesKey': anomaliesKey,
+        'anomaliesFields': anomaliesFields,
+        'dailyRateKey': dailyRateKey,
+        'dailyRateFields': dailyRateFields
+    }
+    
     if sensorContribution is not None:
-        fname = '/tmp/sensor_contribution.csv'
         sensorContribution.index.name = 'timestamp'
         sensorContribution = sensorContribution.reset_index()
-        sensorContribution['timestamp'] = (sensorContribution['timestamp'] - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
+        sensorContribution['timestamp'] = toEpochArray(sensorContribution['timestamp'])
         # sensorContribution['model'] = asset[9:] + '|' + model
         sensorContribution['model'] = model
-        sensorContribution.to_csv(fname, index=None)
         sensorContributionKey = f'model-results/{asset}/sensor_contribution.csv'
-        targetBucket.upload_file(fname, sensorContributionKey)
         sensorContributionFields = {f: 'S' for f in list(sensorContribution.columns)[1:]}
         sensorContributionFields.update({'timestamp': 'N'})
-    
-        return {
-            'anomaliesKey': anomaliesKey,
-            'anomaliesFields': anomaliesFields,
-            'dailyRateKey': dailyRateKey,
-            'dailyRateFields': dailyRateFields,
+        
+        outputs.append((sensorContribution, bucket, sensorContributionKey, {'index': None}))
+        csvKeys.update({
             'sensorContributionKey': sensorContributionKey,
             'sensorContributionFields': sensorContributionFields
-        }
+        })
+    
+    # The files are serialized straight to S3, concurrently:
+    writeCsvFiles(s3_client, outputs)
         
-    else:
-        return {
-            'anomaliesKey': anomaliesKey,
-            'anomaliesFields': anomaliesFields,
-            'dailyRateKey': dailyRateKey,
-            'dailyRateFields': dailyRateFields
-        }
+    return csvKeys
 
 def convert_ranges(ranges_df, start_date, end_date, default_freq):
     """
@@ -179,77 +179,56 @@ def convert_ranges(ranges_df, start_date, end_date, default_freq):
         freq=default_freq
     )
     range_data = pd.DataFrame(index=range_index)
-    range_data.loc[:, 'Anomaly'] = 0.0
 
-    for _, row in ranges_df.iterrows():
-        event_start = row[0]
-        event_end = row[1]
-        if (event_start == event_end):
-            event_end = event_start + pd.Timedelta(default_freq)
-        range_data.loc[event_start:event_end, 'Anomaly'] = 1.0
+    # Events with the same start and end are given the width of one
+    # point, so that they still show up in the expanded series:
+    mask = rangesToMask(
+        ranges_df.iloc[:, 0],
+        ranges_df.iloc[:, 1],
+        range_index,
+        pointWidth=pd.Timedelta(default_freq)
+    )
+    range_data.loc[:, 'Anomaly'] = mask.astype(float)
         
     return range_data
     
-def getTags(schema):
-    columns = schema['Components'][0]['Columns']
-
-    tagsList = []
-    for tag in columns:
-        if (tag['Type'] != 'DATETIME'):
-            tagsList.append(tag['Name'])
-            
-    return tagsList
-    
-def expandResults(predictedRanges, tagsList, assetName, samplingRate, aggregationLevel):
-    expandedResults = []
-    for index, row in predictedRanges.iterrows():
-        newRow = dict()
-        newRow.update({'start': row['start']})
-        newRow.update({'end': row['end']})
-        newRow.update({'prediction': 1.0})
-
-        diagnostics = pd.DataFrame(row['diagnostics'])
-        diagnostics = dict(zip(diagnostics['name'], diagnostics['value']))
-        newRow = {**newRow, **diagnostics}
-
-        expandedResults.append(newRow)
-
-    expandedResults = pd.DataFrame(expandedResults)
-    
-    dfList = []
-    for index, row in expandedResults.iterrows():
-        newIndex = pd.date_range(start=row['start'], end=row['end'], freq=samplingRate)
-        newDataframe = pd.DataFrame(index=newIndex)
-
-        for tag in tagsList:
-            if (f'{assetName[9:]}\\{tag}' in list(row.index)):
-                newDataframe[tag] = row[f'{assetName[9:]}\\{tag}']
-            else:
-                newDataframe[tag] = np.nan
-
-        dfList.append(newDataframe)
-    
-    if len(dfList) > 0:
-        expandedResults = pd.concat(dfList, axis='index')
-    else:
-        expandedResults = None
+def getContributions(predictedRanges, tagsList, assetName):
+    """
+    Returns the contribution of each tag to each predicted range (one
+    row per range and one column per tag, NaN when the diagnostics of a
+    range don't mention a tag)
+    """
+    tagPositions = {f'{assetName[9:]}\\{tag}': position for position, tag in enumerate(tagsList)}
+    contributions = np.full((len(predictedRanges), len(tagsList)), np.nan)
     
-    return expandedResults
+    for rangePosition, diagnostics in enumerate(predictedRanges['diagnostics']):
+        for diagnostic in diagnostics:
+            position = tagPositions.get(diagnostic['name'])
+            if position is not None:
+                contributions[rangePosition, position] = diagnostic['value']
+                
+    return contributions
     
 def buildSensorContribution(predictedRanges, tagsList, assetName, anomaliesDataframe, samplingRate, aggregationLevel):
-    sensorContributionDataframe = expandResults(
-        predictedRanges, 
-        tagsList, 
-        assetName, 
-        samplingRate, 
-        aggregationLevel
+    if len(predictedRanges) == 0:
+        return None
+        
+    # Mean contribution of each tag over each day, computed from the
+    # number of points each range spends in the day (the ranges are not
+    # expanded on the sampling rate grid):
+    new_index = anomaliesDataframe.resample(aggregationLevel).mean().index
+    contributions = binnedMeans(
+        predictedRanges['start'],
+        predictedRanges['end'],
+        getContributions(predictedRanges, tagsList, assetName),
+        step=samplingRate,
+        binStart=new_index[0],
+        binWidth=aggregationLevel,
+        numBins=len(new_index)
     )
     
-    if sensorContributionDataframe is not None:
-        sensorContributionDataframe = sensorContributionDataframe.resample(aggregationLevel).mean()
-        new_index = anomaliesDataframe.resample(aggregationLevel).mean().index
-        sensorContributionDataframe = sensorContributionDataframe.reindex(new_index)
-        sensorContributionDataframe = sensorContributionDataframe.replace(to_replace=np.nan, value=0.0)
-        sensorContributionDataframe.index.name = 'day'
+    sensorContributionDataframe = pd.DataFrame(contributions, index=new_index, columns=tagsList)
+    sensorContributionDataframe = sensorContributionDataframe.replace(to_replace=np.nan, value=0.0)
+    sensorContributionDataframe.index.name = 'day'
     
     return sensorContributionDataframe
\ No newline at end of file
@@ -0,0 +1,86 @@
+# ========================================================================
+# Compares the number of DynamoDB API calls and the wall time needed to
+# store the content of a one-hour inference results file (3,600 JSON
+# lines at 1 s) with one put_item() per item versus batchWriteItems().
+# DynamoDB is mocked with moto:
+#
+#     pip install boto3 moto
+#     python benchmark_batch_writer.py
+# ========================================================================
+import os
+import sys
+import time
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.batch_writer import batchWriteItems
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+NUM_LINES = 3600
+NUM_TAGS = 30
+TABLES = ['anomalies', 'raw-anomalies', 'sensor_contribution']
+
+def createTables(ddbClient):
+    for table in TABLES:
+        ddbClient.create_table(
+            TableName=f'l4edemoapp-bench-{table}',
+            AttributeDefinitions=[
+                {'AttributeName': 'model', 'AttributeType': 'S'},
+                {'AttributeName': 'timestamp', 'AttributeType': 'N'}
+            ],
+            KeySchema=[
+                {'AttributeName': 'model', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+def buildItems():
+    itemsPerTable = {f'l4edemoapp-bench-{table}': [] for table in TABLES}
+    for i in range(NUM_LINES):
+        key = {'model': {'S': 'bench-model'}, 'timestamp': {'N': str(1700000000 + i)}}
+        itemsPerTable['l4edemoapp-bench-anomalies'].append({**key, 'anomaly': {'N': str(i % 2)}})
+        itemsPerTable['l4edemoapp-bench-raw-anomalies'].append({**key, 'anomaly_score': {'N': '0.42'}})
+        itemsPerTable['l4edemoapp-bench-sensor_contribution'].append({
+            **key, **{f'Sensor{t}': {'N': str(1.0 / NUM_TAGS)} for t in range(NUM_TAGS)}
+        })
+
+    return itemsPerTable
+
+def countCalls(ddbClient):
+    counter = {'calls': 0}
+    def increment(**kwargs):
+        counter['calls'] += 1
+
+    ddbClient.meta.events.register('before-call.dynamodb', increment)
+    return counter
+
+@mock_aws
+def run():
+    ddbClient = boto3.client('dynamodb', region_name='eu-west-1')
+    createTables(ddbClient)
+    itemsPerTable = buildItems()
+    counter = countCalls(ddbClient)
+
+    start = time.perf_counter()
+    for table, items in itemsPerTable.items():
+        for item in items:
+            ddbClient.put_item(TableName=table, Item=item)
+    putItemDuration = time.perf_counter() - start
+    putItemCalls = counter['calls']
+
+    counter['calls'] = 0
+    start = time.perf_counter()
+    summary = batchWriteItems(ddbClient, itemsPerTable)
+    batchDuration = time.perf_counter() - start
+
+    print(f'Items written:        {summary["items"]}')
+    print(f'put_item():           {putItemCalls:>6} calls {putItemDuration:8.2f} s')
+    print(f'batchWriteItems():    {counter["calls"]:>6} calls {batchDuration:8.2f} s')
+
+if __name__ == '__main__':
+    run()
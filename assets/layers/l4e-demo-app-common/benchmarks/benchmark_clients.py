@@ -0,0 +1,92 @@
+# ========================================================================
+# Compares the cold start of a function creating its S3, DynamoDB and
+# Lookout for Equipment clients at import time with the default settings
+# (as the functions used to) versus declaring them with LazyClient, which
+# only builds the client of the first call. Each measure runs in a fresh
+# Python process: the time to import boto3 and declare the clients, then
+# the time of the first S3 call (building the client, the request and
+# parsing the response), sent to a stub instead of AWS:
+#
+#     pip install boto3
+#     python benchmark_clients.py
+# ========================================================================
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+NUM_PROCESSES = 7
+LISTING = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+    b'<Name>benchmark-bucket</Name><KeyCount>0</KeyCount><IsTruncated>false</IsTruncated>'
+    b'</ListBucketResult>'
+)
+
+class StubBody:
+    def __init__(self, content):
+        self.content = content
+
+    def stream(self, **kwargs):
+        yield self.content
+
+def stubResponse(request, **kwargs):
+    from botocore.awsrequest import AWSResponse
+    return AWSResponse(request.url, 200, {'Content-Type': 'application/xml'}, StubBody(LISTING))
+
+def eager():
+    import boto3
+    boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register('before-send', stubResponse)
+    clients = {
+        'lookoutequipment': boto3.client('lookoutequipment'),
+        's3': boto3.client('s3'),
+        'dynamodb': boto3.client('dynamodb')
+    }
+    return clients
+
+def lazy():
+    from l4edemoapp.clients import LazyClient, getSession
+    getSession().events.register('before-send', stubResponse)
+    clients = {
+        'lookoutequipment': LazyClient('lookoutequipment'),
+        's3': LazyClient('s3'),
+        'dynamodb': LazyClient('dynamodb')
+    }
+    return clients
+
+def child(mode):
+    start = time.perf_counter()
+    clients = eager() if mode == 'eager' else lazy()
+    declared = time.perf_counter()
+    clients['s3'].list_objects_v2(Bucket='benchmark-bucket')
+    called = time.perf_counter()
+    pool = clients['s3'].meta.config.max_pool_connections
+    print(f'{declared - start} {called - declared} {pool}')
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        child(sys.argv[1])
+        sys.exit(0)
+
+    for label, mode in [('Eager default clients', 'eager'), ('LazyClient', 'lazy')]:
+        imports, calls = [], []
+        for _ in range(NUM_PROCESSES):
+            output = subprocess.run([sys.executable, __file__, mode], capture_output=True, text=True, check=True)
+            declare, call, pool = output.stdout.split()
+            imports.append(float(declare))
+            calls.append(float(call))
+
+        print(
+            f'{label:22s} import + clients: {statistics.median(imports) * 1000:6.1f} ms, '
+            f'first S3 call: {statistics.median(calls) * 1000:6.1f} ms, '
+            f'total: {(statistics.median(imports) + statistics.median(calls)) * 1000:6.1f} ms '
+            f'(pool of {pool} connections)'
+        )
@@ -0,0 +1,46 @@
+# ========================================================================
+# Compares the size and the parsing time of the CSV and Parquet versions
+# of a 30-sensor dataset spanning 2 years at 5-minute resolution (about
+# 210,000 rows), as read by getDataframe() in prepare-replay-data:
+#
+#     pip install numpy pandas pyarrow
+#     python benchmark_columnar.py
+# ========================================================================
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+NUM_SENSORS = 30
+
+def buildDataframe():
+    index = pd.date_range(start='2021-01-01', end='2022-12-31 23:55:00', freq='5min', name='timestamp')
+    values = np.random.default_rng(42).normal(size=(len(index), NUM_SENSORS))
+    return pd.DataFrame(values, index=index, columns=[f'Sensor{i}' for i in range(NUM_SENSORS)])
+
+def parse(df):
+    timestampCol = list(df.columns)[0]
+    df[timestampCol] = pd.to_datetime(df[timestampCol])
+    return df.set_index(timestampCol)
+
+if __name__ == '__main__':
+    df = buildDataframe()
+
+    csvBuffer = io.BytesIO()
+    df.to_csv(csvBuffer)
+    parquetBuffer = io.BytesIO()
+    df.reset_index().to_parquet(parquetBuffer, index=False, compression='snappy')
+
+    start = time.perf_counter()
+    csvDataframe = parse(pd.read_csv(io.BytesIO(csvBuffer.getvalue())))
+    csvDuration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parquetDataframe = parse(pd.read_parquet(io.BytesIO(parquetBuffer.getvalue())))
+    parquetDuration = time.perf_counter() - start
+
+    print(f'Dataset shape:  {df.shape}')
+    print(f'Same content:   {np.allclose(csvDataframe.values, parquetDataframe.values)}')
+    print(f'CSV:            {csvBuffer.getbuffer().nbytes / 1e6:8.1f} MB {csvDuration * 1000:8.1f} ms')
+    print(f'Parquet:        {parquetBuffer.getbuffer().nbytes / 1e6:8.1f} MB {parquetDuration * 1000:8.1f} ms')
@@ -0,0 +1,80 @@
+# ========================================================================
+# Measures the cold start of the store-inference-inputs and
+# store-inference-results functions with python -X importtime, now that
+# pandas is only imported for the large inference input files, versus
+# importing pandas (and the item encoder) at module load as they used to.
+# Each import runs in a fresh Python process (median of 5), which also
+# reports its peak memory. The decoding of a 1 row inference input file
+# (synthetic inference data) with the csv module is then compared with
+# the pandas path (once pandas is imported):
+#
+#     pip install boto3 pandas
+#     python benchmark_inference_codec.py
+# ========================================================================
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+
+LAYER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'python'))
+FUNCTIONS = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'lambda-functions'))
+sys.path.insert(0, LAYER)
+from l4edemoapp.inference_codec import decodePandasInput, decodeSmallInput
+
+NUM_PROCESSES = 5
+NUM_TAGS = 30
+
+# -X importtime writes one line per module to stderr:
+# import time: self [us] | cumulative | imported package
+def importTime(function, preload):
+    environment = {**os.environ, 'PYTHONPATH': LAYER, 'AWS_DEFAULT_REGION': 'us-east-1'}
+    code = f'{preload}import lambda_function, resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)'
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=os.path.join(FUNCTIONS, function),
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    total = 0
+    modules = set()
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+
+        # Top-level imports (not indented) include their dependencies:
+        if not name.startswith('  '):
+            total += int(cumulative)
+
+    return total / 1e6, int(output.stdout) / 1024, 'pandas' in modules
+
+def buildInput(numRows):
+    lines = ['Timestamp,' + ','.join(f'Sensor{t}' for t in range(NUM_TAGS))]
+    for row in range(numRows):
+        lines.append(f'2023-01-01 00:00:{row % 60:02d},' + ','.join(str(round(0.1 * t + row, 3)) for t in range(NUM_TAGS)))
+
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+if __name__ == '__main__':
+    for function in ['l4e-demo-app-store-inference-inputs', 'l4e-demo-app-store-inference-results']:
+        print(f'{function}:')
+        for label, preload in [
+            ('pandas at module load', 'import pandas, l4edemoapp.item_encoder; '),
+            ('lazy pandas', '')
+        ]:
+            runs = [importTime(function, preload) for _ in range(NUM_PROCESSES)]
+            duration = statistics.median([run[0] for run in runs])
+            memory = statistics.median([run[1] for run in runs])
+            print(f'  {label:22s} imports: {duration * 1000:6.1f} ms, peak memory: {memory:5.1f} MB, pandas imported: {runs[0][2]}')
+
+    body = buildInput(1)
+    assert decodeSmallInput(body, 'pump') == decodePandasInput(body, 'pump')
+    for label, decode in [('pandas', decodePandasInput), ('csv module', decodeSmallInput)]:
+        duration = min(timeit.repeat(lambda: decode(body, 'pump'), number=100, repeat=5)) / 100
+        print(f'Decoding a 1 row input file with {label:10s} {duration * 1e6:8.1f} us')
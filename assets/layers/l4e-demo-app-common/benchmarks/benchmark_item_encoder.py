@@ -0,0 +1,61 @@
+# ========================================================================
+# Compares the time needed to convert a one-hour inference input file
+# (3,600 rows at 1 s, 50 tags) into DynamoDB items with the previous
+# iterrows() / eval(row.to_json()) loop versus encodeDataframe():
+#
+#     pip install numpy pandas
+#     python benchmark_item_encoder.py
+# ========================================================================
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.item_encoder import encodeDataframe
+
+NUM_ROWS = 3600
+NUM_TAGS = 50
+
+def buildDataframe():
+    timestamps = pd.date_range(start='2023-01-01', periods=NUM_ROWS, freq='1s')
+    values = np.round(np.random.default_rng(42).normal(size=(NUM_ROWS, NUM_TAGS)), 4)
+    df = pd.DataFrame(values, columns=[f'Sensor{i}' for i in range(NUM_TAGS)])
+    df.insert(0, 'timestamp', timestamps.strftime('%Y-%m-%d %H:%M:%S'))
+    df['sampling_rate'] = 'raw'
+    df['asset'] = 'bench'
+    df['unix_timestamp'] = (pd.to_datetime(df['timestamp']) - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
+    df['unix_timestamp'] = df['unix_timestamp'].astype(float)
+
+    return df
+
+def encodeRows(df):
+    items = []
+    for index, row in df.iterrows():
+        item = {}
+        for key, values in eval(row.to_json()).items():
+            if key == 'unix_timestamp':
+                item.update({key: {'N': str(values)}})
+            else:
+                item.update({key: {'S': str(values)}})
+
+        items.append(item)
+
+    return items
+
+if __name__ == '__main__':
+    df = buildDataframe()
+
+    start = time.perf_counter()
+    rowItems = encodeRows(df)
+    rowDuration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columnItems = encodeDataframe(df, fieldTypes={'unix_timestamp': 'N'})
+    columnDuration = time.perf_counter() - start
+
+    print(f'Identical items:      {rowItems == columnItems}')
+    print(f'iterrows() + eval():  {rowDuration * 1000:8.1f} ms')
+    print(f'encodeDataframe():    {columnDuration * 1000:8.1f} ms')
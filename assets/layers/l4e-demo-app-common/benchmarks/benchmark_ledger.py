@@ -0,0 +1,105 @@
+# ========================================================================
+# Compares the API calls made by a redelivered S3 notification of a
+# one-hour inference results file (3,600 JSON lines at 1 s) when every
+# delivery downloads the file and rewrites all its items in the anomalies,
+# raw anomalies and sensor contribution tables, versus a delivery checked
+# against the ObjectLedger first. AWS is mocked with moto:
+#
+#     pip install boto3 moto
+#     python benchmark_ledger.py
+# ========================================================================
+import json
+import os
+import sys
+import time
+
+from collections import Counter
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.batch_writer import batchWriteItems
+from l4edemoapp.ledger import ObjectLedger, ensureLedger
+from l4edemoapp.schema import decodeJsonLines
+from l4edemoapp.tables import ensureTables
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+BUCKET = 'benchmark-bucket'
+KEY = 'inference-data/bench-model/output/2023-01-01T00:00:00Z/results.jsonl'
+NUM_LINES = 3600
+NUM_TAGS = 30
+TABLES = ['l4edemoapp-bench-anomalies', 'l4edemoapp-bench-raw-anomalies', 'l4edemoapp-bench-sensor_contribution']
+LEDGER = 'l4edemoapp-bench-ledger'
+
+def buildResults():
+    lines = []
+    for i in range(NUM_LINES):
+        lines.append(json.dumps({
+            'timestamp': f'2023-01-01T{i // 3600:02d}:{(i // 60) % 60:02d}:{i % 60:02d}.000000',
+            'prediction': i % 2,
+            'anomaly_score': 0.42,
+            'diagnostics': [{'name': f'pump\\Sensor{t}', 'value': 1.0 / NUM_TAGS} for t in range(NUM_TAGS)]
+        }))
+
+    return '\n'.join(lines) + '\n'
+
+def countCalls(*clients):
+    counter = Counter()
+    def increment(model, **kwargs):
+        counter[model.name] += 1
+
+    for client in clients:
+        client.meta.events.register('before-call', increment, unique_id='call-counter')
+
+    return counter
+
+def storeResults(s3Client, ddbClient):
+    data = s3Client.get_object(Bucket=BUCKET, Key=KEY)['Body'].read().decode('utf-8')
+    itemsPerTable = {table: [] for table in TABLES}
+    for index, result in enumerate(decodeJsonLines(data)):
+        key = {'model': {'S': 'bench-model'}, 'timestamp': {'N': str(1672531200 + index)}}
+        itemsPerTable[TABLES[0]].append({**key, 'anomaly': {'N': str(result['prediction'])}})
+        itemsPerTable[TABLES[1]].append({**key, 'anomaly_score': {'N': str(result['anomaly_score'])}})
+        itemsPerTable[TABLES[2]].append({
+            **key, **{d['name'].split('\\')[1]: {'N': str(d['value'])} for d in result['diagnostics']}
+        })
+
+    batchWriteItems(ddbClient, itemsPerTable)
+
+def deliver(s3Client, ddbClient, etag, requestId, withLedger):
+    if withLedger:
+        ledger = ObjectLedger(ddbClient, LEDGER, 'benchmark', KEY, etag, requestId)
+        if not ledger.claim():
+            return
+
+    storeResults(s3Client, ddbClient)
+    if withLedger:
+        ledger.complete()
+
+if __name__ == '__main__':
+    results = buildResults()
+
+    with mock_aws():
+        s3Client = boto3.client('s3')
+        s3Client.create_bucket(Bucket=BUCKET)
+        etag = s3Client.put_object(Bucket=BUCKET, Key=KEY, Body=results)['ETag'].strip('"')
+
+        ddbClient = boto3.client('dynamodb')
+        ensureTables(ddbClient, TABLES)
+        ensureLedger(ddbClient, LEDGER)
+
+        for withLedger in [False, True]:
+            for delivery in ['first', 'duplicate']:
+                calls = countCalls(s3Client, ddbClient)
+                start = time.perf_counter()
+                deliver(s3Client, ddbClient, etag, f'{delivery}-{withLedger}', withLedger)
+                duration = time.perf_counter() - start
+
+                s3Client.meta.events.unregister('before-call', unique_id='call-counter')
+                ddbClient.meta.events.unregister('before-call', unique_id='call-counter')
+                label = f"{'With' if withLedger else 'Without'} ledger, {delivery} delivery:"
+                print(f'{label:35s} {dict(calls)} in {duration * 1000:8.1f} ms')
@@ -0,0 +1,120 @@
+# ========================================================================
+# Compares the storage of the input files of 100 inference results files
+# notified together (a 1 s scheduler notifying an SQS queue, or several
+# records in one S3 event) when each file is processed on its own (read,
+# then written with its own BatchWriteItem calls) versus micro-batched as
+# in store-inference-inputs: the input files are read concurrently and
+# their items are written with combined BatchWriteItem calls. AWS is
+# mocked with moto and a 20 ms latency is added to each S3 call:
+#
+#     pip install boto3 moto pandas
+#     python benchmark_micro_batching.py
+# ========================================================================
+import io
+import os
+import sys
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pandas as pd
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.batch_writer import batchWriteItems
+from l4edemoapp.item_encoder import encodeDataframe
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+BUCKET = 'benchmark-bucket'
+TABLE = 'l4edemoapp-bench-pump'
+NUM_FILES = 100
+NUM_TAGS = 10
+MAX_WORKERS = 10
+LATENCY = 0.02
+
+def addLatency(client):
+    def wait(**kwargs):
+        time.sleep(LATENCY)
+
+    client.meta.events.register('after-call.s3', wait)
+
+def countCalls(client):
+    counter = Counter()
+    def increment(model, **kwargs):
+        counter[model.name] += 1
+
+    client.meta.events.register('before-call', increment)
+    return counter
+
+# One input file per second, with a single row (synthetic inference data):
+def writeInputs(s3Client):
+    keys = []
+    for i in range(NUM_FILES):
+        timestamp = pd.Timestamp('2023-01-01') + pd.Timedelta(seconds=i)
+        df = pd.DataFrame({'Timestamp': [timestamp]})
+        for t in range(NUM_TAGS):
+            df[f'Sensor{t}'] = 0.5 + i / NUM_FILES
+
+        key = f'inference-data/bench-model/input/pump-{timestamp:%Y%m%d%H%M%S}.csv'
+        s3Client.put_object(Bucket=BUCKET, Key=key, Body=df.to_csv(index=False))
+        keys.append(key)
+
+    return keys
+
+def readItems(s3Client, key):
+    data = s3Client.get_object(Bucket=BUCKET, Key=key)
+    df = pd.read_csv(io.BytesIO(data['Body'].read()))
+    df = df.rename(columns={'Timestamp': 'timestamp'})
+    df['sampling_rate'] = 'raw'
+    df['asset'] = 'pump'
+    df['unix_timestamp'] = ((pd.to_datetime(df['timestamp']) - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')).astype(float)
+
+    return encodeDataframe(df, fieldTypes={'unix_timestamp': 'N'})
+
+def perObject(s3Client, ddbClient, keys):
+    for key in keys:
+        batchWriteItems(ddbClient, {TABLE: readItems(s3Client, key)})
+
+def microBatched(s3Client, ddbClient, keys):
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        items = [item for fileItems in executor.map(lambda key: readItems(s3Client, key), keys) for item in fileItems]
+
+    batchWriteItems(ddbClient, {TABLE: items})
+
+if __name__ == '__main__':
+    with mock_aws():
+        s3Client = boto3.client('s3')
+        s3Client.create_bucket(Bucket=BUCKET)
+        keys = writeInputs(s3Client)
+
+        ddbClient = boto3.client('dynamodb')
+        ddbClient.create_table(
+            TableName=TABLE,
+            AttributeDefinitions=[
+                {'AttributeName': 'asset', 'AttributeType': 'S'},
+                {'AttributeName': 'unix_timestamp', 'AttributeType': 'N'}
+            ],
+            KeySchema=[
+                {'AttributeName': 'asset', 'KeyType': 'HASH'},
+                {'AttributeName': 'unix_timestamp', 'KeyType': 'RANGE'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        for label, store in [('Per object', perObject), ('Micro-batched', microBatched)]:
+            reader = boto3.client('s3')
+            addLatency(reader)
+            writer = boto3.client('dynamodb')
+            calls = countCalls(writer)
+
+            start = time.perf_counter()
+            store(reader, writer, keys)
+            duration = time.perf_counter() - start
+
+            stored = ddbClient.scan(TableName=TABLE, Select='COUNT')['Count']
+            print(f'{label:15s} {duration * 1000:8.1f} ms, {dict(calls)}, {stored} items in the table')
@@ -0,0 +1,83 @@
+# ========================================================================
+# Compares the generation of the inference input files of a one-week
+# replay at 5 minutes (2,016 files, 20 tags) done one file at a time, like
+# the generate-inference-input function does for each row of the replay
+# (local CSV file + upload_file), versus writeReplayFiles() which slices
+# the whole replay and uploads the files from a pool of threads. S3 is
+# mocked with moto and a 20 ms latency is added to each request (the
+# per-invocation overhead of Lambda, which favors the bulk generator even
+# more, is not taken into account):
+#
+#     pip install boto3 moto numpy pandas
+#     python benchmark_replay.py
+# ========================================================================
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import boto3
+import numpy as np
+import pandas as pd
+
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.replay import writeReplayFiles
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+BUCKET = 'benchmark-bucket'
+NUM_TAGS = 20
+LATENCY = 0.02
+
+def addLatency(client):
+    def wait(**kwargs):
+        time.sleep(LATENCY)
+
+    client.meta.events.register('after-call.s3', wait)
+
+def buildReplay():
+    index = pd.date_range(start='2023-01-01', periods=7 * 288, freq='5min', name='timestamp')
+    values = np.round(np.random.default_rng(42).normal(size=(len(index), NUM_TAGS)), 4)
+    return pd.DataFrame(values, index=index, columns=[f'Sensor{i}' for i in range(NUM_TAGS)])
+
+def writeFileByFile(s3, df, tmpDir):
+    bucket = s3.Bucket(BUCKET)
+    for timestamp, values in df.iterrows():
+        currentTimestamp = timestamp.strftime(format='%Y%m%d%H%M%S')
+        row = {'timestamp': str(timestamp), **values.to_dict()}
+
+        localFname = os.path.join(tmpDir, f'pump-{currentTimestamp}.csv')
+        with open(localFname, 'w') as data:
+            csvWriter = csv.writer(data)
+            csvWriter.writerow(row.keys())
+            csvWriter.writerow(row.values())
+
+        bucket.upload_file(localFname, f'file-by-file/input/pump-{currentTimestamp}.csv')
+
+if __name__ == '__main__':
+    df = buildReplay()
+
+    with mock_aws():
+        s3Client = boto3.client('s3')
+        s3Client.create_bucket(Bucket=BUCKET)
+        addLatency(s3Client)
+        s3 = boto3.resource('s3')
+        addLatency(s3.meta.client)
+
+        with tempfile.TemporaryDirectory() as tmpDir:
+            start = time.perf_counter()
+            writeFileByFile(s3, df, tmpDir)
+            fileDuration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manifest = writeReplayFiles(s3Client, df, BUCKET, 'bulk/input/', 'pump', intervalSeconds=300)
+        bulkDuration = time.perf_counter() - start
+
+        print(f'Files written:        {len(df)} file by file, {manifest["numFiles"]} in bulk')
+        print(f'File by file:         {fileDuration * 1000:8.1f} ms')
+        print(f'writeReplayFiles():   {bulkDuration * 1000:8.1f} ms')
@@ -0,0 +1,97 @@
+# ========================================================================
+# Compares the output stage of the prepare-hourly-data function (raw file
+# of 200,000 rows x 10 tags, hourly file and summary) when each file is
+# staged in a local file then sent with upload_file(), versus
+# writeCsvFiles() which serializes the three dataframes straight to S3
+# with one sink each, concurrently. S3 is mocked with moto and a 20 ms
+# latency is added to each request.
+#
+# Both take about the same time (most of it is spent in to_csv): the gain
+# of the sinks is the /tmp space they don't need. The staged path needs
+# room for every file in the ephemeral storage of the function (512 MB by
+# default) while a sink only keeps one 8 MB part in memory. The benchmark
+# reports the space used in /tmp by the staged files:
+#
+#     pip install boto3 moto numpy pandas
+#     python benchmark_s3_sink.py
+# ========================================================================
+import os
+import sys
+import tempfile
+import time
+
+import boto3
+import numpy as np
+import pandas as pd
+
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.s3_sink import writeCsvFiles
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+BUCKET = 'benchmark-bucket'
+NUM_ROWS = 200000
+NUM_TAGS = 10
+LATENCY = 0.02
+
+def addLatency(client):
+    def wait(**kwargs):
+        time.sleep(LATENCY)
+
+    client.meta.events.register('after-call.s3', wait)
+
+def buildOutputs():
+    index = pd.date_range(start='2023-01-01', periods=NUM_ROWS, freq='30s', name='timestamp')
+    values = np.random.default_rng(42).normal(size=(NUM_ROWS, NUM_TAGS))
+    df = pd.DataFrame(values, index=index, columns=[f'Sensor{i}' for i in range(NUM_TAGS)])
+    df_hourly = df.resample('1h').mean().reset_index()
+    df_summary = pd.concat([df.head(20), df.tail(20)], axis='index').reset_index()
+
+    return [
+        (df_hourly, 'prepared.csv', {'index': None}),
+        (df_summary, 'summary.csv', {'index': None}),
+        (df, 'sensors.csv', {})
+    ]
+
+def writeStaged(s3, outputs, prefix, tmpDir):
+    targetBucket = s3.Bucket(BUCKET)
+    tmpSize = 0
+    for df, name, csvOptions in outputs:
+        localFname = os.path.join(tmpDir, name)
+        df.to_csv(localFname, **csvOptions)
+        targetBucket.upload_file(localFname, prefix + name)
+        tmpSize += os.path.getsize(localFname)
+
+    return tmpSize
+
+if __name__ == '__main__':
+    outputs = buildOutputs()
+
+    with mock_aws():
+        s3Client = boto3.client('s3')
+        s3Client.create_bucket(Bucket=BUCKET)
+        addLatency(s3Client)
+        s3 = boto3.resource('s3')
+        addLatency(s3.meta.client)
+
+        with tempfile.TemporaryDirectory() as tmpDir:
+            start = time.perf_counter()
+            tmpSize = writeStaged(s3, outputs, 'staged/', tmpDir)
+            stagedDuration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        writeCsvFiles(s3Client, [(df, BUCKET, 'sink/' + name, csvOptions) for df, name, csvOptions in outputs])
+        sinkDuration = time.perf_counter() - start
+
+        identical = all(
+            s3Client.get_object(Bucket=BUCKET, Key='staged/' + name)['Body'].read()
+            == s3Client.get_object(Bucket=BUCKET, Key='sink/' + name)['Body'].read()
+            for _, name, _ in outputs
+        )
+        print(f'Identical files:      {identical}')
+        print(f'/tmp + upload_file(): {stagedDuration * 1000:8.1f} ms, {tmpSize / 1024**2:5.1f} MB in /tmp')
+        print(f'writeCsvFiles():      {sinkDuration * 1000:8.1f} ms, {0:5.1f} MB in /tmp')
@@ -0,0 +1,85 @@
+# ========================================================================
+# Measures the per-row cost of eval() compared to the JSON parser on the
+# payloads handled by the Lambda functions, for one hour of data at 1 s
+# (3,600 rows, 50 tags):
+#   - rows of a dataframe serialized with row.to_json() (previous input
+#     path of the store functions)
+#   - lines of an inference results file (JSON lines with the diagnostics
+#     of the 50 tags)
+#   - model schema, evaluated for every row or parsed once by parseSchema()
+#
+#     pip install numpy pandas
+#     python benchmark_schema.py
+# ========================================================================
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.schema import decodeJsonLines, parseSchema
+
+NUM_ROWS = 3600
+NUM_TAGS = 50
+
+def buildRows():
+    timestamps = pd.date_range(start='2023-01-01', periods=NUM_ROWS, freq='1s')
+    values = np.round(np.random.default_rng(42).normal(size=(NUM_ROWS, NUM_TAGS)), 4)
+    df = pd.DataFrame(values, columns=[f'Sensor{i}' for i in range(NUM_TAGS)])
+    df.insert(0, 'timestamp', timestamps.strftime('%Y-%m-%d %H:%M:%S'))
+
+    return [row.to_json() for _, row in df.iterrows()]
+
+def buildInferenceResults():
+    timestamps = pd.date_range(start='2023-01-01', periods=NUM_ROWS, freq='1s')
+    contributions = np.random.default_rng(42).dirichlet(np.ones(NUM_TAGS), size=NUM_ROWS)
+    lines = []
+    for timestamp, values in zip(timestamps, contributions):
+        lines.append(json.dumps({
+            'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.000000'),
+            'prediction': 0,
+            'anomaly_score': 0.1234,
+            'diagnostics': [{'name': f'pump\\Sensor{i}', 'value': round(value, 5)} for i, value in enumerate(values)]
+        }))
+
+    return '\n'.join(lines) + '\n'
+
+def buildSchema():
+    columns = [{'Name': 'timestamp', 'Type': 'DATETIME'}]
+    columns += [{'Name': f'Sensor{i}', 'Type': 'DOUBLE'} for i in range(NUM_TAGS)]
+
+    return json.dumps({'Components': [{'ComponentName': 'pump', 'Columns': columns}]})
+
+def measure(label, function):
+    start = time.perf_counter()
+    result = function()
+    duration = time.perf_counter() - start
+    print(f'{label:30s} {duration * 1000:8.1f} ms {duration / NUM_ROWS * 1e6:8.1f} us/row')
+
+    return result
+
+if __name__ == '__main__':
+    rows = buildRows()
+    inferenceResults = buildInferenceResults()
+    schema = buildSchema()
+
+    print('Dataframe rows (row.to_json()):')
+    evalRows = measure('  eval()', lambda: [eval(row) for row in rows])
+    jsonRows = measure('  json.loads()', lambda: [json.loads(row) for row in rows])
+    print(f'  Identical rows: {evalRows == jsonRows}')
+
+    print('Inference results (JSON lines):')
+    evalResults = measure('  eval() per line', lambda: [eval(line) for line in inferenceResults.split('\n')[:-1]])
+    codecResults = measure('  decodeJsonLines()', lambda: decodeJsonLines(inferenceResults))
+    print(f'  Identical rows: {evalResults == codecResults}')
+
+    print('Model schema (once per row):')
+    evalTags = measure('  eval()', lambda: [
+        [c['Name'] for c in eval(schema)['Components'][0]['Columns'] if c['Name'] != 'timestamp']
+        for _ in range(NUM_ROWS)
+    ])
+    cachedTags = measure('  parseSchema()', lambda: [list(parseSchema(schema).tags) for _ in range(NUM_ROWS)])
+    print(f'  Identical tags: {evalTags == cachedTags}')
@@ -0,0 +1,94 @@
+# ========================================================================
+# Compares the daily sensor contributions computed by the former
+# expandResults() path (one 5-minute DataFrame per predicted range, then
+# resample('1D').mean()) with buildSensorContribution() of the
+# training-results-extraction function, built on binnedMeans(), which
+# only uses the bounds of the ranges, for 2,000 ranges and 50 tags over
+# one year:
+#
+#     pip install boto3 numpy pandas
+#     python benchmark_sensor_contribution.py
+# ========================================================================
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+FUNCTION = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', 'lambda-functions',
+    'l4e-demo-app-training-results-extraction', 'lambda_function.py'
+)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+spec = importlib.util.spec_from_file_location('training_results_extraction', FUNCTION)
+training_results_extraction = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(training_results_extraction)
+
+FREQ = '5min'
+NUM_RANGES = 2000
+NUM_TAGS = 50
+ASSET_NAME = 'l4e-demo-app-user-pump'
+
+def buildRanges(rng, startDate, endDate):
+    span = (endDate - startDate) // pd.Timedelta('1s')
+    starts = startDate + pd.to_timedelta(rng.integers(0, span, NUM_RANGES), unit='s')
+    ends = starts + pd.to_timedelta(rng.integers(0, 3 * 86400, NUM_RANGES), unit='s')
+    tags = [f'Sensor{i}' for i in range(NUM_TAGS)]
+
+    # Each range only mentions some of the tags in its diagnostics:
+    diagnostics = []
+    for _ in range(NUM_RANGES):
+        mentioned = rng.choice(NUM_TAGS, int(rng.integers(1, NUM_TAGS)), replace=False)
+        values = rng.dirichlet(np.ones(len(mentioned)))
+        diagnostics.append([{'name': f'{ASSET_NAME[9:]}\\{tags[i]}', 'value': float(v)} for i, v in zip(mentioned, values)])
+
+    ranges = pd.DataFrame({'start': starts, 'end': ends, 'diagnostics': diagnostics})
+    return ranges.sort_values('start').reset_index(drop=True), tags
+
+def expandedContribution(predictedRanges, tagsList, assetName, newIndex):
+    expandedResults = []
+    for index, row in predictedRanges.iterrows():
+        newRow = {'start': row['start'], 'end': row['end'], 'prediction': 1.0}
+        diagnostics = pd.DataFrame(row['diagnostics'])
+        newRow = {**newRow, **dict(zip(diagnostics['name'], diagnostics['value']))}
+        expandedResults.append(newRow)
+
+    expandedResults = pd.DataFrame(expandedResults)
+
+    dfList = []
+    for index, row in expandedResults.iterrows():
+        newDataframe = pd.DataFrame(index=pd.date_range(start=row['start'], end=row['end'], freq=FREQ))
+        for tag in tagsList:
+            if (f'{assetName[9:]}\\{tag}' in list(row.index)):
+                newDataframe[tag] = row[f'{assetName[9:]}\\{tag}']
+            else:
+                newDataframe[tag] = np.nan
+
+        dfList.append(newDataframe)
+
+    df = pd.concat(dfList, axis='index').resample('1D').mean().reindex(newIndex)
+    return df.replace(to_replace=np.nan, value=0.0)
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(42)
+    startDate, endDate = pd.Timestamp('2022-01-01 00:03:17'), pd.Timestamp('2023-01-01')
+    ranges, tags = buildRanges(rng, startDate, endDate)
+    anomalies = training_results_extraction.convert_ranges(ranges[['start', 'end']], startDate, endDate, FREQ)
+    newIndex = anomalies.resample('1D').mean().index
+
+    start = time.perf_counter()
+    expected = expandedContribution(ranges, tags, ASSET_NAME, newIndex)
+    expandedDuration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = training_results_extraction.buildSensorContribution(ranges, tags, ASSET_NAME, anomalies, FREQ, '1D')
+    sparseDuration = time.perf_counter() - start
+
+    difference = np.abs(expected.to_numpy() - result.to_numpy()).max()
+    print(f'Maximum difference:        {difference:.3g} ({(expected.to_numpy() == result.to_numpy()).mean():.1%} of the values bit-identical)')
+    print(f'expandResults():           {expandedDuration * 1000:8.1f} ms')
+    print(f'buildSensorContribution(): {sparseDuration * 1000:8.1f} ms')
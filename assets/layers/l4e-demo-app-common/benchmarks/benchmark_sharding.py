@@ -0,0 +1,96 @@
+# ========================================================================
+# Compares how six hours of raw anomaly scores written at a 1 s inference
+# cadence (21,600 items) are spread over the DynamoDB partitions, and what
+# the read of the whole range costs, for a table partitioned on the model
+# only versus a table using the sharded model#bucket partition key (15 min
+# buckets) read with queryRange(), which queries the shards in parallel.
+#
+# DynamoDB is mocked with moto, whose Query cost grows with the size of the
+# whole table (and not of the partition read): the wall time it measures
+# is not representative, so the benchmark reports the number of items
+# per partition key (a partition serves at most 1,000 writes and 3,000
+# reads per second) and the number of pages read one after the other by
+# each query, with pages limited to 2,000 items (about the 1 MB page of
+# DynamoDB for sensor contribution items with 50 tags):
+#
+#     pip install boto3 moto
+#     python benchmark_sharding.py
+# ========================================================================
+import os
+import sys
+import threading
+
+from collections import Counter
+
+import boto3
+
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.batch_writer import batchWriteItems
+from l4edemoapp.sharding import queryRange, shardItems, tableKeys
+from l4edemoapp.tables import ddbCreateTable
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+MODEL = 'benchmark-model'
+START = 1672531200
+NUM_ITEMS = 6 * 3600
+BUCKET_SECONDS = 900
+PAGE_ITEMS = 2000
+
+def buildItems():
+    return [
+        {'model': {'S': MODEL}, 'timestamp': {'N': str(START + i)}, 'anomaly_score': {'N': str(round((i % 97) / 97, 4))}}
+        for i in range(NUM_ITEMS)
+    ]
+
+def countPages(ddbClient):
+    pages = Counter()
+    lock = threading.Lock()
+    def increment(params, **kwargs):
+        with lock:
+            pages[params['ExpressionAttributeValues'][':key']['S']] += 1
+
+    ddbClient.meta.events.register('provide-client-params.dynamodb.Query', increment)
+    return pages
+
+if __name__ == '__main__':
+    items = buildItems()
+
+    with mock_aws():
+        ddbClient = boto3.client('dynamodb')
+        tables = {
+            'l4edemoapp-benchmark-raw-anomalies': 0,
+            'l4edemoapp-benchmark-sharded-raw-anomalies': BUCKET_SECONDS
+        }
+        results = {}
+        for tableName, bucketSeconds in tables.items():
+            tableItems = shardItems(items, bucketSeconds)
+            ddbCreateTable(ddbClient, tableName, tableKeys(tableName, bucketSeconds))
+            batchWriteItems(ddbClient, {tableName: tableItems})
+            partitionKey = tableKeys(tableName, bucketSeconds)[0][0]
+            itemsPerPartition = Counter(item[partitionKey]['S'] for item in tableItems)
+
+            reader = boto3.client('dynamodb')
+            pages = countPages(reader)
+            results[tableName] = queryRange(
+                reader,
+                tableName,
+                MODEL,
+                START,
+                START + NUM_ITEMS - 1,
+                bucketSeconds=bucketSeconds,
+                Limit=PAGE_ITEMS
+            )
+
+            print(f'{tableName}:')
+            print(f'  Partition keys:              {len(itemsPerPartition)}')
+            print(f'  Items of the largest one:    {max(itemsPerPartition.values())}')
+            print(f'  Query requests:              {sum(pages.values())}')
+            print(f'  Sequential pages (slowest):  {max(pages.values())}')
+
+        timestamps = [[item['timestamp']['N'] for item in result] for result in results.values()]
+        print(f'Same {len(timestamps[0])} items in the same order: {timestamps[0] == timestamps[1]}')
@@ -0,0 +1,74 @@
+# ========================================================================
+# Compares the conversions of 1,000,000 timestamps to epoch seconds done
+# with the expression used across the functions,
+#     (pd.to_datetime(x) - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
+# or with datetime.strptime() for each line of the inference results,
+# versus the time_codec module: ISO 8601 strings parsed by NumPy, other
+# formats parsed by pandas with the format cached for the dataset,
+# datetime64 columns cast directly, and datetime.fromisoformat() for
+# the scalar conversions:
+#
+#     pip install pandas
+#     python benchmark_time_codec.py
+# ========================================================================
+import os
+import sys
+import time
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.time_codec import toEpoch, toEpochArray
+
+NUM_TIMESTAMPS = 1000000
+
+def reference(values):
+    return ((pd.to_datetime(values) - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')).to_numpy()
+
+def strptimeEpoch(text):
+    timestamp = text[:19].replace('T', ' ')
+    return int(datetime.timestamp(datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')))
+
+def measure(label, convert, expected):
+    start = time.perf_counter()
+    result = convert()
+    duration = time.perf_counter() - start
+    same = np.array_equal(np.asarray(result, dtype=np.int64), expected)
+    print(f'  {label:32s} {duration * 1000:8.1f} ms (same result: {same})')
+
+    return duration
+
+if __name__ == '__main__':
+    # The scalar reference interprets the timestamps in the local time
+    # zone, which is UTC in Lambda:
+    os.environ['TZ'] = 'UTC'
+    time.tzset()
+
+    index = pd.date_range(start='2023-01-01', periods=NUM_TIMESTAMPS, freq='1s')
+    expected = index.asi8 // 10**9
+    datasets = {
+        'ISO 8601 strings (CSV datasets)': pd.Series(index.strftime('%Y-%m-%d %H:%M:%S')),
+        'Other format (%Y/%m/%d %H:%M:%S)': pd.Series(index.strftime('%Y/%m/%d %H:%M:%S'))
+    }
+
+    for name, values in datasets.items():
+        print(f'{name}:')
+        before = measure('pd.to_datetime', lambda: reference(values), expected)
+        measure('toEpochArray (first call)', lambda: toEpochArray(values, cacheKey=name), expected)
+        after = measure('toEpochArray (cached format)', lambda: toEpochArray(values, cacheKey=name), expected)
+        print(f'  Speedup: {before / after:.1f}x')
+
+    print('datetime64 column:')
+    column = pd.Series(index)
+    before = measure('timedelta floor division', lambda: reference(column), expected)
+    after = measure('toEpochArray', lambda: toEpochArray(column), expected)
+    print(f'  Speedup: {before / after:.1f}x')
+
+    print('Inference results timestamps, one at a time:')
+    lines = index.strftime('%Y-%m-%dT%H:%M:%S.000000').tolist()
+    before = measure('datetime.strptime', lambda: [strptimeEpoch(t) for t in lines], expected)
+    after = measure('toEpoch', lambda: [toEpoch(t) for t in lines], expected)
+    print(f'  Speedup: {before / after:.1f}x')
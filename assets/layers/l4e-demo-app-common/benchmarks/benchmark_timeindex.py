@@ -0,0 +1,90 @@
+# ========================================================================
+# Compares the time needed to get the one-week replay window of historical
+# datasets (1 min, 20 tags, 15 of them used by the model) of increasing
+# length when the whole CSV file is downloaded and parsed (the previous
+# getDataframe() of the prepare-replay-data function), versus readWindow()
+# which uses the hourly index written with the file to download only the
+# hours of the window. S3 is mocked with moto and a 20 ms latency is added
+# to each request:
+#
+#     pip install boto3 moto numpy pandas
+#     python benchmark_timeindex.py
+# ========================================================================
+import os
+import sys
+import time
+
+import boto3
+import numpy as np
+import pandas as pd
+
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python'))
+from l4edemoapp.s3_sink import writeCsv
+from l4edemoapp.timeindex import TimeIndexBuilder, readWindow, writeTimeIndex
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+BUCKET = 'benchmark-bucket'
+NUM_TAGS = 20
+TAGS = [f'Sensor{i}' for i in range(15)]
+HISTORY_DAYS = [30, 90, 180]
+WINDOW_START = pd.Timestamp('2023-01-10 10:00:00')
+WINDOW_END = WINDOW_START + pd.Timedelta(days=7) - pd.Timedelta(seconds=1)
+LATENCY = 0.02
+
+def addLatency(client):
+    def wait(**kwargs):
+        time.sleep(LATENCY)
+
+    client.meta.events.register('after-call.s3', wait)
+
+def writeHistory(s3Client, days, key):
+    index = pd.date_range(start='2023-01-01', periods=days * 1440, freq='1min', name='timestamp')
+    values = np.round(np.random.default_rng(42).normal(size=(len(index), NUM_TAGS)), 4)
+    df = pd.DataFrame(values, index=index, columns=[f'Sensor{i}' for i in range(NUM_TAGS)])
+
+    builder = TimeIndexBuilder()
+    writeCsv(s3Client, df, BUCKET, key, listener=builder)
+    writeTimeIndex(s3Client, BUCKET, key, builder.index())
+
+    return builder.size
+
+def readFull(s3Client, key):
+    data = s3Client.get_object(Bucket=BUCKET, Key=key)
+    df = pd.read_csv(data['Body'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+    return df.set_index('timestamp').loc[WINDOW_START:WINDOW_END, TAGS]
+
+def readIndexed(s3Client, key):
+    df = readWindow(s3Client, BUCKET, key, WINDOW_START, WINDOW_END, columns=TAGS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+    return df.set_index('timestamp').loc[WINDOW_START:WINDOW_END, TAGS]
+
+if __name__ == '__main__':
+    with mock_aws():
+        s3Client = boto3.client('s3')
+        s3Client.create_bucket(Bucket=BUCKET)
+        s3Reader = boto3.client('s3')
+        addLatency(s3Reader)
+
+        for days in HISTORY_DAYS:
+            key = f'raw-datasets/pump-{days}/pump-{days}/sensors.csv'
+            size = writeHistory(s3Client, days, key)
+
+            start = time.perf_counter()
+            df_full = readFull(s3Reader, key)
+            fullDuration = time.perf_counter() - start
+
+            start = time.perf_counter()
+            df_window = readIndexed(s3Reader, key)
+            windowDuration = time.perf_counter() - start
+
+            print(f'{days} days of history ({size / 1024 / 1024:.1f} MB), identical window: {df_full.equals(df_window)}')
+            print(f'  Whole file:   {fullDuration * 1000:8.1f} ms')
+            print(f'  readWindow(): {windowDuration * 1000:8.1f} ms')
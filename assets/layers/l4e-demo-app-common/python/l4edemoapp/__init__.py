@@ -0,0 +1,6 @@
+# ========================================================================
+# Shared helpers for the Lookout for Equipment demo application Lambda
+# functions. This package is deployed as a Lambda layer (see the
+# PackageCommon resource in the CloudFormation template) and is importable
+# from any function attached to it.
+# ========================================================================
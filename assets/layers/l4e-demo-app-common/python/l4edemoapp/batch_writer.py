@@ -0,0 +1,114 @@
+import random
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Maximum number of put requests allowed in a single
+# call to the DynamoDB BatchWriteItem API:
+MAX_BATCH_SIZE = 25
+
+# ---------------------------------------------
+# Splits a list of items in chunks of batchSize
+# ---------------------------------------------
+def chunks(items, batchSize=MAX_BATCH_SIZE):
+    for i in range(0, len(items), batchSize):
+        yield items[i:i + batchSize]
+
+# ----------------------------------------------------------
+# Writes a list of items into several DynamoDB tables using
+# concurrent BatchWriteItem calls
+# ----------------------------------------------------------
+def batchWriteItems(ddbClient, itemsPerTable, maxWorkers=8, maxRetries=8, baseDelay=0.05, maxDelay=5.0):
+    """
+    Groups the items by target table into batches of 25 put requests
+    and sends them concurrently with a bounded thread pool. Items
+    returned as UnprocessedItems by DynamoDB are retried with an
+    exponential backoff (with jitter).
+
+    Parameters:
+        ddbClient (botocore.client.DynamoDB):
+            A DynamoDB client (boto3 clients are thread-safe)
+        itemsPerTable (dict):
+            A dictionary where the keys are the table names and the values
+            the list of items (in DynamoDB attribute value format) to write
+        maxWorkers (integer):
+            Maximum number of batches written in parallel
+        maxRetries (integer):
+            Maximum number of attempts to write the unprocessed items of a
+            given batch before giving up
+        baseDelay, maxDelay (float):
+            Backoff parameters (in seconds) between two retries
+
+    Returns:
+        dict: a summary of the write with the number of items written,
+        the number of batches and API calls made and a dictionary with
+        the items that could not be written after all the retries (in
+        the same format as the RequestItems parameter of the API)
+    """
+    requestsPerTable = {
+        table: [{'PutRequest': {'Item': item}} for item in items]
+        for table, items in itemsPerTable.items()
+    }
+
+    return sendRequests(ddbClient, requestsPerTable, maxWorkers, maxRetries, baseDelay, maxDelay)
+
+# ----------------------------------------------------------
+# Deletes a list of items (given by their keys) from several
+# DynamoDB tables with the same concurrent batches
+# ----------------------------------------------------------
+def batchDeleteItems(ddbClient, keysPerTable, maxWorkers=8, maxRetries=8, baseDelay=0.05, maxDelay=5.0):
+    requestsPerTable = {
+        table: [{'DeleteRequest': {'Key': key}} for key in keys]
+        for table, keys in keysPerTable.items()
+    }
+
+    return sendRequests(ddbClient, requestsPerTable, maxWorkers, maxRetries, baseDelay, maxDelay)
+
+def sendRequests(ddbClient, requestsPerTable, maxWorkers, maxRetries, baseDelay, maxDelay):
+    batches = []
+    for table, requests in requestsPerTable.items():
+        for batch in chunks(requests):
+            batches.append({table: batch})
+
+    summary = {
+        'items': sum([len(requests) for requests in requestsPerTable.values()]),
+        'batches': len(batches),
+        'calls': 0,
+        'unprocessedItems': {}
+    }
+    if len(batches) == 0:
+        return summary
+
+    def write(requestItems):
+        return writeBatch(ddbClient, requestItems, maxRetries, baseDelay, maxDelay)
+
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(batches))) as executor:
+        for numCalls, unprocessed in executor.map(write, batches):
+            summary['calls'] += numCalls
+            for table, requests in unprocessed.items():
+                summary['unprocessedItems'].setdefault(table, []).extend(requests)
+
+    if len(summary['unprocessedItems']) > 0:
+        numUnprocessed = sum([len(r) for r in summary['unprocessedItems'].values()])
+        print(f'Warning: {numUnprocessed} items could not be written after {maxRetries} attempts')
+
+    return summary
+
+# ------------------------------------------------------------------
+# Writes a single batch and retries its unprocessed items if needed
+# ------------------------------------------------------------------
+def writeBatch(ddbClient, requestItems, maxRetries=8, baseDelay=0.05, maxDelay=5.0):
+    numCalls = 0
+
+    for attempt in range(maxRetries):
+        if attempt > 0:
+            delay = min(maxDelay, baseDelay * 2 ** attempt)
+            time.sleep(random.uniform(0, delay))
+
+        response = ddbClient.batch_write_item(RequestItems=requestItems)
+        numCalls += 1
+        requestItems = response.get('UnprocessedItems', {})
+        if len(requestItems) == 0:
+            break
+
+    return numCalls, requestItems
@@ -0,0 +1,225 @@
+import random
+import time
+
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from l4edemoapp.batch_writer import chunks
+from l4edemoapp.tables import DEFAULT_KEYS
+
+# Number of rows written by a single worker:
+SEGMENT_SIZE = 1000
+
+# Error codes returned by DynamoDB when the
+# table or the account is being throttled:
+THROTTLING_ERRORS = [
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded'
+]
+
+# ---------------------------------------------------------------------
+# Additive increase / multiplicative decrease of the number of segments
+# written in parallel, depending on the throttling errors received
+# ---------------------------------------------------------------------
+class AdaptiveConcurrency:
+    def __init__(self, maxWorkers, minWorkers=1):
+        self.maxWorkers = maxWorkers
+        self.minWorkers = minWorkers
+        self.current = maxWorkers
+
+    def update(self, throttled):
+        if throttled:
+            self.current = max(self.minWorkers, self.current // 2)
+        else:
+            self.current = min(self.maxWorkers, self.current + 1)
+
+        return self.current
+
+# ---------------------------------------------------------------
+# Loads a large number of items into a DynamoDB table by writing
+# several segments concurrently
+# ---------------------------------------------------------------
+def bulkLoad(ddbClient, table, segments, manifest=None, maxWorkers=8, minWorkers=1, shouldStop=None, writer=None):
+    """
+    Writes segments of items concurrently. The number of segments in
+    flight starts at maxWorkers, is halved each time a segment gets
+    throttled and grows back by one for each segment written without
+    throttling.
+
+    Parameters:
+        ddbClient (botocore.client.DynamoDB):
+            A DynamoDB client
+        table (string):
+            Name of the table to load
+        segments (iterable):
+            Lists of items (in DynamoDB attribute value format). The
+            segments must always be yielded in the same order so that an
+            interrupted load can be resumed
+        manifest (dict):
+            Manifest returned by a previous (partial) call: the segments
+            already completed are skipped
+        maxWorkers, minWorkers (integer):
+            Bounds of the number of segments written in parallel
+        shouldStop (callable):
+            Function called before starting each segment: when it returns
+            True, no new segment is started (e.g. when the Lambda function
+            is about to time out) and the load is reported as partial
+        writer (callable):
+            Function writing a segment, writeSegment() by default (PutItem
+            requests replacing the whole items) or updateSegment()
+
+    Returns:
+        dict: a manifest with the overall status (COMPLETED, PARTIAL when
+        the load was stopped before the end or FAILED when some segments
+        could not be written), the list of the completed segment numbers
+        (including the ones of the given manifest), the failed ones and
+        the progress of each segment processed during this call. The
+        failed segments are not in the completed list: passing this
+        manifest back to resume the load writes them again, along with
+        the segments not started yet
+    """
+    if manifest is None:
+        manifest = {}
+    if writer is None:
+        writer = writeSegment
+
+    completed = set(manifest.get('completedSegments', []))
+    progress = []
+    failed = []
+    status = 'COMPLETED'
+    concurrency = AdaptiveConcurrency(maxWorkers, minWorkers)
+
+    def collect(futures):
+        for future in futures:
+            result = future.result()
+            progress.append(result)
+            concurrency.update(result['throttled'])
+            if result['status'] == 'COMPLETED':
+                completed.add(result['segment'])
+            else:
+                failed.append(result['segment'])
+
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        running = set()
+        for index, items in enumerate(segments):
+            if index in completed:
+                continue
+
+            if shouldStop is not None and shouldStop():
+                status = 'PARTIAL'
+                break
+
+            # Waits for some segments to finish when the
+            # current concurrency limit is reached:
+            while len(running) >= concurrency.current:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            running.add(executor.submit(writer, ddbClient, table, index, items))
+
+        collect(wait(running).done)
+
+    if status == 'COMPLETED' and len(failed) > 0:
+        status = 'FAILED'
+
+    return {
+        'status': status,
+        'completedSegments': sorted(completed),
+        'failedSegments': sorted(failed),
+        'segments': sorted(progress, key=lambda p: p['segment'])
+    }
+
+# -----------------------------------------------------------
+# Writes all the items of a segment with BatchWriteItem calls
+# and retries the throttled and the unprocessed requests
+# -----------------------------------------------------------
+def writeSegment(ddbClient, table, index, items, maxRetries=10, baseDelay=0.05, maxDelay=10.0):
+    result = {
+        'segment': index,
+        'items': len(items),
+        'calls': 0,
+        'throttled': False,
+        'status': 'COMPLETED'
+    }
+
+    for batch in chunks(items):
+        requestItems = {table: [{'PutRequest': {'Item': item}} for item in batch]}
+
+        for attempt in range(maxRetries):
+            if attempt > 0:
+                delay = min(maxDelay, baseDelay * 2 ** attempt)
+                time.sleep(random.uniform(0, delay))
+
+            try:
+                response = ddbClient.batch_write_item(RequestItems=requestItems)
+                result['calls'] += 1
+                requestItems = response.get('UnprocessedItems', {})
+
+            except ClientError as e:
+                result['calls'] += 1
+                if e.response['Error']['Code'] not in THROTTLING_ERRORS:
+                    result.update({'status': 'FAILED', 'error': str(e)})
+                    return result
+
+            if len(requestItems) == 0:
+                break
+
+            # Unprocessed items are also a sign of throttling:
+            result['throttled'] = True
+
+        if len(requestItems) > 0:
+            result.update({'status': 'FAILED', 'error': f'Unprocessed items left after {maxRetries} attempts'})
+            return result
+
+    return result
+
+# -----------------------------------------------------------------
+# Writes the items of a segment with UpdateItem calls that only set
+# their attributes: the other attributes of the existing items (such
+# as the live aggregates of the daily_rate table) are kept
+# -----------------------------------------------------------------
+def updateSegment(ddbClient, table, index, items, keys=DEFAULT_KEYS, maxRetries=10, baseDelay=0.05, maxDelay=10.0):
+    result = {
+        'segment': index,
+        'items': len(items),
+        'calls': 0,
+        'throttled': False,
+        'status': 'COMPLETED'
+    }
+
+    keyNames = [name for name, _ in keys]
+    for item in items:
+        attributes = [name for name in item.keys() if name not in keyNames]
+        update = {
+            'TableName': table,
+            'Key': {name: item[name] for name in keyNames}
+        }
+        if len(attributes) > 0:
+            update.update({
+                'UpdateExpression': 'SET ' + ', '.join(f'#a{p} = :a{p}' for p in range(len(attributes))),
+                'ExpressionAttributeNames': {f'#a{p}': name for p, name in enumerate(attributes)},
+                'ExpressionAttributeValues': {f':a{p}': item[name] for p, name in enumerate(attributes)}
+            })
+
+        for attempt in range(maxRetries):
+            if attempt > 0:
+                delay = min(maxDelay, baseDelay * 2 ** attempt)
+                time.sleep(random.uniform(0, delay))
+
+            try:
+                result['calls'] += 1
+                ddbClient.update_item(**update)
+                break
+
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLING_ERRORS:
+                    result.update({'status': 'FAILED', 'error': str(e)})
+                    return result
+
+                result['throttled'] = True
+
+        else:
+            result.update({'status': 'FAILED', 'error': f'Item still throttled after {maxRetries} attempts'})
+            return result
+
+    return result
@@ -0,0 +1,112 @@
+import os
+import threading
+
+import boto3
+
+from botocore.config import Config
+
+# Size of the connection pool of each client: it must be at least the
+# number of threads sharing a client (batch writes, parallel S3 reads and
+# multipart uploads), otherwise the extra connections are opened and
+# discarded at each call (default of botocore: 10):
+MAX_POOL_CONNECTIONS = int(os.environ.get('MAX_POOL_CONNECTIONS', 50))
+
+# The adaptive mode adds a client-side rate limiter to the standard
+# retries (exponential backoff with jitter), so that the threads of a
+# throttled client slow down together instead of exhausting their attempts:
+RETRY_MODE = os.environ.get('RETRY_MODE', 'adaptive')
+MAX_ATTEMPTS = int(os.environ.get('MAX_ATTEMPTS', 10))
+
+# A single session per process: the credentials, the endpoint data and
+# the service models are resolved once, and each client (one per service
+# and region) is reused by the functions and the layer helpers, with its
+# open connections, by all the invocations of a warm Lambda function:
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+def clientConfig(maxPoolConnections=None, **configOptions):
+    return Config(
+        max_pool_connections=maxPoolConnections or MAX_POOL_CONNECTIONS,
+        retries={'mode': RETRY_MODE, 'max_attempts': MAX_ATTEMPTS},
+        tcp_keepalive=True,
+        **configOptions
+    )
+
+def getSession():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session()
+
+        return _session
+
+def _get(kind, serviceName, regionName, maxPoolConnections, configOptions):
+    key = (kind, serviceName, regionName, maxPoolConnections, tuple(sorted(configOptions.items())))
+    with _lock:
+        cached = _clients.get(key)
+
+    if cached is not None:
+        return cached
+
+    session = getSession()
+    build = session.client if kind == 'client' else session.resource
+    created = build(serviceName, region_name=regionName, config=clientConfig(maxPoolConnections, **configOptions))
+
+    # Two threads may build the same client: the first one stored wins
+    with _lock:
+        return _clients.setdefault(key, created)
+
+# ------------------------------------------------------------------
+# Shared clients and resources (boto3 clients are thread-safe, the
+# resources are not and must not be shared between threads)
+# ------------------------------------------------------------------
+def getClient(serviceName, regionName=None, maxPoolConnections=None, **configOptions):
+    return _get('client', serviceName, regionName, maxPoolConnections, configOptions)
+
+def getResource(serviceName, regionName=None, maxPoolConnections=None, **configOptions):
+    return _get('resource', serviceName, regionName, maxPoolConnections, configOptions)
+
+def invalidate():
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+
+# ------------------------------------------------------------------
+# Module-level client of a Lambda function, only built on its first
+# use: the cold start of a function no longer pays for the clients
+# its invocation doesn't need
+# ------------------------------------------------------------------
+class LazyClient:
+    """
+    Usage:
+        s3_client = LazyClient('s3')
+        ...
+        s3_client.get_object(Bucket=bucket, Key=key)   # builds the client
+
+    Every attribute (API calls, exceptions, meta) is read from the
+    shared client returned by getClient().
+    """
+    factory = staticmethod(getClient)
+
+    def __init__(self, serviceName, regionName=None, maxPoolConnections=None, **configOptions):
+        self._arguments = (serviceName, regionName, maxPoolConnections)
+        self._configOptions = configOptions
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = self.factory(*self._arguments, **self._configOptions)
+
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        state = 'built' if self._target is not None else 'not built'
+        return f'<{type(self).__name__} {self._arguments[0]} ({state})>'
+
+class LazyResource(LazyClient):
+    factory = staticmethod(getResource)
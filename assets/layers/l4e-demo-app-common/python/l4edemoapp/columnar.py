@@ -0,0 +1,94 @@
+import importlib.util
+import io
+
+import pandas as pd
+
+# Parquet support relies on pyarrow, which may not be packaged
+# with pandas: the columnar files are simply skipped without it.
+# It is only imported by pandas when a Parquet file is used:
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+# Metadata of the Parquet objects holding the ETag of the CSV file
+# they mirror: a copy whose CSV file was rewritten since is ignored
+SOURCE_ETAG = 'source-etag'
+
+# The Parquet files can't be written next to the CSV files they
+# mirror: the prepared-datasets/ prefix is imported as CSV in DynamoDB
+# and the raw-datasets/ prefix is ingested by Lookout for Equipment.
+COLUMNAR_PREFIX = 'columnar-datasets/'
+
+# ----------------------------------------------------------
+# Returns the key of the Parquet version of a given CSV file:
+# raw-datasets/pump/pump/sensors.csv is mirrored under
+# columnar-datasets/raw-datasets/pump/pump/sensors.parquet
+# ----------------------------------------------------------
+def parquetKey(csvKey):
+    if csvKey.endswith('.csv'):
+        csvKey = csvKey[:-len('.csv')]
+
+    return f'{COLUMNAR_PREFIX}{csvKey}.parquet'
+
+# ------------------------------------------------------------
+# Writes a dataframe as a compressed Parquet object in S3. The
+# timestamp and sensor columns keep their datetime64 and float
+# types instead of being formatted as text. The ETag of the CSV
+# file it mirrors (already written) is stored with the object
+# ------------------------------------------------------------
+def writeParquet(s3Client, df, bucket, key, csvKey, compression='snappy'):
+    if not PARQUET_AVAILABLE:
+        print(f'pyarrow is not available, skipping {key}')
+        return None
+
+    etag = s3Client.head_object(Bucket=bucket, Key=csvKey)['ETag']
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False, compression=compression)
+    s3Client.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue(), Metadata={SOURCE_ETAG: etag})
+
+    return key
+
+# Deletes the Parquet versions of CSV files rewritten without them:
+def deleteParquet(s3Client, bucket, csvKeys):
+    s3Client.delete_objects(
+        Bucket=bucket,
+        Delete={'Objects': [{'Key': parquetKey(k)} for k in csvKeys], 'Quiet': True}
+    )
+
+# -------------------------------------------------------------
+# Reads a dataset from S3, preferring its Parquet version when
+# it exists and falling back to the CSV file otherwise
+# -------------------------------------------------------------
+def readDataframe(s3Client, bucket, csvKey, **csvOptions):
+    """
+    Parameters:
+        s3Client (botocore.client.S3):
+            An S3 client
+        bucket (string):
+            Bucket where the dataset is located
+        csvKey (string):
+            Key of the CSV file: the Parquet file is looked up at the
+            location given by parquetKey(csvKey)
+        csvOptions:
+            Additional parameters passed to pandas.read_csv()
+
+    Returns:
+        pandas.DataFrame: the dataset, with the same columns in both
+        cases (the timestamp column of a Parquet file is already parsed
+        as datetime64, whereas it is left as text when read from a CSV).
+        The Parquet version is only used when it was written from the
+        current content of the CSV file
+    """
+    if PARQUET_AVAILABLE:
+        try:
+            data = s3Client.get_object(Bucket=bucket, Key=parquetKey(csvKey))
+            etag = s3Client.head_object(Bucket=bucket, Key=csvKey)['ETag']
+            if data['Metadata'].get(SOURCE_ETAG) == etag:
+                return pd.read_parquet(io.BytesIO(data['Body'].read()))
+
+            print(f'{csvKey} changed since its Parquet version was written, reading the CSV file')
+            data['Body'].close()
+
+        except s3Client.exceptions.NoSuchKey:
+            pass
+
+    data = s3Client.get_object(Bucket=bucket, Key=csvKey)
+    return pd.read_csv(data['Body'], **csvOptions)
@@ -0,0 +1,69 @@
+import codecs
+import csv
+
+from l4edemoapp.batch_writer import MAX_BATCH_SIZE
+
+# Size of the chunks read from the S3 object body:
+CHUNK_SIZE = 1024 * 1024
+
+# -------------------------------------------------------------------
+# Reads a binary stream (e.g. the body of an S3 object) chunk by chunk
+# and yields its decoded lines with their line terminator
+# -------------------------------------------------------------------
+def iterLines(body, chunkSize=CHUNK_SIZE, encoding='utf-8'):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+
+    for chunk in iter(lambda: body.read(chunkSize), b''):
+        lines = (pending + decoder.decode(chunk)).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+
+    # The last line may not end with a new line character:
+    pending += decoder.decode(b'', final=True)
+    if len(pending) > 0:
+        yield pending
+
+# --------------------------------------------------------------
+# Parses a CSV stream and groups its rows in batches of batchSize
+# --------------------------------------------------------------
+def readCsvBatches(body, batchSize=MAX_BATCH_SIZE, delimiter=',', chunkSize=CHUNK_SIZE):
+    """
+    Streams a CSV file without loading it fully in memory: only the
+    current chunk and the current batch of rows are kept at any time.
+    Each row is parsed once by the csv module, which also takes care of
+    the quoted fields (including the ones spanning several lines).
+
+    Parameters:
+        body (file-like object):
+            A binary stream with a read() method, such as the
+            StreamingBody returned by the S3 GetObject API
+        batchSize (integer):
+            Number of rows in each batch (25 by default, which is the
+            maximum number of items of a BatchWriteItem call)
+        delimiter (string):
+            The CSV delimiter
+
+    Returns:
+        tuple: the list of headers and a generator yielding the rows
+        (as lists of strings) by batches. Empty lines are skipped
+    """
+    reader = csv.reader(iterLines(body, chunkSize), delimiter=delimiter)
+    headers = next(reader, [])
+
+    def batches():
+        batch = []
+        for row in reader:
+            if len(row) == 0:
+                continue
+
+            batch.append(row)
+            if len(batch) == batchSize:
+                yield batch
+                batch = []
+
+        if len(batch) > 0:
+            yield batch
+
+    return headers, batches()
@@ -0,0 +1,138 @@
+# Running daily aggregates of the live inference results, stored in the
+# daily_rate table next to the daily rate computed at training time.
+# They are all sums (the means are obtained by dividing by the number
+# of points) so that they can be updated with atomic ADD expressions:
+POINTS = 'live_points'
+ANOMALIES = 'live_anomalies'
+ANOMALY_SCORES = 'live_anomaly_scores'
+DIAGNOSTICS = 'live_diagnostics'
+CONTRIBUTION_PREFIX = 'live_contribution_'
+
+import time
+
+from l4edemoapp.ledger import RETENTION_SECONDS
+
+# Former set of the inference results files added to a daily item: it
+# grew with every file, it's now removed from the items when they are
+# updated (the files are recorded in separate items, see below)
+SOURCES = 'live_sources'
+
+SECONDS_PER_DAY = 86400
+
+# ------------------------------------------------------------------
+# Sums the inference results of each day
+# ------------------------------------------------------------------
+def dailyAggregates(timestamps, anomalies, scores, contributions):
+    """
+    The results of a file (a few to 3,600 lines) are summed in plain
+    Python, in their order, so that the function storing them doesn't
+    import pandas.
+
+    Parameters:
+        timestamps (list of int):
+            epoch seconds of each inference result
+        anomalies, scores (list of float):
+            prediction and anomaly score of each result
+        contributions (list of dict):
+            contribution of each tag to each result (an empty dict for
+            the results without diagnostics)
+
+    Returns:
+        dict: the sums of each day (keyed by the start of the day in
+        epoch seconds, in chronological order): number of results, sums
+        of their predictions and scores, number of results with
+        diagnostics and sum of the contribution of each tag (0.0 for
+        the tags with no contribution on a given day)
+    """
+    tags = {}
+    for contribution in contributions:
+        tags.update(dict.fromkeys(contribution.keys()))
+
+    days = {}
+    for timestamp, anomaly, score, contribution in zip(timestamps, anomalies, scores, contributions):
+        day = int(timestamp) - int(timestamp) % SECONDS_PER_DAY
+        sums = days.get(day)
+        if sums is None:
+            sums = {POINTS: 0.0, ANOMALIES: 0.0, ANOMALY_SCORES: 0.0, DIAGNOSTICS: 0.0}
+            sums.update({f'{CONTRIBUTION_PREFIX}{tag}': 0.0 for tag in tags})
+            days[day] = sums
+
+        values = {tag: value for tag, value in contribution.items() if isNumber(value)}
+        sums[POINTS] += 1.0
+        sums[ANOMALIES] += float(anomaly)
+        sums[ANOMALY_SCORES] += float(score)
+        sums[DIAGNOSTICS] += 1.0 if len(values) > 0 else 0.0
+        for tag, value in values.items():
+            sums[f'{CONTRIBUTION_PREFIX}{tag}'] += float(value)
+
+    return dict(sorted(days.items()))
+
+# Missing contributions (null or NaN in the JSON lines) are not counted:
+def isNumber(value):
+    return value is not None and value == value
+
+# ------------------------------------------------------------------
+# Adds the daily sums to the items of a model (one UpdateItem call per
+# day, whatever the number of inference results)
+# ------------------------------------------------------------------
+def updateDailyAggregates(ddbClient, tableName, model, daily, sourceId=None, ledgerTableName=None):
+    """
+    ADD is not idempotent: when a sourceId (e.g. the key of the inference
+    results file) and a ledger table are given, each update is written in
+    a transaction with an item of the ledger recording this source for
+    this day. The days to which this source was already added are left
+    unchanged. These ledger items expire with the other entries of the
+    ledger, so the daily items don't grow with the number of files.
+
+    Returns:
+        int: the number of daily items updated
+    """
+    numUpdated = 0
+    for day, sums in daily.items():
+        names = {'#sources': SOURCES}
+        values = {}
+        for position, (attribute, value) in enumerate(sums.items()):
+            names[f'#a{position}'] = attribute
+            values[f':a{position}'] = {'N': str(value)}
+
+        update = {
+            'TableName': tableName,
+            'Key': {'model': {'S': model}, 'timestamp': {'N': str(day)}},
+            'UpdateExpression': 'ADD ' + ', '.join(f'#a{p} :a{p}' for p in range(len(sums))) + ' REMOVE #sources',
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }
+
+        if sourceId is None or ledgerTableName is None:
+            ddbClient.update_item(**update)
+            numUpdated += 1
+            continue
+
+        try:
+            ddbClient.transact_write_items(TransactItems=[
+                {'Put': sourceRecord(ledgerTableName, sourceId, day)},
+                {'Update': update}
+            ])
+            numUpdated += 1
+
+        except ddbClient.exceptions.TransactionCanceledException as e:
+            reasons = [r.get('Code') for r in e.response.get('CancellationReasons', [])]
+            if reasons[:1] != ['ConditionalCheckFailed']:
+                raise
+
+            print(f'{sourceId} already added to the aggregates of {day}')
+
+    return numUpdated
+
+# Ledger item recording that a source was added to the sums of a day:
+def sourceRecord(ledgerTableName, sourceId, day):
+    return {
+        'TableName': ledgerTableName,
+        'Item': {
+            'object': {'S': f'daily-aggregates:{sourceId}'},
+            'etag': {'S': str(day)},
+            'expires_at': {'N': str(int(time.time()) + RETENTION_SECONDS)}
+        },
+        'ConditionExpression': 'attribute_not_exists(#object)',
+        'ExpressionAttributeNames': {'#object': 'object'}
+    }
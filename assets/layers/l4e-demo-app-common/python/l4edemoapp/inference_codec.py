@@ -0,0 +1,126 @@
+import csv
+import io
+import re
+
+from l4edemoapp.time_codec import parseEpoch, toEpochArray
+
+# Inference input files up to this size (in bytes) are decoded with the
+# csv module: a file of a few rows (1 row for the synthetic inference
+# data) no longer pays for the import of pandas, which is only imported
+# for the larger files (up to 3,600 rows for a 1 hour inference period):
+SMALL_PAYLOAD_BYTES = 64 * 1024
+
+INTEGER = re.compile(r'[+-]?\d+', re.ASCII)
+FLOAT = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?', re.ASCII)
+
+# -------------------------------------------------------------------
+# Converts the content of an inference input file into the DynamoDB
+# items of the timeseries table
+# -------------------------------------------------------------------
+def inferenceInputItems(body, asset, maxSmallBytes=SMALL_PAYLOAD_BYTES):
+    """
+    Small files are decoded without pandas. The values are encoded as
+    encodeDataframe() encodes the dataframe read by pandas (numbers in
+    their shortest representation, 'nan' for the missing values): a
+    file with a content this decoder doesn't read like pandas (non
+    numeric tags, NA markers, timestamps with a time zone...) goes
+    through pandas whatever its size.
+
+    Parameters:
+        body (bytes):
+            Content of the CSV file: a timestamp column followed by
+            one column per tag
+        asset (string):
+            Value of the asset attribute of every item
+        maxSmallBytes (int):
+            Size up to which the file is decoded without pandas
+
+    Returns:
+        list: one item per row with the timestamp (column renamed to
+        timestamp), the tags, sampling_rate ('raw'), asset and
+        unix_timestamp (number) attributes
+    """
+    items = None
+    if len(body) <= maxSmallBytes:
+        items = decodeSmallInput(body, asset)
+
+    if items is None:
+        items = decodePandasInput(body, asset)
+
+    return items
+
+def decodePandasInput(body, asset):
+    import pandas as pd
+    from l4edemoapp.item_encoder import encodeDataframe
+
+    df = pd.read_csv(io.BytesIO(body))
+
+    # Add new columns:
+    timestampCol = list(df.columns)[0]
+    df = df.rename(columns={timestampCol: 'timestamp'})
+    df['sampling_rate'] = 'raw'
+    df['asset'] = asset
+    df['unix_timestamp'] = toEpochArray(df['timestamp']).astype(float)
+
+    return encodeDataframe(df, fieldTypes={'unix_timestamp': 'N'})
+
+# -------------------------------------------------------------------
+# Decodes a small CSV file with the csv module: returns None when its
+# content must be read by pandas
+# -------------------------------------------------------------------
+def decodeSmallInput(body, asset):
+    rows = [row for row in csv.reader(io.StringIO(body.decode('utf-8-sig'))) if len(row) > 0]
+    if len(rows) == 0:
+        return None
+
+    header, rows = rows[0], rows[1:]
+    columns = ['timestamp'] + header[1:] + ['sampling_rate', 'asset', 'unix_timestamp']
+    if '' in header or len(set(columns)) != len(columns) or any([len(row) != len(header) for row in rows]):
+        return None
+
+    epochs = [parseEpoch(row[0]) for row in rows]
+    if None in epochs:
+        return None
+
+    tags = []
+    for index in range(1, len(header)):
+        values = encodeNumbers([row[index] for row in rows])
+        if values is None:
+            return None
+
+        tags.append(values)
+
+    items = []
+    for position, row in enumerate(rows):
+        item = {'timestamp': {'S': row[0]}}
+        for index, values in enumerate(tags):
+            item[header[index + 1]] = {'S': values[position]}
+
+        item['sampling_rate'] = {'S': 'raw'}
+        item['asset'] = {'S': asset}
+        item['unix_timestamp'] = {'N': str(float(epochs[position]))}
+        items.append(item)
+
+    return items
+
+# -------------------------------------------------------------------
+# String representation of a numeric column, as pandas would parse it
+# (integers, or floats as soon as a value has a decimal part or is
+# missing): None when the column doesn't only contain numbers. The
+# floats are correctly rounded, so a value written with its shortest
+# representation (e.g. by pandas) is stored as written, where the
+# default parser of pandas may change its 17th significant digit
+# -------------------------------------------------------------------
+def encodeNumbers(values):
+    if all([INTEGER.fullmatch(v) for v in values]):
+        integers = [int(v) for v in values]
+        if all([-2**63 <= i < 2**63 for i in integers]):
+            return [str(i) for i in integers]
+
+        return None
+
+    if all([v == '' or FLOAT.fullmatch(v) for v in values]):
+        # Adding 0.0 turns negative zeros into 0.0 like encodeColumn():
+        return ['nan' if v == '' else str(float(v) + 0.0) for v in values]
+
+    return None
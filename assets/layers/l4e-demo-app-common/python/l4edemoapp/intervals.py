@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------------
+# Converts events (start / end timestamps) into a mask over a sorted
+# DatetimeIndex without looping over the events
+# ------------------------------------------------------------------
+def rangesToMask(starts, ends, index, pointWidth=None):
+    """
+    A point of the index belongs to an event when start <= point <= end
+    (like a .loc[start:end] slice). The bounds of every event are located
+    in the index with a binary search and marked in a difference array:
+    its cumulative sum gives the number of events covering each point.
+
+    Parameters:
+        starts, ends (array-like of datetime64):
+            bounds of each event
+        index (pandas.DatetimeIndex):
+            sorted index on which the events are projected
+        pointWidth (pandas.Timedelta):
+            when given, the events with start == end are extended to
+            start + pointWidth so that they are not lost between two
+            points of the index
+
+    Returns:
+        numpy.ndarray: a boolean mask with one value per point of the index
+    """
+    starts = pd.DatetimeIndex(starts)
+    ends = pd.DatetimeIndex(ends)
+    if pointWidth is not None:
+        ends = ends.where(ends != starts, starts + pd.Timedelta(pointWidth))
+
+    numPoints = len(index)
+    first = index.searchsorted(starts, side='left')
+    last = index.searchsorted(ends, side='right')
+    valid = first < last
+
+    difference = np.bincount(first[valid], minlength=numPoints + 1)
+    difference -= np.bincount(last[valid], minlength=numPoints + 1)
+
+    return np.cumsum(difference[:numPoints]) > 0
+
+# ------------------------------------------------------------------
+# Number of points each event spends in each bin (e.g. each day) when
+# it is expanded with pd.date_range(start, end, freq=step), computed
+# from the bounds of the events only
+# ------------------------------------------------------------------
+def stepsPerBin(starts, ends, step, binStart, binWidth, numBins):
+    """
+    The points of an event are start + k * step for k = 0..K with
+    K = floor((end - start) / step). The number of points before a time
+    t is clip(ceil((t - start) / step), 0, K + 1): the count in a bin is
+    the difference of this number at both edges of the bin.
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray, numpy.ndarray): sparse triplets
+        giving, for each (event, bin) pair with at least one point, the
+        event position, the bin position and the number of points
+    """
+    starts = pd.DatetimeIndex(starts).asi8
+    ends = pd.DatetimeIndex(ends).asi8
+    step = pd.Timedelta(step).value
+    binStart = pd.Timestamp(binStart).value
+    binWidth = pd.Timedelta(binWidth).value
+
+    # Points of each event (events ending before they start are empty):
+    numSteps = np.where(ends >= starts, (ends - starts) // step + 1, 0)
+    valid = numSteps > 0
+    lastPoints = starts + (numSteps - 1) * step
+
+    # One (event, bin) pair for each bin between the first and last points:
+    firstBins = np.floor_divide(starts - binStart, binWidth)
+    lastBins = np.floor_divide(lastPoints - binStart, binWidth)
+    spans = np.where(valid, lastBins - firstBins + 1, 0)
+    eventIds = np.repeat(np.arange(len(starts)), spans)
+    offsets = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+    binIds = firstBins[eventIds] + offsets
+
+    def pointsBefore(t, events):
+        count = -np.floor_divide(starts[events] - t, step)
+        return np.clip(count, 0, numSteps[events])
+
+    edges = binStart + binIds * binWidth
+    counts = pointsBefore(edges + binWidth, eventIds) - pointsBefore(edges, eventIds)
+
+    inRange = (binIds >= 0) & (binIds < numBins) & (counts > 0)
+    return eventIds[inRange], binIds[inRange], counts[inRange]
+
+# ------------------------------------------------------------------
+# Mean of the values carried by each event over every bin, as if each
+# event was expanded into a point per step holding its values
+# ------------------------------------------------------------------
+def binnedMeans(starts, ends, values, step, binStart, binWidth, numBins):
+    """
+    Parameters:
+        values (numpy.ndarray):
+            one row per event and one column per variable (NaN when an
+            event doesn't carry a variable: these points are ignored)
+
+    Returns:
+        numpy.ndarray: a (numBins, number of variables) array with the
+        mean of each variable in each bin (NaN when no point is found)
+    """
+    values = np.asarray(values, dtype=float).reshape(len(starts), -1)
+    eventIds, binIds, counts = stepsPerBin(starts, ends, step, binStart, binWidth, numBins)
+
+    eventValues = values[eventIds]
+    known = ~np.isnan(eventValues)
+    weights = counts[:, np.newaxis] * known
+
+    sums = np.zeros((numBins, values.shape[1]))
+    totals = np.zeros((numBins, values.shape[1]))
+    np.add.at(sums, binIds, np.where(known, eventValues, 0.0) * weights)
+    np.add.at(totals, binIds, weights)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(totals > 0, sums / totals, np.nan)
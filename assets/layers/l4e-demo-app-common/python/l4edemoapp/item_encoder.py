@@ -0,0 +1,76 @@
+import numpy as np
+
+# ---------------------------------------------------------------
+# Converts a whole dataframe into a list of DynamoDB items, ready
+# to be sent with the batch writer
+# ---------------------------------------------------------------
+def encodeDataframe(df, fieldTypes=None, defaultType='S'):
+    """
+    Builds the DynamoDB attribute maps of all the rows of a dataframe
+    column by column: each column is converted to strings in a single
+    vectorized operation on its underlying NumPy array, instead of
+    serializing every row separately.
+
+    Parameters:
+        df (pandas.DataFrame):
+            The dataframe to encode (the index is not encoded)
+        fieldTypes (dict):
+            DynamoDB attribute type ('S' or 'N') for each column name.
+            Columns not listed here get the default type
+        defaultType (string):
+            Type used for the columns absent from fieldTypes
+
+    Returns:
+        list: one item per row with the following format:
+        {'column': {'S': 'value'}, 'unix_timestamp': {'N': '1672531200.0'}}
+        Missing values are encoded as 'nan' in string attributes and are
+        left out of numeric attributes (DynamoDB numbers can't be NaN)
+    """
+    if fieldTypes is None:
+        fieldTypes = {}
+
+    columns = [str(c) for c in df.columns]
+    attributes = []
+    missingNumbers = []
+    for index, column in enumerate(df.columns):
+        attributeType = fieldTypes.get(columns[index], defaultType)
+        values, missing = encodeColumn(df[column].to_numpy())
+        attributes.append([{attributeType: v} for v in values])
+
+        if attributeType == 'N' and missing.any():
+            missingNumbers.append((columns[index], missing))
+
+    items = [dict(zip(columns, row)) for row in zip(*attributes)]
+
+    # Removes the numeric attributes with no value:
+    for column, missing in missingNumbers:
+        for index in np.flatnonzero(missing):
+            del items[index][column]
+
+    return items
+
+# ---------------------------------------------------------------------
+# Returns the string representation of a column and its missing values
+# ---------------------------------------------------------------------
+def encodeColumn(values):
+    kind = values.dtype.kind
+
+    # Floating point and integer columns: NumPy uses the shortest
+    # representation that round trips, like the str() builtin (adding
+    # 0.0 turns negative zeros into 0.0 as the JSON serialization did):
+    if kind == 'f':
+        return (values + 0.0).astype(str).tolist(), np.isnan(values)
+
+    if kind in 'iu':
+        return values.astype(str).tolist(), np.zeros(values.shape, dtype=bool)
+
+    # Timestamps are formatted like in the CSV files written
+    # by pandas (e.g. 2023-01-01 00:00:00):
+    if kind == 'M':
+        missing = np.isnat(values)
+        strings = np.datetime_as_string(values, unit='s')
+        return np.char.replace(strings, 'T', ' ').tolist(), missing
+
+    # Any other type (strings, booleans, mixed objects...):
+    missing = np.array([v is None or v != v for v in values], dtype=bool)
+    return ['nan' if m else str(v) for v, m in zip(values, missing)], missing
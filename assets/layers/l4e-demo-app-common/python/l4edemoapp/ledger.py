@@ -0,0 +1,168 @@
+import threading
+import time
+
+from l4edemoapp.tables import ddbCreateTable, ddbTableExists, ensureTable, isCached
+
+# Keys of the ledger tables: the S3 object (prefixed by the name of the
+# function processing it, as several functions are notified of the
+# same objects) and its ETag, so that an object overwritten with a new
+# content is processed again:
+LEDGER_KEYS = [('object', 'S'), ('etag', 'S')]
+
+# Time (in seconds) after which an object claimed by an invocation that
+# never completed it can be claimed by another delivery (the maximum
+# duration of a Lambda function):
+LEASE_SECONDS = 900
+
+# Time (in seconds) during which the ledger entries are kept (they are
+# then deleted by the TTL of the table):
+RETENTION_SECONDS = 7 * 86400
+
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+
+# Serializes the creation of the ledger tables by the threads of an
+# invocation processing several objects:
+_lock = threading.Lock()
+
+def ledgerTable(projectName):
+    return f'l4edemoapp-{projectName}-ledger'
+
+# ------------------------------------------------------------------
+# Makes sure the ledger table of a project exists: its entries expire
+# with a TTL enabled when the table is created
+# ------------------------------------------------------------------
+def ensureLedger(ddbClient, tableName):
+    if isCached(tableName):
+        return 'ACTIVE'
+
+    with _lock:
+        if isCached(tableName) or ddbTableExists(ddbClient, tableName):
+            return ensureTable(ddbClient, tableName, LEDGER_KEYS)
+
+        print(f'Table {tableName} does not exist, creating it...')
+        ddbCreateTable(ddbClient, tableName, LEDGER_KEYS)
+        ddbClient.update_time_to_live(
+            TableName=tableName,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+        )
+
+    return 'ACTIVE'
+
+# ------------------------------------------------------------------
+# Ledger entry of an S3 object processed by a Lambda function
+# ------------------------------------------------------------------
+class ObjectLedger:
+    """
+    Usage:
+        ledger = ObjectLedger(ddbClient, tableName, 'my-function', key, etag, context.aws_request_id)
+        if not ledger.claim():
+            return   # duplicate delivery
+
+        if not ledger.isCommitted('anomalies'):
+            ...      # write the anomalies
+            ledger.commit('anomalies')
+
+        ledger.complete()   # or ledger.complete('last stage')
+
+    The object is claimed with a conditional write: a duplicate delivery
+    is skipped after this single call when the object was completed, or
+    while another invocation holds its lease. The retries of a failed
+    invocation keep the same request id (owner) and resume after the
+    stages it already committed. A stage is a whole unit of work (e.g.
+    all the items of a table): a stage interrupted midway is done again.
+    """
+    def __init__(self, ddbClient, tableName, consumer, key, etag, owner, leaseSeconds=LEASE_SECONDS):
+        self.ddbClient = ddbClient
+        self.tableName = tableName
+        self.key = {'object': {'S': f'{consumer}:{key}'}, 'etag': {'S': etag}}
+        self.owner = owner
+        self.leaseSeconds = leaseSeconds
+        self.committed = set()
+
+    def claim(self):
+        """
+        Returns:
+            bool: True when this invocation must process the object
+            (self.committed then lists the stages already done), False
+            when the object was already processed or is being processed
+        """
+        now = int(time.time())
+        try:
+            response = self.ddbClient.update_item(
+                TableName=self.tableName,
+                Key=self.key,
+                UpdateExpression='SET #status = :inProgress, #owner = :owner, lease_until = :leaseUntil, expires_at = :expiresAt',
+                ConditionExpression=(
+                    'attribute_not_exists(#object) OR '
+                    '(#status = :inProgress AND (#owner = :owner OR lease_until < :now))'
+                ),
+                ExpressionAttributeNames={'#object': 'object', '#status': 'status', '#owner': 'owner'},
+                ExpressionAttributeValues={
+                    ':inProgress': {'S': IN_PROGRESS},
+                    ':owner': {'S': self.owner},
+                    ':leaseUntil': {'N': str(now + self.leaseSeconds)},
+                    ':expiresAt': {'N': str(now + RETENTION_SECONDS)},
+                    ':now': {'N': str(now)}
+                },
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+
+        except self.ddbClient.exceptions.ConditionalCheckFailedException as e:
+            status = e.response.get('Item', {}).get('status', {}).get('S', 'unknown')
+            print(f"{self.key['object']['S']} ({self.key['etag']['S']}) skipped, status: {status}")
+            return False
+
+        self.committed = set(response['Attributes'].get('stages', {}).get('SS', []))
+        if len(self.committed) > 0:
+            print(f"Resuming {self.key['object']['S']} after: {', '.join(sorted(self.committed))}")
+
+        return True
+
+    def isCommitted(self, stage):
+        return stage in self.committed
+
+    # Several stages are committed with a single request:
+    def commit(self, *stages):
+        stages = sorted(set(stages) - self.committed)
+        if len(stages) == 0:
+            return
+
+        self.ddbClient.update_item(
+            TableName=self.tableName,
+            Key=self.key,
+            UpdateExpression='ADD stages :stages',
+            ExpressionAttributeValues={':stages': {'SS': stages}}
+        )
+        self.committed.update(stages)
+
+    # The last stages can be committed with the completion of the object:
+    def complete(self, *stages):
+        stages = sorted(set(stages) - self.committed)
+        updateExpression = 'SET #status = :completed REMOVE lease_until'
+        expressionAttributeValues = {':completed': {'S': COMPLETED}}
+        if len(stages) > 0:
+            updateExpression += ' ADD stages :stages'
+            expressionAttributeValues[':stages'] = {'SS': stages}
+
+        self.ddbClient.update_item(
+            TableName=self.tableName,
+            Key=self.key,
+            UpdateExpression=updateExpression,
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues=expressionAttributeValues
+        )
+        self.committed.update(stages)
+
+# ------------------------------------------------------------------
+# ETag of the object of an S3 event record (without its quotes), read
+# from the object itself (bucket and decoded key) when the notification
+# doesn't carry it
+# ------------------------------------------------------------------
+def recordETag(s3Client, record, bucket, key):
+    etag = record['s3']['object'].get('eTag')
+    if etag is None:
+        etag = s3Client.head_object(Bucket=bucket, Key=key)['ETag']
+
+    return etag.strip('"')
@@ -0,0 +1,91 @@
+import threading
+import time
+
+from collections import OrderedDict
+
+# Time (in seconds) during which a description is reused without
+# calling the Lookout for Equipment API again:
+CACHE_TTL = 900
+
+# Maximum number of descriptions kept per kind of resource (the least
+# recently used ones are evicted first):
+CACHE_SIZE = 64
+
+# ------------------------------------------------------------------
+# Size-bounded LRU cache whose entries expire after a given time. The
+# caches below live at the module level and are therefore kept between
+# the invocations of a warm Lambda function
+# ------------------------------------------------------------------
+class MetadataCache:
+    def __init__(self, ttl=CACHE_TTL, maxSize=CACHE_SIZE):
+        self.ttl = ttl
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            value, storeTime = entry
+            if time.monotonic() - storeTime > self.ttl:
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+_models = MetadataCache()
+_schedulers = MetadataCache()
+_datasets = MetadataCache()
+
+def _describe(cache, key, describe):
+    response = cache.get(key)
+    if response is None:
+        response = describe()
+        cache.put(key, response)
+
+    return response
+
+# ------------------------------------------------------------------
+# Cached versions of the Lookout for Equipment describe_* calls: only
+# use them for the fields that don't change once the resource exists
+# (dataset name, schema, sampling rate, input file name format...),
+# not to poll a status
+# ------------------------------------------------------------------
+def describeModel(l4eClient, modelName):
+    return _describe(_models, modelName, lambda: l4eClient.describe_model(ModelName=modelName))
+
+def describeInferenceScheduler(l4eClient, schedulerName):
+    return _describe(
+        _schedulers,
+        schedulerName,
+        lambda: l4eClient.describe_inference_scheduler(InferenceSchedulerName=schedulerName)
+    )
+
+def describeDataset(l4eClient, datasetName):
+    return _describe(_datasets, datasetName, lambda: l4eClient.describe_dataset(DatasetName=datasetName))
+
+def invalidate(name=None):
+    """
+    Forgets the cached descriptions of a model, scheduler or dataset
+    (or of all of them when no name is given)
+    """
+    for cache in [_models, _schedulers, _datasets]:
+        cache.invalidate(name)
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+
+# Levels of the downsampling pyramid (stored with these values in the
+# sampling_rate key of the time series table), on top of the hourly data:
+PYRAMID_LEVELS = ['1d', '1w']
+LTTB_LEVEL = 'lttb'
+LTTB_POINTS = 1000
+
+# ----------------------------------------------------------
+# Returns the start of the period each timestamp belongs to
+# (days start at midnight and weeks on Mondays)
+# ----------------------------------------------------------
+def periodStart(index, level):
+    days = index.floor('D')
+    if level == '1d':
+        return days
+    if level == '1w':
+        return days - pd.to_timedelta(index.dayofweek, unit='D')
+
+    raise ValueError(f'Unknown pyramid level: {level}')
+
+# ------------------------------------------------------------------
+# Aggregates the raw time series (possibly read by chunks) into the
+# min, max and mean of each sensor for every level of the pyramid
+# ------------------------------------------------------------------
+class PyramidAccumulator:
+    """
+    Keeps running sums, counts, minimums and maximums per period: their
+    size only depends on the number of days covered by the dataset, not
+    on the number of rows fed.
+    """
+    def __init__(self, levels=PYRAMID_LEVELS):
+        self.levels = levels
+        self.aggregates = {level: None for level in levels}
+
+    def feed(self, df):
+        df = df.select_dtypes(include='number')
+        if df.shape[0] == 0:
+            return
+
+        for level in self.levels:
+            groups = df.groupby(periodStart(df.index, level))
+            current = {
+                'sum': groups.sum(min_count=1),
+                'count': groups.count(),
+                'min': groups.min(),
+                'max': groups.max()
+            }
+
+            previous = self.aggregates[level]
+            if previous is not None:
+                current = {
+                    'sum': previous['sum'].add(current['sum'], fill_value=0),
+                    'count': previous['count'].add(current['count'], fill_value=0),
+                    'min': pd.concat([previous['min'], current['min']]).groupby(level=0).min(),
+                    'max': pd.concat([previous['max'], current['max']]).groupby(level=0).max()
+                }
+
+            self.aggregates[level] = current
+
+    def lastPeriods(self):
+        """
+        Returns the running aggregates of the last period of each level
+        (the only one which new rows can still change), in a form that
+        can be stored as JSON and given back to restore()
+        """
+        state = {}
+        for level in self.levels:
+            aggregates = self.aggregates[level]
+            if aggregates is None:
+                continue
+
+            period = aggregates['sum'].index[-1]
+            state[level] = {'period': str(period)}
+            for name, values in aggregates.items():
+                state[level][name] = {tag: None if pd.isna(v) else float(v) for tag, v in values.loc[period].items()}
+
+        return state
+
+    def restore(self, state):
+        for level, periodState in state.items():
+            if level not in self.levels:
+                continue
+
+            period = pd.DatetimeIndex([pd.Timestamp(periodState['period'])], name='timestamp')
+            self.aggregates[level] = {
+                name: pd.DataFrame([periodState[name]], index=period, dtype=float)
+                for name in ['sum', 'count', 'min', 'max']
+            }
+
+    def result(self, level):
+        """
+        Returns a dataframe indexed by the start of each period with,
+        for each sensor, its mean (in a column with the sensor name) and
+        its extreme values (in the <sensor>__min and <sensor>__max
+        columns). Missing values are replaced by 0.0 like in the hourly
+        data.
+        """
+        aggregates = self.aggregates[level]
+        if aggregates is None:
+            return None
+
+        count = aggregates['count']
+        mean = aggregates['sum'] / count.where(count > 0)
+        mean = mean[(count > 0).any(axis='columns')]
+
+        df = pd.DataFrame(index=mean.index)
+        for tag in mean.columns:
+            df[tag] = mean[tag]
+            df[f'{tag}__min'] = aggregates['min'][tag].reindex(mean.index)
+            df[f'{tag}__max'] = aggregates['max'][tag].reindex(mean.index)
+
+        df.index.name = 'timestamp'
+        return df.fillna(value=0.0)
+
+# ------------------------------------------------------------------
+# Largest-Triangle-Three-Buckets decimation of a time series
+# ------------------------------------------------------------------
+def lttb(df, numPoints=LTTB_POINTS):
+    """
+    Reduces a dataframe (indexed by timestamps) to numPoints rows that
+    preserve its visual shape. The series is split in buckets and, for
+    each sensor, the point kept in a bucket is the one forming the
+    largest triangle with the point kept in the previous bucket and the
+    average of the next one. All the sensors are processed at once.
+
+    The rows of a DynamoDB item share a single timestamp: each row is
+    therefore stamped with the start of its bucket and carries, for
+    each sensor, the selected value (in the column with the sensor name)
+    along with the bucket minimum, maximum and mean values (in the
+    <sensor>__min, <sensor>__max and <sensor>__mean columns).
+    """
+    df = df.select_dtypes(include='number')
+    numRows = df.shape[0]
+    if numRows == 0:
+        return None
+
+    numPoints = max(3, min(numPoints, numRows))
+    x = (df.index.values - df.index.values[0]) / np.timedelta64(1, 's')
+    y = df.to_numpy(dtype=float)
+
+    # Bucket boundaries: the first and last points are kept as is
+    edges = np.linspace(1, numRows - 1, numPoints - 1).astype(int)
+    edges = np.concatenate([[0], edges, [numRows]])
+    if numRows <= 2:
+        edges = np.arange(numRows + 1)
+
+    numBuckets = len(edges) - 1
+    columns = np.arange(y.shape[1])
+    selected = np.zeros((numBuckets, y.shape[1]), dtype=int)
+    for bucket in range(1, numBuckets - 1):
+        start, end = edges[bucket], edges[bucket + 1]
+        nextStart, nextEnd = edges[bucket + 1], edges[bucket + 2]
+
+        ax = x[selected[bucket - 1]]
+        ay = y[selected[bucket - 1], columns]
+        cx = x[nextStart:nextEnd].mean()
+        cy = y[nextStart:nextEnd].mean(axis=0)
+
+        bx = x[start:end, np.newaxis]
+        by = y[start:end]
+        areas = np.abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay))
+        selected[bucket] = start + np.argmax(areas, axis=0)
+
+    selected[-1] = numRows - 1
+
+    bucketIds = np.repeat(np.arange(numBuckets), np.diff(edges))
+    groups = df.groupby(bucketIds)
+    minimums, maximums, means = groups.min(), groups.max(), groups.mean()
+
+    result = pd.DataFrame(index=df.index[edges[:-1]])
+    for position, tag in enumerate(df.columns):
+        result[tag] = y[selected[:, position], position]
+        result[f'{tag}__min'] = minimums[tag].values
+        result[f'{tag}__max'] = maximums[tag].values
+        result[f'{tag}__mean'] = means[tag].values
+
+    result.index.name = 'timestamp'
+    return result
@@ -0,0 +1,107 @@
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from l4edemoapp.clients import MAX_POOL_CONNECTIONS
+from l4edemoapp.time_codec import toEpoch
+
+# Timestamp formats accepted by the inference schedulers in the
+# names of their input files:
+TIMESTAMP_FORMATS = {
+    'yyyyMMddHHmmss': '%Y%m%d%H%M%S',
+    'yyyy-MM-dd-HH-mm-ss': '%Y-%m-%d-%H-%M-%S',
+    'epoch': None
+}
+
+# One upload thread per connection of the pool of the shared S3 client
+# (see clients.py), so that no connection is opened and discarded:
+MAX_WORKERS = MAX_POOL_CONNECTIONS
+
+# ------------------------------------------------------------------
+# Formats the timestamp used in the name of an inference input file
+# ------------------------------------------------------------------
+def formatTimestamp(timestamp, timestampFormat='yyyyMMddHHmmss'):
+    if timestampFormat not in TIMESTAMP_FORMATS:
+        raise ValueError(f'Unknown timestamp format: {timestampFormat}')
+
+    if timestampFormat == 'epoch':
+        return str(toEpoch(timestamp))
+
+    return timestamp.strftime(TIMESTAMP_FORMATS[timestampFormat])
+
+def replayManifestKey(modelName):
+    return f'inference-data/{modelName}/replay-manifest.json'
+
+# ------------------------------------------------------------------
+# Splits a time series in blocks covering one scheduler interval each
+# ------------------------------------------------------------------
+def sliceIntervals(df, intervalSeconds):
+    """
+    Returns a list of (interval start, dataframe) tuples: the intervals
+    start on multiples of intervalSeconds (in epoch time), like the
+    windows read by an inference scheduler at this upload frequency.
+    """
+    if df.shape[0] == 0:
+        return []
+
+    epochs = df.index.asi8 // 10**9
+    intervals = epochs - epochs % intervalSeconds
+    boundaries = np.flatnonzero(np.diff(intervals)) + 1
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [len(intervals)]])
+
+    return [
+        (pd.Timestamp(intervals[start], unit='s'), df.iloc[start:end])
+        for start, end in zip(starts, ends)
+    ]
+
+# ------------------------------------------------------------------
+# Writes all the inference input files of a replay at once
+# ------------------------------------------------------------------
+def writeReplayFiles(s3Client, df, bucket, prefix, component, intervalSeconds,
+                     timestampFormat='yyyyMMddHHmmss', delimiter='-', maxWorkers=MAX_WORKERS):
+    """
+    Slices a time series (sorted DatetimeIndex, one column per tag) in
+    scheduler intervals and uploads each slice as a CSV file named after
+    the start of its interval (e.g. <prefix><component>-20230101120500.csv)
+    from a pool of threads.
+
+    Returns:
+        dict: the manifest of the replay, listing the key, the interval
+        start and the number of rows of each file
+    """
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+
+    def upload(interval):
+        start, block = interval
+        key = f'{prefix}{component}{delimiter}{formatTimestamp(start, timestampFormat)}.csv'
+        s3Client.put_object(Bucket=bucket, Key=key, Body=block.to_csv().encode('utf-8'))
+
+        return {'key': key, 'start': str(start), 'rows': block.shape[0]}
+
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        files = list(executor.map(upload, sliceIntervals(df, intervalSeconds)))
+
+    return {
+        'bucket': bucket,
+        'prefix': prefix,
+        'component': component,
+        'intervalSeconds': intervalSeconds,
+        'timestampFormat': timestampFormat,
+        'delimiter': delimiter,
+        'numFiles': len(files),
+        'numRows': int(sum(f['rows'] for f in files)),
+        'files': files
+    }
+
+def writeReplayManifest(s3Client, bucket, key, manifest):
+    s3Client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(manifest).encode('utf-8'),
+        ContentType='application/json'
+    )
@@ -0,0 +1,96 @@
+import pandas as pd
+
+# The hourly data fills gaps for one day at most:
+HOURLY_FFILL_LIMIT = 24
+
+# ------------------------------------------------------------------
+# Hourly resampling of a time series read by chunks: all the rows of
+# a given hour are averaged together, even when they come from two
+# different chunks, so that the results are the same as resampling
+# the whole dataframe at once
+# ------------------------------------------------------------------
+class ChunkedHourlyResampler:
+    """
+    Resamples time-ordered chunks of a dataframe (with a DatetimeIndex)
+    to hourly means. The rows of the last (possibly incomplete) hour of
+    each chunk are carried over to the next chunk: each hour is then
+    averaged by pandas from exactly the same rows as an in-memory
+    resample('1h').mean() would use.
+
+    feed() and finish() return the hourly means finalized so far, with
+    a row for every hour (NaN for the hours without data) so that the
+    blocks can be concatenated or forward-filled as a continuous series.
+    """
+    def __init__(self):
+        self.carry = None
+        self.nextHour = None
+
+    def feed(self, chunk):
+        if len(chunk) == 0:
+            return None
+
+        if self.nextHour is not None and chunk.index.min() < self.nextHour:
+            raise ValueError(
+                'The timestamps must be in chronological order to be resampled by chunks '
+                f'(found {chunk.index.min()} after the data of {self.nextHour - pd.Timedelta("1h")})'
+            )
+
+        data = chunk if self.carry is None else pd.concat([self.carry, chunk], axis='index')
+        data = data.sort_index()
+        lastHour = data.index[-1].floor('h')
+        self.carry = data[data.index >= lastHour]
+
+        return self.resample(data[data.index < lastHour], lastHour)
+
+    def finish(self):
+        if self.carry is None or len(self.carry) == 0:
+            return None
+
+        lastHour = self.carry.index[-1].floor('h') + pd.Timedelta('1h')
+        block = self.resample(self.carry, lastHour)
+        self.carry = None
+
+        return block
+
+    def resample(self, data, endHour):
+        startHour = self.nextHour
+        if startHour is None:
+            if len(data) == 0:
+                return None
+            startHour = data.index[0].floor('h')
+
+        self.nextHour = endHour
+        if startHour >= endHour:
+            return None
+
+        index = pd.date_range(start=startHour, end=endHour - pd.Timedelta('1h'), freq='1h', name=data.index.name)
+        if len(data) == 0:
+            return pd.DataFrame(index=index, columns=data.columns, dtype=float)
+
+        return data.resample('1h').mean().reindex(index)
+
+# ----------------------------------------------------------------
+# Forward-fill applied block by block: the last rows (before their
+# filling) of each block are kept to fill the start of the next one
+# ----------------------------------------------------------------
+class ForwardFiller:
+    def __init__(self, limit=HOURLY_FFILL_LIMIT):
+        self.limit = limit
+        self.history = None
+
+    def fill(self, block):
+        if block is None or len(block) == 0:
+            return block
+
+        if self.history is None:
+            data = block
+        else:
+            data = pd.concat([self.history, block], axis='index')
+
+        filled = data.ffill(limit=self.limit).iloc[len(data) - len(block):]
+
+        # One more row than needed to fill the next block: the history
+        # also gives the last values used by the incremental preparation
+        self.history = data.tail(self.limit + 1)
+
+        return filled
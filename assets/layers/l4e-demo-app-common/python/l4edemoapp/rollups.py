@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 86400
+
+# The epoch (1970-01-01) is a Thursday: weeks start on Mondays
+EPOCH_WEEKDAY = 3
+
+ROLLUP_LEVELS = ['daily', 'weekly', 'monthly']
+
+# ------------------------------------------------------------------
+# Converts a DatetimeIndex (timezone-naive UTC) to epoch seconds
+# ------------------------------------------------------------------
+def epochSeconds(index):
+    return pd.DatetimeIndex(index).asi8 // 10**9
+
+# ------------------------------------------------------------------
+# Start (in epoch seconds) of the period of each day number
+# ------------------------------------------------------------------
+def periodStarts(days, level):
+    if level == 'daily':
+        return days * SECONDS_PER_DAY
+
+    if level == 'weekly':
+        weekStarts = days - (days + EPOCH_WEEKDAY) % 7
+        return weekStarts * SECONDS_PER_DAY
+
+    if level == 'monthly':
+        months = days.astype('datetime64[D]').astype('datetime64[M]')
+        return months.astype('datetime64[s]').astype(np.int64)
+
+    raise ValueError(f'Unknown rollup level: {level}')
+
+# ------------------------------------------------------------------
+# Sums values (e.g. 1.0 for each anomalous timestamp) over days, weeks
+# and months, from their timestamps in epoch seconds
+# ------------------------------------------------------------------
+def rollup(timestamps, values, levels=ROLLUP_LEVELS, column='anomaly'):
+    """
+    The timestamps are binned once into integer day numbers: the weekly
+    and monthly sums are then aggregated from the (few) daily sums. The
+    same function is used on a whole evaluation period or on a handful
+    of new inference results.
+
+    Parameters:
+        timestamps (array-like of int):
+            epoch seconds of each value
+        values (array-like of float):
+            values to sum
+        levels (list of string):
+            any of 'daily', 'weekly' and 'monthly'
+        column (string):
+            name of the column holding the sums
+
+    Returns:
+        dict: for each level, a dataframe indexed by the start of each
+        period (in epoch seconds, 'timestamp' index) with the sum of the
+        values in the given column. Only the periods with at least
+        one timestamp are listed.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+
+    days, positions = np.unique(np.floor_divide(timestamps, SECONDS_PER_DAY), return_inverse=True)
+    dailySums = np.bincount(positions, weights=values, minlength=len(days))
+
+    results = {}
+    for level in levels:
+        starts = periodStarts(days, level)
+        if level == 'daily':
+            periods, sums = starts, dailySums
+        else:
+            periods, periodPositions = np.unique(starts, return_inverse=True)
+            sums = np.bincount(periodPositions, weights=dailySums, minlength=len(periods))
+
+        results[level] = pd.DataFrame({column: sums}, index=pd.Index(periods, name='timestamp'))
+
+    return results
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Size of the parts sent with the S3 multipart upload API
+# (all parts but the last one must be at least 5 MB):
+PART_SIZE = 8 * 1024 * 1024
+
+# -------------------------------------------------------------------
+# File-like object streaming its content to S3: the data is buffered
+# in memory and sent part by part, so that files larger than the
+# memory (or the /tmp storage) of a Lambda function can be written
+# -------------------------------------------------------------------
+class S3MultipartWriter:
+    """
+    Usage:
+        with S3MultipartWriter(s3Client, bucket, key) as writer:
+            writer.write(df.to_csv())
+
+    Small files (less than one part) are sent with a single PutObject
+    call when the writer is closed. If an exception is raised within the
+    with block, the multipart upload is aborted and no object is created.
+    An optional listener (any object with a feed() method, such as a
+    TimeIndexBuilder) is given every block of bytes written.
+    """
+    def __init__(self, s3Client, bucket, key, partSize=PART_SIZE, listener=None):
+        self.s3Client = s3Client
+        self.bucket = bucket
+        self.key = key
+        self.partSize = partSize
+        self.buffer = bytearray()
+        self.uploadId = None
+        self.parts = []
+        self.size = 0
+        self.listener = listener
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        if self.listener is not None:
+            self.listener.feed(data)
+
+        self.buffer.extend(data)
+        self.size += len(data)
+        while len(self.buffer) >= self.partSize:
+            self.uploadPart(bytes(self.buffer[:self.partSize]))
+            del self.buffer[:self.partSize]
+
+        return len(data)
+
+    def uploadPart(self, body):
+        if self.uploadId is None:
+            response = self.s3Client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self.uploadId = response['UploadId']
+
+        partNumber = len(self.parts) + 1
+        response = self.s3Client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.uploadId,
+            PartNumber=partNumber,
+            Body=body
+        )
+        self.parts.append({'PartNumber': partNumber, 'ETag': response['ETag']})
+
+    def close(self):
+        if self.uploadId is None:
+            self.s3Client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+
+        else:
+            if len(self.buffer) > 0:
+                self.uploadPart(bytes(self.buffer))
+
+            self.s3Client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.uploadId,
+                MultipartUpload={'Parts': self.parts}
+            )
+
+        self.buffer = bytearray()
+        return self.key
+
+    # Called when the upload fails: an error while aborting it is only
+    # logged so that the original exception is the one raised
+    def abort(self):
+        if self.uploadId is not None:
+            try:
+                self.s3Client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.uploadId)
+
+            except Exception as e:
+                print(f'Multipart upload of {self.key} could not be aborted:', e)
+
+            self.uploadId = None
+
+        self.buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        if exceptionType is None:
+            self.close()
+        else:
+            self.abort()
+
+# ------------------------------------------------------------------
+# Serializes a dataframe in CSV straight to S3 (no local file): pandas
+# writes the rows by chunks in the writer, which only keeps one part in
+# memory at a time
+# ------------------------------------------------------------------
+def writeCsv(s3Client, df, bucket, key, partSize=PART_SIZE, listener=None, **csvOptions):
+    with S3MultipartWriter(s3Client, bucket, key, partSize, listener) as writer:
+        df.to_csv(writer, **csvOptions)
+
+    return key
+
+# ------------------------------------------------------------------
+# Writes several CSV files at once, each one with its own S3 sink
+# ------------------------------------------------------------------
+def writeCsvFiles(s3Client, outputs, maxWorkers=4, partSize=PART_SIZE):
+    """
+    Parameters:
+        outputs (list of tuple):
+            (dataframe, bucket, key, csvOptions) for each file to write
+            (csvOptions may also contain the listener of the writer)
+
+    Returns:
+        list: the keys of the files written, in the same order
+    """
+    def write(output):
+        df, bucket, key, csvOptions = output
+        return writeCsv(s3Client, df, bucket, key, partSize, **csvOptions)
+
+    if len(outputs) == 1:
+        return [write(outputs[0])]
+
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        return list(executor.map(write, outputs))
@@ -0,0 +1,42 @@
+import json
+
+from collections import namedtuple
+from functools import lru_cache
+
+# Parsed schema of a Lookout for Equipment dataset or model:
+#   component:       name of the (first) component
+#   timestampColumn: name of its DATETIME column
+#   tags:            names of the other columns, in the schema order
+#   types:           type of every column of the component
+ModelSchema = namedtuple('ModelSchema', ['component', 'timestampColumn', 'tags', 'types'])
+
+# ------------------------------------------------------------------
+# Parses the JSON schema returned by describe_model / describe_dataset
+# ------------------------------------------------------------------
+@lru_cache(maxsize=64)
+def parseSchema(schema):
+    """
+    The schema string is parsed as JSON (never evaluated) and the result
+    is cached: the same schema is returned by every description of a
+    given model.
+
+    Returns:
+        ModelSchema: the columns of the first component of the schema
+    """
+    columns = json.loads(schema)['Components'][0]
+    types = {column['Name']: column['Type'] for column in columns['Columns']}
+    timestampColumns = [name for name, columnType in types.items() if columnType == 'DATETIME']
+
+    return ModelSchema(
+        component=columns.get('ComponentName'),
+        timestampColumn=timestampColumns[0] if len(timestampColumns) > 0 else None,
+        tags=tuple(name for name, columnType in types.items() if columnType != 'DATETIME'),
+        types=types
+    )
+
+# ------------------------------------------------------------------
+# Decodes a JSON lines document (e.g. an inference results file) into
+# a list of dictionaries, skipping the empty lines
+# ------------------------------------------------------------------
+def decodeJsonLines(text):
+    return [json.loads(line) for line in text.splitlines() if line.strip() != '']
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from l4edemoapp.tables import DEFAULT_KEYS, tableKeySchema
+
+# Optional sharded key scheme of the tables storing the model results:
+# the partition key is the model name followed by the start of a time
+# bucket (model#1672531200), so that a model running inferences every
+# second spreads its writes and reads over one partition per bucket.
+# The model attribute is kept in the items, which can therefore also
+# be written in tables created with the default keys. The name of the
+# partition key holds the duration of the buckets (model_shard_900):
+# the key schema of a table is then enough to know how it is sharded.
+# The functions don't shard their tables yet: the dashboards still
+# query the results tables on the model attribute, the tables can only
+# be sharded once they read them through queryRange()
+SHARD_KEY = 'model_shard'
+
+# Tables written at the inference cadence (the daily_rate table only
+# receives one item per day and keeps the default keys):
+SHARDED_TABLE_SUFFIXES = ('-anomalies', '-raw-anomalies', '-sensor_contribution')
+
+def shardKey(bucketSeconds):
+    return f'{SHARD_KEY}_{bucketSeconds}'
+
+# ------------------------------------------------------------------
+# Key schema to use when creating a results table: bucketSeconds is
+# the duration of the time buckets (0 disables the sharding)
+# ------------------------------------------------------------------
+def tableKeys(tableName, bucketSeconds):
+    if bucketSeconds > 0 and tableName.endswith(SHARDED_TABLE_SUFFIXES):
+        return [(shardKey(bucketSeconds), 'S'), ('timestamp', 'N')]
+
+    return DEFAULT_KEYS
+
+# ------------------------------------------------------------------
+# Duration of the time buckets of a table: an existing table keeps the
+# key schema it was created with (read with DescribeTable), whatever
+# the current configuration. bucketSeconds is only used for the tables
+# which don't exist yet. Returns 0 for the tables not sharded
+# ------------------------------------------------------------------
+def tableBucketSeconds(ddbClient, tableName, bucketSeconds):
+    keys = tableKeySchema(ddbClient, tableName)
+    if keys is None:
+        keys = tableKeys(tableName, bucketSeconds)
+
+    partitionKey = keys[0][0]
+    if partitionKey.startswith(f'{SHARD_KEY}_'):
+        return int(partitionKey[len(SHARD_KEY) + 1:])
+
+    return 0
+
+def shardValue(model, timestamp, bucketSeconds):
+    timestamp = int(float(timestamp))
+    return f'{model}#{timestamp - timestamp % bucketSeconds}'
+
+# ------------------------------------------------------------------
+# Adds the sharded partition key to DynamoDB items built with the
+# default keys (model and timestamp attributes)
+# ------------------------------------------------------------------
+def shardItems(items, bucketSeconds):
+    if bucketSeconds <= 0:
+        return items
+
+    return [
+        {shardKey(bucketSeconds): {'S': shardValue(item['model']['S'], item['timestamp']['N'], bucketSeconds)}, **item}
+        for item in items
+    ]
+
+def shardsInRange(model, start, end, bucketSeconds):
+    """
+    Returns:
+        list: the partition key values covering [start, end] (epoch
+        seconds), in chronological order
+    """
+    firstBucket = int(start) - int(start) % bucketSeconds
+    return [f'{model}#{bucket}' for bucket in range(firstBucket, int(end) + 1, bucketSeconds)]
+
+def queryPartition(ddbClient, tableName, keyName, keyValue, start, end, **queryOptions):
+    items = []
+    request = {
+        'TableName': tableName,
+        'KeyConditionExpression': '#key = :key AND #timestamp BETWEEN :start AND :end',
+        'ExpressionAttributeNames': {'#key': keyName, '#timestamp': 'timestamp'},
+        'ExpressionAttributeValues': {
+            ':key': {'S': keyValue},
+            ':start': {'N': str(int(start))},
+            ':end': {'N': str(int(end))}
+        },
+        **queryOptions
+    }
+
+    while True:
+        response = ddbClient.query(**request)
+        items.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return items
+
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+# ------------------------------------------------------------------
+# Reads the results of a model over a time range: with the sharded
+# key scheme, the shards covering the range are queried in parallel
+# ------------------------------------------------------------------
+def queryRange(ddbClient, tableName, model, start, end, bucketSeconds=0, maxWorkers=8, **queryOptions):
+    """
+    Parameters:
+        ddbClient (botocore.client.DynamoDB):
+            A DynamoDB client
+        tableName (string):
+            Table to read
+        model (string):
+            Name of the model
+        start, end (int):
+            Bounds of the range, in epoch seconds (both included)
+        bucketSeconds (int):
+            Duration of the time buckets the table was created with
+            (0 for the tables partitioned on the model only), as given
+            by tableBucketSeconds()
+        queryOptions:
+            Additional parameters of the Query requests (e.g. the
+            ProjectionExpression)
+
+    Returns:
+        list: the items of the range, in timestamp order
+    """
+    if bucketSeconds <= 0:
+        return queryPartition(ddbClient, tableName, 'model', model, start, end, **queryOptions)
+
+    # The shards cover disjoint time buckets: concatenating their
+    # (sorted) items in the bucket order keeps the timestamp order:
+    shards = shardsInRange(model, start, end, bucketSeconds)
+    with ThreadPoolExecutor(max_workers=max(min(maxWorkers, len(shards)), 1)) as executor:
+        results = executor.map(
+            lambda shard: queryPartition(ddbClient, tableName, shardKey(bucketSeconds), shard, start, end, **queryOptions),
+            shards
+        )
+
+        return [item for items in results for item in items]
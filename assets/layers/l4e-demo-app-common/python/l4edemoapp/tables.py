@@ -0,0 +1,171 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Time (in seconds) during which a table seen as ACTIVE is
+# considered to still exist without checking it again:
+CACHE_TTL = 900
+
+# Tables known to be ACTIVE with the time at which they were last
+# checked. This cache lives at the module level and is therefore kept
+# between the invocations of a warm Lambda function:
+_activeTables = {}
+_lock = threading.Lock()
+
+# Key schemas of the tables known as ACTIVE (a table keeps the keys
+# it was created with):
+_keySchemas = {}
+
+# Default key schema of the tables storing the model results:
+DEFAULT_KEYS = [('model', 'S'), ('timestamp', 'N')]
+
+# -----------------------------------------------
+# Cache management for the tables known as ACTIVE
+# -----------------------------------------------
+def isCached(tableName):
+    with _lock:
+        checkTime = _activeTables.get(tableName)
+        if checkTime is None:
+            return False
+
+        if time.monotonic() - checkTime > CACHE_TTL:
+            del _activeTables[tableName]
+            return False
+
+        return True
+
+def markActive(tableName):
+    with _lock:
+        _activeTables[tableName] = time.monotonic()
+
+def invalidate(tableName=None):
+    with _lock:
+        if tableName is None:
+            _activeTables.clear()
+            _keySchemas.clear()
+        else:
+            _activeTables.pop(tableName, None)
+            _keySchemas.pop(tableName, None)
+
+# ---------------------------------------------------------
+# Checks if a DynamoDB table exists and returns its status
+# ---------------------------------------------------------
+def ddbTableExists(ddbClient, tableName):
+    if isCached(tableName):
+        return 'ACTIVE'
+
+    try:
+        response = ddbClient.describe_table(TableName=tableName)
+
+    except ddbClient.exceptions.ResourceNotFoundException:
+        return False
+
+    status = response['Table']['TableStatus']
+    if status == 'ACTIVE':
+        markActive(tableName)
+
+    return status
+
+# ---------------------------------------------------------------
+# Returns the keys of an existing table as a list of (name, type),
+# partition key first, or None when the table doesn't exist
+# ---------------------------------------------------------------
+def tableKeySchema(ddbClient, tableName):
+    if isCached(tableName):
+        with _lock:
+            if tableName in _keySchemas:
+                return _keySchemas[tableName]
+
+    try:
+        response = ddbClient.describe_table(TableName=tableName)
+
+    except ddbClient.exceptions.ResourceNotFoundException:
+        return None
+
+    table = response['Table']
+    attributeTypes = {a['AttributeName']: a['AttributeType'] for a in table['AttributeDefinitions']}
+    keySchema = sorted(table['KeySchema'], key=lambda k: k['KeyType'] != 'HASH')
+    keys = [(k['AttributeName'], attributeTypes[k['AttributeName']]) for k in keySchema]
+
+    if table['TableStatus'] == 'ACTIVE':
+        markActive(tableName)
+        with _lock:
+            _keySchemas[tableName] = keys
+
+    return keys
+
+# -----------------------------------------------------------
+# Creates a DynamoDB table and waits for it to become ACTIVE
+# -----------------------------------------------------------
+def ddbCreateTable(ddbClient, tableName, keys=DEFAULT_KEYS, wait=True):
+    """
+    Creates an on-demand table with the given keys: the first key is
+    used as the partition key and the second one (if any) as the sort
+    key. If the table is already being created (e.g. by a concurrent
+    invocation), the function simply waits for it.
+    """
+    keyTypes = ['HASH', 'RANGE']
+
+    try:
+        ddbClient.create_table(
+            TableName=tableName,
+            AttributeDefinitions=[{'AttributeName': name, 'AttributeType': attributeType} for name, attributeType in keys],
+            KeySchema=[{'AttributeName': name, 'KeyType': keyTypes[index]} for index, (name, _) in enumerate(keys)],
+            BillingMode='PAY_PER_REQUEST',
+            TableClass='STANDARD'
+        )
+    except ddbClient.exceptions.ResourceInUseException:
+        print(f'Table {tableName} already exists')
+
+    if wait:
+        waitForTable(ddbClient, tableName)
+
+    return 'ACTIVE' if wait else 'CREATING'
+
+def waitForTable(ddbClient, tableName):
+    waiter = ddbClient.get_waiter('table_exists')
+    waiter.wait(TableName=tableName, WaiterConfig={'Delay': 1, 'MaxAttempts': 120})
+    markActive(tableName)
+
+# ------------------------------------------------------------
+# Makes sure a table exists: this is the function to call on
+# the hot path as it only hits DynamoDB on a cache miss
+# ------------------------------------------------------------
+def ensureTable(ddbClient, tableName, keys=DEFAULT_KEYS):
+    status = ddbTableExists(ddbClient, tableName)
+    if status == 'ACTIVE':
+        return status
+
+    if not status:
+        print(f'Table {tableName} does not exist, creating it...')
+        return ddbCreateTable(ddbClient, tableName, keys)
+
+    # The table exists but is still being created or updated:
+    waitForTable(ddbClient, tableName)
+    return 'ACTIVE'
+
+# -----------------------------------------------------------------
+# Makes sure several tables exist: missing tables are all created
+# first and then waited for, so that their creations overlap. The
+# keys are either shared by all the tables or given per table (dict
+# of table name -> keys, the tables not listed use the default ones)
+# -----------------------------------------------------------------
+def ensureTables(ddbClient, tableNames, keys=DEFAULT_KEYS, maxWorkers=4):
+    missingTables = [t for t in tableNames if not isCached(t)]
+    if len(missingTables) == 0:
+        return {t: 'ACTIVE' for t in tableNames}
+
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(missingTables))) as executor:
+        statuses = dict(zip(missingTables, executor.map(lambda t: ddbTableExists(ddbClient, t), missingTables)))
+
+        for tableName, status in statuses.items():
+            if not status:
+                print(f'Table {tableName} does not exist, creating it...')
+                tableKeys = keys.get(tableName, DEFAULT_KEYS) if isinstance(keys, dict) else keys
+                ddbCreateTable(ddbClient, tableName, tableKeys, wait=False)
+
+        pendingTables = [t for t, status in statuses.items() if status != 'ACTIVE']
+        list(executor.map(lambda t: waitForTable(ddbClient, t), pendingTables))
+
+    return {t: 'ACTIVE' for t in tableNames}
@@ -0,0 +1,167 @@
+import calendar
+import threading
+import warnings
+
+from datetime import datetime
+
+# Conversions of timestamps (ISO 8601 strings such as the ones of the
+# datasets and of the Lookout for Equipment results, datetimes, pandas
+# timestamps) to epoch seconds, rounded down like the expression they
+# replace: (pd.to_datetime(x) - pd.Timestamp('1970-01-01')) // pd.Timedelta('1s')
+#
+# NumPy and pandas are only imported by the vector functions: the scalar
+# ones are used by the functions which no longer import pandas.
+ISO_FORMAT = 'ISO8601'
+
+# Format of the timestamps of each dataset (key chosen by the caller,
+# e.g. the asset name): either ISO_FORMAT, parsed by NumPy, or the
+# strftime format guessed by pandas from the first value
+_formats = {}
+_lock = threading.Lock()
+
+# ------------------------------------------------------------------
+# Scalar fast path: epoch seconds of an ISO 8601 string (timezone-naive
+# timestamps are UTC), None for the other formats
+# ------------------------------------------------------------------
+def parseEpoch(text):
+    # datetime.fromisoformat() only reads the Z suffix from Python 3.11:
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+
+    try:
+        timestamp = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+    return calendar.timegm(timestamp.utctimetuple())
+
+# ------------------------------------------------------------------
+# Epoch seconds of a single timestamp: string, datetime (including the
+# pandas timestamps) or numpy.datetime64
+# ------------------------------------------------------------------
+def toEpoch(value):
+    if isinstance(value, str):
+        epoch = parseEpoch(value)
+        if epoch is not None:
+            return epoch
+
+        import pandas as pd
+        value = pd.Timestamp(value)
+
+    if isinstance(value, datetime):
+        # The microseconds are dropped, the nanoseconds of a pandas
+        # timestamp are not part of its timetuple either:
+        return calendar.timegm(value.utctimetuple())
+
+    import numpy as np
+    return int(np.datetime64(value, 's').astype(np.int64))
+
+def cachedFormat(cacheKey):
+    with _lock:
+        return _formats.get(cacheKey)
+
+def rememberFormat(cacheKey, timestampFormat):
+    if cacheKey is not None:
+        with _lock:
+            _formats[cacheKey] = timestampFormat
+
+def invalidate(cacheKey=None):
+    with _lock:
+        if cacheKey is None:
+            _formats.clear()
+        else:
+            _formats.pop(cacheKey, None)
+
+# ------------------------------------------------------------------
+# Parses timestamp strings in bulk into a datetime64[ns] array (naive
+# UTC): the ISO 8601 strings are parsed by the C parser of NumPy, the
+# other ones by pandas with the format guessed from the first value
+# ------------------------------------------------------------------
+def parseDatetimes(values, cacheKey=None):
+    """
+    Parameters:
+        values (list, numpy.ndarray or pandas.Series):
+            Timestamp strings, or datetimes (returned as is, converted
+            to naive UTC)
+        cacheKey (string):
+            Key under which the format found for these values is kept
+            (e.g. the asset name), so that the next calls for the same
+            dataset go straight to the right parser
+
+    Returns:
+        numpy.ndarray: datetime64[ns] values, NaT for the missing ones
+    """
+    import numpy as np
+
+    dtype = getattr(values, 'dtype', None)
+    if dtype is not None and dtype.kind == 'M':
+        if getattr(dtype, 'tz', None) is not None:
+            import pandas as pd
+            values = pd.DatetimeIndex(values).tz_convert(None)
+
+        return np.asarray(values, dtype='datetime64[ns]')
+
+    timestampFormat = cachedFormat(cacheKey)
+    if timestampFormat in [None, ISO_FORMAT]:
+        parsed = parseIsoDatetimes(values)
+        if parsed is not None:
+            rememberFormat(cacheKey, ISO_FORMAT)
+            return parsed
+
+        timestampFormat = None
+
+    import pandas as pd
+    values = pd.Series(values, dtype=object)
+    if timestampFormat is None and len(values) > 0:
+        timestampFormat = guessFormat(values.iloc[0])
+        rememberFormat(cacheKey, timestampFormat)
+
+    parsed = pd.to_datetime(values, format=timestampFormat)
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_convert(None)
+
+    return parsed.to_numpy(dtype='datetime64[ns]')
+
+# NumPy reads the timezone-naive ISO 8601 strings (with a T or a space
+# separator): None when a value is in another format (NumPy only warns
+# about the time zones, which are left to pandas)
+def parseIsoDatetimes(values):
+    import numpy as np
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            return np.array(values, dtype='datetime64[ns]')
+
+    except (ValueError, TypeError, OverflowError, Warning):
+        return None
+
+def guessFormat(sample):
+    try:
+        from pandas.tseries.api import guess_datetime_format
+    except ImportError:
+        from pandas.core.tools.datetimes import guess_datetime_format
+
+    return guess_datetime_format(str(sample))
+
+# ------------------------------------------------------------------
+# Epoch seconds of timestamps in bulk (strings, datetime64 arrays or
+# pandas series / indexes)
+# ------------------------------------------------------------------
+def toEpochArray(values, cacheKey=None):
+    """
+    Returns:
+        numpy.ndarray: int64 epoch seconds (rounded down), or float64
+        ones with NaN for the missing timestamps when there are some
+    """
+    import numpy as np
+
+    timestamps = parseDatetimes(values, cacheKey=cacheKey)
+    epochs = timestamps.astype('datetime64[s]').astype(np.int64)
+
+    missing = np.isnat(timestamps)
+    if missing.any():
+        epochs = epochs.astype(float)
+        epochs[missing] = np.nan
+
+    return epochs
@@ -0,0 +1,212 @@
+import calendar
+import io
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from l4edemoapp.time_codec import toEpoch
+from l4edemoapp.upload_inspection import METADATA_PREFIX
+
+# Width of the timestamp prefix identifying a period in the lines of the
+# CSV files written by pandas (2023-01-01 10:00:00), its format and the
+# duration of the period (in seconds):
+GRANULARITIES = {
+    'h': (13, '%Y-%m-%d %H', 3600),
+    'D': (10, '%Y-%m-%d', 86400)
+}
+
+# ------------------------------------------------------------------
+# Location of the time index of a CSV file: it can't be written next
+# to the file as the raw-datasets/ prefix is ingested by Lookout for
+# Equipment. raw-datasets/pump/pump/sensors.csv is indexed in
+# metadata/raw-datasets/pump/pump/sensors.index.json
+# ------------------------------------------------------------------
+def timeIndexKey(csvKey):
+    if csvKey.endswith('.csv'):
+        csvKey = csvKey[:-len('.csv')]
+
+    return f'{METADATA_PREFIX}{csvKey}.index.json'
+
+# ------------------------------------------------------------------
+# Builds the index of a CSV file as it is written: the byte offset of
+# the first line of each period (hour or day) of its timestamp column
+# ------------------------------------------------------------------
+class TimeIndexBuilder:
+    """
+    The builder is given every block of bytes written to the file (see
+    the listener parameter of S3MultipartWriter): the lines are split
+    with numpy and only the first line of each period is decoded. The
+    file must start with a header and its first column must contain
+    timestamps formatted by pandas, in chronological order.
+    """
+    def __init__(self, granularity='h'):
+        self.granularity = granularity
+        self.width, self.format, _ = GRANULARITIES[granularity]
+        self.header = None
+        self.pending = b''
+        self.size = 0
+        self.periods = []
+        self.lastPrefix = None
+        self.isSorted = True
+
+    def feed(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        base = self.size - len(self.pending)
+        data = self.pending + data
+        self.size += len(data) - len(self.pending)
+
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        newlines = np.flatnonzero(buffer == ord('\n'))
+        if len(newlines) == 0:
+            self.pending = data
+            return
+
+        self.pending = data[newlines[-1] + 1:]
+        starts = np.concatenate([[0], newlines[:-1] + 1])
+        ends = newlines
+
+        if self.header is None:
+            self.header = data[:ends[0] + 1].decode('utf-8')
+            starts, ends = starts[1:], ends[1:]
+
+        # Lines too short to hold a timestamp (empty lines) are ignored:
+        valid = (ends - starts) >= self.width
+        starts = starts[valid]
+        if len(starts) == 0:
+            return
+
+        prefixes = buffer[starts[:, None] + np.arange(self.width)]
+        changes = np.ones(len(starts), dtype=bool)
+        changes[1:] = np.any(prefixes[1:] != prefixes[:-1], axis=1)
+        if self.lastPrefix is not None:
+            changes[0] = bytes(prefixes[0]) != self.lastPrefix
+
+        for position in np.flatnonzero(changes):
+            prefix = bytes(prefixes[position])
+            if self.lastPrefix is not None and prefix < self.lastPrefix:
+                self.isSorted = False
+
+            self.periods.append((prefix, int(base + starts[position])))
+            self.lastPrefix = prefix
+
+    def index(self):
+        """
+        Returns:
+            dict: the header of the file, its size (in bytes) and the
+            [epoch seconds, byte offset] start of each period
+        """
+        periods = []
+        for prefix, offset in self.periods:
+            periodStart = time.strptime(prefix.decode('utf-8'), self.format)
+            periods.append([calendar.timegm(periodStart), offset])
+
+        return {
+            'granularity': self.granularity,
+            'header': self.header,
+            'size': self.size,
+            'sorted': self.isSorted,
+            'periods': periods
+        }
+
+def writeTimeIndex(s3Client, bucket, csvKey, index):
+    s3Client.put_object(
+        Bucket=bucket,
+        Key=timeIndexKey(csvKey),
+        Body=json.dumps(index).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+def readTimeIndex(s3Client, bucket, csvKey):
+    try:
+        response = s3Client.get_object(Bucket=bucket, Key=timeIndexKey(csvKey))
+        return json.loads(response['Body'].read())
+
+    except s3Client.exceptions.NoSuchKey:
+        return None
+
+# ------------------------------------------------------------------
+# Byte range of the lines of a time window, given the index of a file
+# ------------------------------------------------------------------
+def windowRange(index, start, end):
+    """
+    Parameters:
+        index (dict):
+            index of the file, as returned by TimeIndexBuilder.index()
+        start, end (pandas.Timestamp):
+            timezone-naive UTC bounds of the window (both included)
+
+    Returns:
+        tuple: (first byte, last byte) of the lines of the periods
+        overlapping the window, or None when no line is in the window
+    """
+    if len(index['periods']) == 0:
+        return None
+
+    periodStarts = np.array([p[0] for p in index['periods']], dtype=np.int64)
+    offsets = np.array([p[1] for p in index['periods']], dtype=np.int64)
+    startSeconds = toEpoch(start)
+    endSeconds = toEpoch(end)
+
+    first = max(np.searchsorted(periodStarts, startSeconds, side='right') - 1, 0)
+    if startSeconds >= periodStarts[first] + GRANULARITIES[index['granularity']][2]:
+        first += 1
+
+    last = np.searchsorted(periodStarts, endSeconds, side='right')
+    if first >= last:
+        return None
+
+    lastByte = offsets[last] - 1 if last < len(offsets) else index['size'] - 1
+    return int(offsets[first]), int(lastByte)
+
+# ------------------------------------------------------------------
+# Reads the rows of a time window of an indexed CSV file with a ranged
+# GET request, and parses the needed columns only
+# ------------------------------------------------------------------
+def readWindow(s3Client, bucket, csvKey, start, end, columns=None, **csvOptions):
+    """
+    Parameters:
+        s3Client (botocore.client.S3):
+            An S3 client
+        bucket (string):
+            Bucket where the CSV file is located
+        csvKey (string):
+            Key of the CSV file, indexed at timeIndexKey(csvKey)
+        start, end (pandas.Timestamp):
+            bounds of the window: the rows of the whole periods (hours
+            or days) overlapping it are returned
+        columns (list):
+            columns to parse in addition to the timestamp (first) column,
+            all of them when None
+        csvOptions:
+            Additional parameters passed to pandas.read_csv()
+
+    Returns:
+        pandas.DataFrame: the rows of the window (timestamps left as
+        text), or None when the file is not indexed (or was overwritten
+        since it was), in which case the whole file must be read
+    """
+    index = readTimeIndex(s3Client, bucket, csvKey)
+    if index is None or not index['sorted']:
+        return None
+
+    header = index['header']
+    timestampCol = header.rstrip('\r\n').split(',')[0]
+    if columns is not None:
+        csvOptions['usecols'] = [timestampCol] + list(columns)
+
+    byteRange = windowRange(index, start, end)
+    if byteRange is None:
+        return pd.read_csv(io.StringIO(header), **csvOptions)
+
+    response = s3Client.get_object(Bucket=bucket, Key=csvKey, Range=f'bytes={byteRange[0]}-{byteRange[1]}')
+    fileSize = int(response['ContentRange'].split('/')[-1])
+    if fileSize != index['size']:
+        print(f'{csvKey} changed since it was indexed, it must be read in full')
+        return None
+
+    body = io.BytesIO(header.encode('utf-8') + response['Body'].read())
+    return pd.read_csv(body, **csvOptions)
@@ -0,0 +1,146 @@
+import csv
+import json
+
+import numpy as np
+import pandas as pd
+
+# Number of bytes used to guess the CSV delimiter:
+SNIFF_SIZE = 10240
+CHUNK_ROWS = 200000
+
+# The sidecar metadata objects can't be stored next to the uploaded
+# files: any new object under the private/ prefix triggers the dataset
+# preparation state machine.
+METADATA_PREFIX = 'metadata/'
+
+# ------------------------------------------------------------------
+# Binary stream replaying the bytes already read from another stream
+# before reading the rest of it
+# ------------------------------------------------------------------
+class ReplayStream:
+    def __init__(self, prefix, body):
+        self.prefix = prefix
+        self.body = body
+
+    def read(self, size=-1):
+        if len(self.prefix) == 0:
+            return self.body.read() if size is None or size < 0 else self.body.read(size)
+
+        if size is None or size < 0:
+            data = self.prefix + self.body.read()
+            self.prefix = b''
+        else:
+            data = self.prefix[:size]
+            self.prefix = self.prefix[size:]
+
+        return data
+
+def metadataKey(key):
+    return f'{METADATA_PREFIX}{key}.json'
+
+# ----------------------------------------------------------------
+# Guesses the delimiter of a CSV file from its first line
+# ----------------------------------------------------------------
+def sniffDelimiter(data):
+    firstLine = data.decode('utf-8', errors='ignore').split('\n')[0]
+    return csv.Sniffer().sniff(firstLine).delimiter
+
+# ------------------------------------------------------------------
+# Reads an uploaded CSV file once and extracts everything the later
+# stages of the pipeline need to know about it
+# ------------------------------------------------------------------
+def inspectUpload(s3Client, bucket, key, chunkRows=CHUNK_ROWS):
+    """
+    Streams the object in a single GetObject call: the first bytes are
+    used to guess the delimiter and are then replayed to pandas, which
+    parses the file by chunks of rows.
+
+    Returns:
+        dict: the object ETag and size, its delimiter and header, the
+        number of rows, the time range covered by the first (timestamp)
+        column and, for each other column, the number of values, the
+        number of missing values, the minimum, maximum and mean values
+    """
+    response = s3Client.get_object(Bucket=bucket, Key=key)
+    body = response['Body']
+    prefix = body.read(SNIFF_SIZE)
+    delimiter = sniffDelimiter(prefix)
+
+    header = None
+    numRows = 0
+    startTime = None
+    endTime = None
+    stats = {}
+
+    for chunk in pd.read_csv(ReplayStream(prefix, body), delimiter=delimiter, chunksize=chunkRows):
+        if header is None:
+            header = [str(c) for c in chunk.columns]
+            stats = {c: {'count': 0, 'missing': 0, 'sum': 0.0, 'min': None, 'max': None} for c in header[1:]}
+
+        numRows += chunk.shape[0]
+
+        # Time range covered by this chunk (in UTC):
+        timestamps = pd.to_datetime(chunk.iloc[:, 0])
+        if timestamps.dt.tz is not None:
+            timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+        if timestamps.notna().any():
+            startTime = timestamps.min() if startTime is None else min(startTime, timestamps.min())
+            endTime = timestamps.max() if endTime is None else max(endTime, timestamps.max())
+
+        # Statistics of the sensor columns:
+        for column in header[1:]:
+            values = pd.to_numeric(chunk[column], errors='coerce').to_numpy(dtype=float)
+            valid = values[~np.isnan(values)]
+            columnStats = stats[column]
+            columnStats['count'] += len(valid)
+            columnStats['missing'] += len(values) - len(valid)
+            if len(valid) > 0:
+                columnStats['sum'] += float(valid.sum())
+                columnStats['min'] = float(valid.min()) if columnStats['min'] is None else min(columnStats['min'], float(valid.min()))
+                columnStats['max'] = float(valid.max()) if columnStats['max'] is None else max(columnStats['max'], float(valid.max()))
+
+    for columnStats in stats.values():
+        total = columnStats.pop('sum')
+        columnStats['mean'] = total / columnStats['count'] if columnStats['count'] > 0 else None
+
+    return {
+        'bucket': bucket,
+        'key': key,
+        'etag': response['ETag'].strip('"'),
+        'size': response['ContentLength'],
+        'delimiter': delimiter,
+        'header': header if header is not None else [],
+        'numRows': numRows,
+        'startTime': None if startTime is None else str(startTime),
+        'endTime': None if endTime is None else str(endTime),
+        'columns': stats
+    }
+
+# -----------------------------------------------
+# Stores / reads the sidecar metadata of a file
+# -----------------------------------------------
+def writeMetadata(s3Client, metadata):
+    s3Client.put_object(
+        Bucket=metadata['bucket'],
+        Key=metadataKey(metadata['key']),
+        Body=json.dumps(metadata).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+def readMetadata(s3Client, bucket, key, etag=None):
+    """
+    Returns the sidecar metadata of a file or None when it doesn't
+    exist or when it was built for another version of the file (when
+    the expected ETag is given)
+    """
+    try:
+        response = s3Client.get_object(Bucket=bucket, Key=metadataKey(key))
+        metadata = json.loads(response['Body'].read())
+
+    except s3Client.exceptions.NoSuchKey:
+        return None
+
+    if etag is not None and metadata['etag'] != etag.strip('"'):
+        return None
+
+    return metadata
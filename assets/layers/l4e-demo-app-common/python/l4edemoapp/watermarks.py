@@ -0,0 +1,212 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from l4edemoapp.resampling import HOURLY_FFILL_LIMIT
+from l4edemoapp.upload_inspection import METADATA_PREFIX
+
+# ------------------------------------------------------------------
+# Location of the watermark of an asset: it describes the end of the
+# time series already prepared and loaded in DynamoDB
+# ------------------------------------------------------------------
+def watermarkKey(asset):
+    return f'{METADATA_PREFIX}prepared-datasets/{asset}/watermark.json'
+
+def hourlyHistoryKey(asset):
+    return f'{METADATA_PREFIX}prepared-datasets/{asset}/hourly.csv'
+
+# ------------------------------------------------------------------
+# Fingerprint of the rows of each day (epoch seconds of the day as a
+# string -> sum of the hashes of its rows, modulo 2^64): the sums can
+# be merged chunk after chunk and compared with the rows of a new
+# upload to know if the data already prepared was changed
+# ------------------------------------------------------------------
+def dayFingerprints(df):
+    if df.shape[0] == 0:
+        return {}
+
+    hashes = pd.util.hash_pandas_object(df.astype(float), index=True).to_numpy(dtype=np.uint64)
+    days, positions = np.unique(df.index.floor('D').asi8 // 10**9, return_inverse=True)
+    sums = np.zeros(len(days), dtype=np.uint64)
+    np.add.at(sums, positions, hashes)
+
+    return {str(day): int(value) for day, value in zip(days, sums)}
+
+def mergeFingerprints(fingerprints, other):
+    merged = dict(fingerprints)
+    for day, value in other.items():
+        merged[day] = (merged.get(day, 0) + value) % 2**64
+
+    return merged
+
+# ------------------------------------------------------------------
+# Checks that the rows of a new upload up to the watermark are the
+# rows already prepared: every prepared day from the first day of the
+# upload onward must have the same fingerprint. The first day of an
+# upload starting after the prepared data may only hold the end of
+# this day: it is not compared
+# ------------------------------------------------------------------
+def overlapMatches(overlap, fingerprints):
+    if len(overlap) == 0:
+        return True
+
+    firstDay = min([int(day) for day in overlap.keys()])
+    preparedStart = min([int(day) for day in fingerprints.keys()], default=firstDay)
+    partialFirstDay = firstDay > preparedStart
+
+    days = set(overlap.keys()) | set(fingerprints.keys())
+    days = [day for day in days if int(day) > firstDay or (int(day) == firstDay and not partialFirstDay)]
+
+    return all([overlap.get(day) == fingerprints.get(day) for day in days])
+
+# ------------------------------------------------------------------
+# Builds the watermark at the end of a prepared time series
+# ------------------------------------------------------------------
+def buildWatermark(asset, tableName, boundaryRows, hourlyHistory, limit=HOURLY_FFILL_LIMIT):
+    """
+    The hourly mean of the last (boundary) hour may change when new rows
+    are appended: the watermark keeps the sum and the number of values
+    of each sensor in this hour to average it again with the new rows.
+    The last value (before the forward-fill) of each sensor is also kept
+    to fill the gaps at the start of the next increment.
+
+    Parameters:
+        asset (string):
+            name of the asset
+        tableName (string):
+            DynamoDB table where the hourly data is stored
+        boundaryRows (pandas.DataFrame):
+            raw rows of the last hour of the time series
+        hourlyHistory (pandas.DataFrame):
+            last hourly means, before their forward-fill
+
+    Returns:
+        dict: the watermark of this time series
+    """
+    boundaryRows = boundaryRows.select_dtypes(include='number')
+    boundaryHour = boundaryRows.index[-1].floor('h')
+    boundaryRows = boundaryRows[boundaryRows.index >= boundaryHour]
+
+    # Last known value of each sensor before the boundary hour (the
+    # older ones can't fill anything in the next increments):
+    history = hourlyHistory[hourlyHistory.index < boundaryHour]
+    history = history[history.index >= boundaryHour - pd.Timedelta(hours=limit)]
+    lastValues = {}
+    for tag in boundaryRows.columns:
+        if tag not in history.columns:
+            continue
+
+        lastIndex = history[tag].last_valid_index()
+        if lastIndex is not None:
+            lastValues[tag] = [str(lastIndex), float(history.loc[lastIndex, tag])]
+
+    return {
+        'asset': asset,
+        'tableName': tableName,
+        'tags': list(boundaryRows.columns),
+        'lastTimestamp': str(boundaryRows.index[-1]),
+        'boundaryHour': str(boundaryHour),
+        'boundarySum': {tag: float(v) for tag, v in boundaryRows.sum().items()},
+        'boundaryCount': {tag: int(v) for tag, v in boundaryRows.count().items()},
+        'lastValues': lastValues
+    }
+
+# ------------------------------------------------------------------
+# Resamples the rows appended after a watermark to hourly means
+# ------------------------------------------------------------------
+def resampleIncrement(df, watermark, limit=HOURLY_FFILL_LIMIT):
+    """
+    Only the rows more recent than the watermark are used: the boundary
+    hour is averaged again with the rows already ingested and the gaps
+    at the start of the increment are filled with the last known values
+    of each sensor, so that the hourly data is the same as if the whole
+    history was resampled again.
+
+    Returns:
+        (pandas.DataFrame, dict): the forward-filled hourly means from
+        the boundary hour onward (None when there is no new row) and
+        the watermark at the end of the increment
+    """
+    lastTimestamp = pd.Timestamp(watermark['lastTimestamp'])
+    boundaryHour = pd.Timestamp(watermark['boundaryHour'])
+    tags = watermark['tags']
+
+    df = df.loc[df.index > lastTimestamp, tags]
+    if df.shape[0] == 0:
+        return None, watermark
+
+    # Hourly sums and counts of the new rows, combined with the rows of
+    # the boundary hour which were already ingested:
+    endHour = df.index[-1].floor('h')
+    hours = pd.date_range(start=boundaryHour, end=endHour, freq='1h', name=df.index.name)
+    sums = df.resample('1h').sum(min_count=1).reindex(hours)
+    counts = df.resample('1h').count().reindex(hours).fillna(0)
+    sums.loc[boundaryHour] = sums.loc[boundaryHour].fillna(0) + pd.Series(watermark['boundarySum'])
+    counts.loc[boundaryHour] += pd.Series(watermark['boundaryCount'])
+    df_hourly = sums / counts.where(counts > 0)
+
+    # Forward-fill seeded with the last values preceding the boundary hour:
+    seedHours = pd.date_range(end=boundaryHour - pd.Timedelta('1h'), periods=limit, freq='1h', name=df.index.name)
+    seed = pd.DataFrame(index=seedHours, columns=tags, dtype=float)
+    for tag, (timestamp, value) in watermark['lastValues'].items():
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp in seed.index:
+            seed.loc[timestamp, tag] = value
+
+    history = pd.concat([seed, df_hourly], axis='index')
+    df_filled = history.ffill(limit=limit).iloc[len(seed):]
+
+    # The new boundary hour is the last hour of this increment:
+    boundaryRows = df[df.index >= endHour]
+    newWatermark = buildWatermark(watermark['asset'], watermark['tableName'], boundaryRows, history, limit)
+    if endHour == boundaryHour:
+        newWatermark['boundarySum'] = {tag: float(v) for tag, v in sums.loc[boundaryHour].fillna(0).items()}
+        newWatermark['boundaryCount'] = {tag: int(v) for tag, v in counts.loc[boundaryHour].items()}
+
+    return df_filled, newWatermark
+
+# -----------------------------------------------
+# Stores / reads the watermark of an asset
+# -----------------------------------------------
+def writeWatermark(s3Client, bucket, watermark):
+    s3Client.put_object(
+        Bucket=bucket,
+        Key=watermarkKey(watermark['asset']),
+        Body=json.dumps(watermark).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+def readWatermark(s3Client, bucket, asset):
+    try:
+        response = s3Client.get_object(Bucket=bucket, Key=watermarkKey(asset))
+        return json.loads(response['Body'].read())
+
+    except s3Client.exceptions.NoSuchKey:
+        return None
+
+def deleteWatermark(s3Client, bucket, asset):
+    s3Client.delete_object(Bucket=bucket, Key=watermarkKey(asset))
+
+# -----------------------------------------------------------------
+# Stores / reads the hourly data of an asset next to its watermark:
+# the LTTB level of the pyramid is computed over the whole series
+# -----------------------------------------------------------------
+def writeHourlyHistory(s3Client, bucket, asset, df_hourly):
+    s3Client.put_object(
+        Bucket=bucket,
+        Key=hourlyHistoryKey(asset),
+        Body=df_hourly.to_csv(date_format='%Y-%m-%d %H:%M:%S').encode('utf-8')
+    )
+
+def readHourlyHistory(s3Client, bucket, asset):
+    try:
+        response = s3Client.get_object(Bucket=bucket, Key=hourlyHistoryKey(asset))
+
+    except s3Client.exceptions.NoSuchKey:
+        return None
+
+    df = pd.read_csv(io.BytesIO(response['Body'].read()), index_col=0, parse_dates=[0], float_precision='round_trip')
+    df.index.name = 'timestamp'
+    return df
@@ -0,0 +1,102 @@
+# ========================================================================
+# Compares convert_ranges() of the training-results-extraction function,
+# built on rangesToMask(), with its former implementation (iterrows() +
+# .loc slice assignment) on random predicted ranges and on edge cases:
+#
+#     pip install boto3 numpy pandas pytest
+#     python -m pytest assets/layers/l4e-demo-app-common/tests
+# ========================================================================
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+LAYER = os.path.join(os.path.dirname(__file__), '..', 'python')
+FUNCTION = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', 'lambda-functions',
+    'l4e-demo-app-training-results-extraction', 'lambda_function.py'
+)
+sys.path.insert(0, LAYER)
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+spec = importlib.util.spec_from_file_location('training_results_extraction', FUNCTION)
+training_results_extraction = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(training_results_extraction)
+
+FREQ = '5min'
+
+def convertRangesReference(ranges_df, start_date, end_date, default_freq):
+    range_index = pd.date_range(start=start_date, end=end_date, freq=default_freq)
+    range_data = pd.DataFrame(index=range_index)
+    range_data.loc[:, 'Anomaly'] = 0.0
+
+    for _, row in ranges_df.iterrows():
+        event_start = row.iloc[0]
+        event_end = row.iloc[1]
+        if (event_start == event_end):
+            event_end = event_start + pd.Timedelta(default_freq)
+        range_data.loc[event_start:event_end, 'Anomaly'] = 1.0
+
+    return range_data
+
+def randomRanges(rng, startDate, endDate, numRanges):
+    # Events may start before the window, end after it or be inverted:
+    span = (endDate - startDate) // pd.Timedelta('1s')
+    starts = rng.integers(-span // 10, span + span // 10, numRanges)
+    durations = rng.choice([0, 0, -60, 1, 299, 300, 301, 3600, 86400], numRanges) * rng.integers(1, 4, numRanges)
+
+    # Half of the events are aligned on the 5-minute grid:
+    aligned = rng.random(numRanges) < 0.5
+    starts = np.where(aligned, starts - starts % 300, starts)
+    durations = np.where(aligned & (durations > 0), durations - durations % 300, durations)
+
+    starts = startDate + pd.to_timedelta(starts, unit='s')
+    ends = starts + pd.to_timedelta(durations, unit='s')
+    return pd.DataFrame({'start': starts, 'end': ends})
+
+def assertSameRanges(ranges, startDate, endDate):
+    expected = convertRangesReference(ranges, startDate, endDate, FREQ)
+    result = training_results_extraction.convert_ranges(ranges, startDate, endDate, FREQ)
+    pd.testing.assert_frame_equal(result, expected)
+
+@pytest.mark.parametrize('seed', range(100))
+def test_random_ranges(seed):
+    rng = np.random.default_rng(seed)
+    startDate = pd.Timestamp('2022-01-01') + pd.Timedelta(seconds=int(rng.integers(0, 600)))
+    endDate = startDate + pd.Timedelta(hours=int(rng.integers(1, 24 * 7)))
+    ranges = randomRanges(rng, startDate, endDate, int(rng.integers(0, 40)))
+
+    assertSameRanges(ranges, startDate, endDate)
+
+@pytest.mark.parametrize('start, end', [
+    # Single-point events, on and off the grid:
+    ('2022-01-01 01:00:00', '2022-01-01 01:00:00'),
+    ('2022-01-01 01:02:00', '2022-01-01 01:02:00'),
+    # Bounds on the grid are included:
+    ('2022-01-01 01:00:00', '2022-01-01 01:05:00'),
+    # Event between two points of the grid:
+    ('2022-01-01 01:01:00', '2022-01-01 01:04:00'),
+    # Inverted event:
+    ('2022-01-01 02:00:00', '2022-01-01 01:00:00'),
+    # Events overlapping the bounds of the window or outside of it:
+    ('2021-12-31 23:00:00', '2022-01-01 00:10:00'),
+    ('2022-01-01 23:55:00', '2022-01-02 03:00:00'),
+    ('2022-01-03 00:00:00', '2022-01-03 01:00:00'),
+    ('2022-01-02 00:00:00', '2022-01-02 00:00:00')
+])
+def test_single_range(start, end):
+    ranges = pd.DataFrame({'start': [pd.Timestamp(start)], 'end': [pd.Timestamp(end)]})
+    assertSameRanges(ranges, pd.Timestamp('2022-01-01'), pd.Timestamp('2022-01-02'))
+
+def test_overlapping_ranges():
+    starts = pd.to_datetime(['2022-01-01 01:00', '2022-01-01 01:30', '2022-01-01 01:30', '2022-01-01 05:00'])
+    ends = pd.to_datetime(['2022-01-01 02:00', '2022-01-01 01:45', '2022-01-01 01:30', '2022-01-01 05:00'])
+    ranges = pd.DataFrame({'start': starts, 'end': ends})
+    assertSameRanges(ranges, pd.Timestamp('2022-01-01'), pd.Timestamp('2022-01-02'))
+
+def test_no_ranges():
+    ranges = pd.DataFrame({'start': pd.to_datetime([]), 'end': pd.to_datetime([])})
+    assertSameRanges(ranges, pd.Timestamp('2022-01-01'), pd.Timestamp('2022-01-02'))
@@ -0,0 +1,156 @@
+# ========================================================================
+# Compares buildSensorContribution() of the training-results-extraction
+# function, built on binnedMeans(), with its former implementation (one
+# 5-minute DataFrame per predicted range, then resample('1D').mean()) on
+# random predicted ranges and on edge cases:
+#
+#     pip install boto3 numpy pandas pytest
+#     python -m pytest assets/layers/l4e-demo-app-common/tests
+# ========================================================================
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+LAYER = os.path.join(os.path.dirname(__file__), '..', 'python')
+FUNCTION = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', 'lambda-functions',
+    'l4e-demo-app-training-results-extraction', 'lambda_function.py'
+)
+sys.path.insert(0, LAYER)
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+spec = importlib.util.spec_from_file_location('training_results_extraction', FUNCTION)
+training_results_extraction = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(training_results_extraction)
+
+FREQ = '5min'
+AGGREGATION = '1D'
+ASSET_NAME = 'l4e-demo-app-user-pump'
+TAGS = [f'Sensor{i}' for i in range(6)]
+
+def buildSensorContributionReference(predictedRanges, tagsList, assetName, anomaliesDataframe, samplingRate, aggregationLevel):
+    expandedResults = []
+    for index, row in predictedRanges.iterrows():
+        newRow = dict()
+        newRow.update({'start': row['start']})
+        newRow.update({'end': row['end']})
+        newRow.update({'prediction': 1.0})
+
+        diagnostics = pd.DataFrame(row['diagnostics'])
+        diagnostics = dict(zip(diagnostics['name'], diagnostics['value']))
+        newRow = {**newRow, **diagnostics}
+
+        expandedResults.append(newRow)
+
+    expandedResults = pd.DataFrame(expandedResults)
+
+    dfList = []
+    for index, row in expandedResults.iterrows():
+        newIndex = pd.date_range(start=row['start'], end=row['end'], freq=samplingRate)
+        newDataframe = pd.DataFrame(index=newIndex)
+
+        for tag in tagsList:
+            if (f'{assetName[9:]}\\{tag}' in list(row.index)):
+                newDataframe[tag] = row[f'{assetName[9:]}\\{tag}']
+            else:
+                newDataframe[tag] = np.nan
+
+        dfList.append(newDataframe)
+
+    if len(dfList) == 0:
+        return None
+
+    sensorContributionDataframe = pd.concat(dfList, axis='index')
+    sensorContributionDataframe = sensorContributionDataframe.resample(aggregationLevel).mean()
+    new_index = anomaliesDataframe.resample(aggregationLevel).mean().index
+    sensorContributionDataframe = sensorContributionDataframe.reindex(new_index)
+    sensorContributionDataframe = sensorContributionDataframe.replace(to_replace=np.nan, value=0.0)
+    sensorContributionDataframe.index.name = 'day'
+
+    return sensorContributionDataframe
+
+def diagnostic(tag, value):
+    return {'name': f'{ASSET_NAME[9:]}\\{tag}', 'value': value}
+
+def randomRanges(rng, startDate, endDate, numRanges):
+    # Events may start before the window, end after it or be single points:
+    span = (endDate - startDate) // pd.Timedelta('1s')
+    starts = rng.integers(-span // 10, span + span // 10, numRanges)
+    durations = rng.choice([0, 1, 299, 300, 3600, 86400, 3 * 86400], numRanges)
+
+    # Half of the events are aligned on the 5-minute grid:
+    aligned = rng.random(numRanges) < 0.5
+    starts = np.where(aligned, starts - starts % 300, starts)
+
+    # Each range only mentions some of the tags in its diagnostics:
+    diagnostics = []
+    for _ in range(numRanges):
+        mentioned = rng.choice(len(TAGS), int(rng.integers(1, len(TAGS) + 1)), replace=False)
+        values = rng.dirichlet(np.ones(len(mentioned)))
+        diagnostics.append([diagnostic(TAGS[i], float(v)) for i, v in zip(mentioned, values)])
+
+    starts = startDate + pd.to_timedelta(starts, unit='s')
+    ends = starts + pd.to_timedelta(durations, unit='s')
+    return pd.DataFrame({'start': starts, 'end': ends, 'diagnostics': diagnostics})
+
+def assertSameContributions(ranges, startDate, endDate):
+    anomalies = training_results_extraction.convert_ranges(ranges[['start', 'end']], startDate, endDate, FREQ)
+    expected = buildSensorContributionReference(ranges, TAGS, ASSET_NAME, anomalies, FREQ, AGGREGATION)
+    result = training_results_extraction.buildSensorContribution(ranges, TAGS, ASSET_NAME, anomalies, FREQ, AGGREGATION)
+
+    # The means are weighted sums instead of sums of repeated values: only
+    # the last bits can differ
+    if expected is None:
+        assert result is None
+    else:
+        pd.testing.assert_frame_equal(result, expected, check_freq=False, rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize('seed', range(50))
+def test_random_ranges(seed):
+    rng = np.random.default_rng(seed)
+    startDate = pd.Timestamp('2022-01-01') + pd.Timedelta(seconds=int(rng.integers(0, 600)))
+    endDate = startDate + pd.Timedelta(days=int(rng.integers(1, 30)))
+    ranges = randomRanges(rng, startDate, endDate, int(rng.integers(1, 30)))
+
+    assertSameContributions(ranges, startDate, endDate)
+
+@pytest.mark.parametrize('start, end', [
+    # Single-point events, on and off the grid:
+    ('2022-01-01 01:00:00', '2022-01-01 01:00:00'),
+    ('2022-01-01 01:02:00', '2022-01-01 01:02:00'),
+    # Event between two points of the grid:
+    ('2022-01-01 01:01:00', '2022-01-01 01:04:00'),
+    # Inverted event:
+    ('2022-01-01 02:00:00', '2022-01-01 01:00:00'),
+    # Events spanning midnight or overlapping the bounds of the window:
+    ('2022-01-01 23:00:00', '2022-01-02 02:00:00'),
+    ('2021-12-31 23:00:00', '2022-01-01 00:10:00'),
+    ('2022-01-02 23:55:00', '2022-01-04 03:00:00')
+])
+def test_single_range(start, end):
+    ranges = pd.DataFrame({
+        'start': [pd.Timestamp(start)],
+        'end': [pd.Timestamp(end)],
+        'diagnostics': [[diagnostic('Sensor0', 0.75), diagnostic('Sensor3', 0.25)]]
+    })
+    assertSameContributions(ranges, pd.Timestamp('2022-01-01'), pd.Timestamp('2022-01-03'))
+
+def test_overlapping_ranges_and_unknown_tags():
+    ranges = pd.DataFrame({
+        'start': pd.to_datetime(['2022-01-01 01:00', '2022-01-01 01:30', '2022-01-02 05:00']),
+        'end': pd.to_datetime(['2022-01-01 02:00', '2022-01-01 01:45', '2022-01-02 06:00']),
+        'diagnostics': [
+            [diagnostic('Sensor0', 0.5), diagnostic('Sensor1', 0.5)],
+            [diagnostic('Sensor1', 0.9), diagnostic('Unknown', 0.1)],
+            [diagnostic('Sensor5', 1.0)]
+        ]
+    })
+    assertSameContributions(ranges, pd.Timestamp('2022-01-01'), pd.Timestamp('2022-01-03'))
+
+def test_no_ranges():
+    ranges = pd.DataFrame({'start': pd.to_datetime([]), 'end': pd.to_datetime([]), 'diagnostics': []})
+    assertSameContributions(ranges, pd.Timestamp('2022-01-01'), pd.Timestamp('2022-01-02'))
@@ -99,6 +99,7 @@ function DeleteProjectModal({ visible, onDiscard }) {
         await deleteTable(gateway, listTables, `l4edemoapp-${uid}-${projectName}-anomalies`)
         await deleteTable(gateway, listTables, `l4edemoapp-${uid}-${projectName}-daily_rate`)
         await deleteTable(gateway, listTables, `l4edemoapp-${uid}-${projectName}-raw-anomalies`)
+        await deleteTable(gateway, listTables, `l4edemoapp-${uid}-${projectName}-ledger`)
 
         const projectItem = {
             'user_id': {'S': uid},
@@ -115,6 +116,17 @@ function DeleteProjectModal({ visible, onDiscard }) {
         setDeleteMessage(`Deleting S3 artifacts...`)
         await Storage.remove(`${projectName}/${projectName}/sensors.csv`, { level: 'private' });
 
+        // The watermark of the prepared data would otherwise be used to
+        // append the first upload of a new project with the same name:
+        await Storage.remove(`prepared-datasets/${projectName}/watermark.json`, {
+            level: 'public',
+            customPrefix: { public: 'metadata/' }
+        }).catch((error) => console.log(error))
+        await Storage.remove(`prepared-datasets/${projectName}/hourly.csv`, {
+            level: 'public',
+            customPrefix: { public: 'metadata/' }
+        }).catch((error) => console.log(error))
+
         // ### TO DO Delete also the raw-datasets used for ingestion ###
         // s3://.../raw-datasets/{projectName}/{projectName}/${projectName}/sensors.csv
 